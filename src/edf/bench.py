@@ -0,0 +1,388 @@
+"""
+Benchmarks for the phases of loading and converting documents, run over synthetic corpora.
+
+Each corpus is generated by shape (see `corpora`) together with a schema that accepts it. Every
+phase is timed separately, on the output of the previous one, and reported as throughput and peak
+memory in a JSON report that can be saved and later compared against with `compare`; the phases
+in `schema_phases` time reading and analysing the corpus's schema instead. Loading many
+documents in threads can also be timed for several numbers of threads, to see how it scales (it
+only can on free-threaded builds of Python).
+"""
+
+import platform
+import sys
+import textwrap
+import time
+import tracemalloc
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from edf.block import Block
+from edf.cache import library_version
+from edf.canonical import canonicalize_json
+from edf.datafy import datafy_document
+from edf.io import load_many_threaded, loads_schema
+from edf.parser import read_document, read_minified
+from edf.parser.build import build
+from edf.parser.lex import tokenize
+from edf.parser.parse import parse
+from edf.schema import Schema, analyze_schema_document
+from edf.writer import dumps_minified
+from edf.xml import document_to_xml_string
+
+
+@dataclass
+class Corpus:
+    shape: str
+    source: str
+    schema_source: str
+
+    # Number of blocks in the document.
+    blocks: int
+
+
+def _number(i: int) -> str:
+    # Nonzero, as number literals can't be zero.
+    return str(i + 1)
+
+
+def small_corpus(blocks: int) -> Corpus:
+    """
+    Many small root blocks with one attribute each.
+    """
+    source = "".join(f"item i{i} {{\n    count = {_number(i)}\n}}\n" for i in range(blocks))
+    schema = """\
+block item {
+    attribute count {
+        type = "number"
+        required = true
+    }
+}
+"""
+    return Corpus("small", source, schema, blocks)
+
+
+WIDE_CHILDREN = 100
+WIDE_ATTRIBUTES = 12
+
+
+def wide_corpus(blocks: int) -> Corpus:
+    """
+    Root blocks with many attributes and many children, which also have many attributes.
+    """
+    attributes = "".join(f'    a{j} = "{j}"\n' for j in range(WIDE_ATTRIBUTES))
+    entry_attributes = "".join(f"        a{j} = {_number(j)}\n" for j in range(WIDE_ATTRIBUTES))
+    entry = f"    entry {{\n{entry_attributes}    }}\n"
+    roots = max(1, blocks // (WIDE_CHILDREN + 1))
+    body = attributes + entry * WIDE_CHILDREN
+    source = "".join(f"table t{i} {{\n{body}}}\n" for i in range(roots))
+    schema_attributes = "".join(
+        f'    attribute a{j} {{\n        type = "string"\n    }}\n' for j in range(WIDE_ATTRIBUTES)
+    )
+    schema_entry_attributes = "".join(
+        f'            attribute a{j} {{\n                type = "number"\n            }}\n'
+        for j in range(WIDE_ATTRIBUTES)
+    )
+    schema = f"""\
+block table {{
+{schema_attributes}
+    sub_block {{
+        field = "entries"
+
+        block entry {{
+            anonymous = true
+{schema_entry_attributes}        }}
+    }}
+}}
+"""
+    return Corpus("wide", source, schema, roots * (WIDE_CHILDREN + 1))
+
+
+DEEP_DEPTH = 50
+
+
+def deep_corpus(blocks: int) -> Corpus:
+    """
+    Root blocks that are chains of nested blocks.
+    """
+    roots = max(1, blocks // DEEP_DEPTH)
+    lines = []
+    for i in range(roots):
+        for depth in range(DEEP_DEPTH):
+            lines.append(f"{' ' * depth}node n{i}_{depth} {{\n")
+            lines.append(f"{' ' * (depth + 1)}depth = {_number(depth)}\n")
+        lines.extend(f"{' ' * depth}}}\n" for depth in reversed(range(DEEP_DEPTH)))
+    source = "".join(lines)
+
+    # Schemas can't refer to themselves, so this one is as deep as the documents.
+    node = 'block node {\n    attribute depth {\n        type = "number"\n    }\n'
+    schema = node + "}\n"
+    for _ in range(DEEP_DEPTH - 1):
+        child = textwrap.indent(schema, " " * 8)
+        sub_block = '    sub_block {\n        field = "child"\n        multiplicity = "one"\n'
+        schema = f"{node}{sub_block}{child}    }}\n}}\n"
+    return Corpus("deep", source, schema, roots * DEEP_DEPTH)
+
+
+STRING_SIZE = 1024
+
+
+def strings_corpus(blocks: int) -> Corpus:
+    """
+    Blocks with long string attributes, including escaped quotes.
+    """
+    text = ('lorem \\"ipsum\\" dolor ' * (STRING_SIZE // 22 + 1))[:STRING_SIZE]
+    source = "".join(f'text s{i} {{\n    body = "{text}{i}"\n}}\n' for i in range(blocks))
+    schema = """\
+block text {
+    attribute body {
+        type = "string"
+    }
+}
+"""
+    return Corpus("strings", source, schema, blocks)
+
+
+NUMERIC_ATTRIBUTES = 16
+
+
+def numeric_corpus(blocks: int) -> Corpus:
+    """
+    Blocks whose attributes are all numbers: integers, negative integers and decimals.
+    """
+
+    def value(i: int, j: int) -> str:
+        n = _number(i * NUMERIC_ATTRIBUTES + j)
+        return (n, f"-{n}", f"{n}.{j + 1}25")[j % 3]
+
+    source = "".join(
+        f"point p{i} {{\n"
+        + "".join(f"    v{j} = {value(i, j)}\n" for j in range(NUMERIC_ATTRIBUTES))
+        + "}\n"
+        for i in range(blocks)
+    )
+    schema_attributes = "".join(
+        f'    attribute v{j} {{\n        type = "number"\n    }}\n'
+        for j in range(NUMERIC_ATTRIBUTES)
+    )
+    schema = f"block point {{\n{schema_attributes}}}\n"
+    return Corpus("numeric", source, schema, blocks)
+
+
+corpora: dict[str, Callable[[int], Corpus]] = {
+    "small": small_corpus,
+    "wide": wide_corpus,
+    "deep": deep_corpus,
+    "strings": strings_corpus,
+    "numeric": numeric_corpus,
+}
+
+
+type _Phase = Callable[[Any, Schema], Any]
+
+# Each phase is given the previous phase's output (the source, for the first) and the schema.
+phases: dict[str, _Phase] = {
+    "tokenize": lambda source, _: tokenize(source),
+    "parse": lambda tokens, _: parse(tokens),
+    "build": lambda tree, _: build(tree),
+    "canonicalize_json": lambda doc, _: canonicalize_json(doc),
+    "datafy_document": lambda doc, schema: datafy_document(schema, doc),
+    "document_to_xml_string": lambda doc, _: document_to_xml_string(doc),
+    # The layout-sensitive path as a whole, against the minified fast lane.
+    "read_document": lambda source, _: read_document(source),
+    "dumps_minified": lambda doc, _: dumps_minified(doc),
+    "read_minified": lambda minified, _: read_minified(minified),
+    "read_schema": lambda schema_source, _: read_document(schema_source),
+    "analyze_schema": lambda schema_doc, _: analyze_schema_document(schema_doc),
+}
+
+# The phase whose output each phase takes. Phases not listed take the source.
+phase_inputs = {
+    "parse": "tokenize",
+    "build": "parse",
+    "canonicalize_json": "build",
+    "datafy_document": "build",
+    "document_to_xml_string": "build",
+    "dumps_minified": "build",
+    "read_minified": "dumps_minified",
+    "analyze_schema": "read_schema",
+}
+
+# Phases that take the corpus's schema source rather than its source, and are measured against it.
+schema_phases = {"read_schema", "analyze_schema"}
+
+
+def _count_blocks(doc: Iterable[Block]) -> int:
+    count = 0
+    stack = list(doc)
+    while stack:
+        block = stack.pop()
+        count += 1
+        stack.extend(block.children)
+    return count
+
+
+def _measure(phase: _Phase, input: Any, schema: Schema, repeat: int) -> tuple[Any, float, int]:
+    # Times are the best of `repeat` runs. Peak memory is measured in a separate run, as tracing
+    # allocations slows everything down.
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = phase(input, schema)
+        best = min(best, time.perf_counter() - start)
+    del output
+    tracemalloc.start()
+    try:
+        output = phase(input, schema)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return output, best, peak
+
+
+def run_corpus(corpus: Corpus, phase_names: Iterable[str], repeat: int = 3) -> dict:
+    phase_names = list(phase_names)
+    schema = loads_schema(corpus.schema_source)
+    size = len(corpus.source.encode())
+    schema_size = len(corpus.schema_source.encode())
+    schema_blocks = _count_blocks(read_document(corpus.schema_source))
+    # Phases that are only needed for their outputs are run without being measured.
+    needed = set(phase_names)
+    for name in reversed(phases):
+        if name in needed and name in phase_inputs:
+            needed.add(phase_inputs[name])
+    outputs: dict[str, Any] = {}
+    results = {}
+    for name in phases:
+        if name not in needed:
+            continue
+        if name in phase_inputs:
+            input = outputs[phase_inputs[name]]
+        elif name in schema_phases:
+            input = corpus.schema_source
+        else:
+            input = corpus.source
+        if name not in phase_names:
+            outputs[name] = phases[name](input, schema)
+            continue
+        outputs[name], seconds, peak = _measure(phases[name], input, schema, repeat)
+        if name in schema_phases:
+            phase_size, phase_blocks = schema_size, schema_blocks
+        else:
+            phase_size, phase_blocks = size, corpus.blocks
+        results[name] = {
+            "seconds": seconds,
+            "mb_per_second": phase_size / seconds / 1e6,
+            "blocks_per_second": phase_blocks / seconds,
+            "peak_memory_bytes": peak,
+        }
+    return {"source_bytes": size, "blocks": corpus.blocks, "phases": results}
+
+
+def gil_enabled() -> bool:
+    # Only free-threaded builds can run without the GIL, and only they have this check.
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", None)
+    return is_gil_enabled() if is_gil_enabled is not None else True
+
+
+def run_scaling(
+    corpus: Corpus, thread_counts: Iterable[int], documents: int = 16, repeat: int = 3
+) -> dict:
+    """
+    Times loading the data of `documents` copies of the corpus with `load_many_threaded`, for each
+    number of threads. Speedups are relative to the first number of threads.
+    """
+    schema = loads_schema(corpus.schema_source)
+    sources = [corpus.source] * documents
+    results = {}
+    first = None
+    for threads in thread_counts:
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in load_many_threaded(sources, schema, threads):
+                pass
+            best = min(best, time.perf_counter() - start)
+        if first is None:
+            first = best
+        results[str(threads)] = {
+            "seconds": best,
+            "documents_per_second": documents / best,
+            "speedup": first / best,
+        }
+    return results
+
+
+def run(
+    shapes: Optional[Iterable[str]] = None,
+    phase_names: Optional[Iterable[str]] = None,
+    blocks: int = 2000,
+    repeat: int = 3,
+    threads: Optional[Iterable[int]] = None,
+    documents: int = 16,
+) -> dict:
+    """
+    Runs the benchmarks, returning a JSON-serialisable report. Given `threads`, the report also
+    has the timings of loading `documents` documents of each corpus with each number of threads.
+    """
+    shapes = list(corpora) if shapes is None else list(shapes)
+    phase_names = list(phases) if phase_names is None else list(phase_names)
+    for name in phase_names:
+        if name not in phases:
+            raise ValueError(f"Unknown phase: {name}")
+    results = {}
+    for shape in shapes:
+        if shape not in corpora:
+            raise ValueError(f"Unknown corpus shape: {shape}")
+        results[shape] = run_corpus(corpora[shape](blocks), phase_names, repeat)
+    report = {
+        "edf_version": library_version(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "gil_enabled": gil_enabled(),
+        "blocks": blocks,
+        "repeat": repeat,
+        "results": results,
+    }
+    if threads is not None:
+        threads = list(threads)
+        report["documents"] = documents
+        report["scaling"] = {
+            shape: run_scaling(corpora[shape](blocks), threads, documents, repeat)
+            for shape in shapes
+        }
+    return report
+
+
+@dataclass
+class Comparison:
+    shape: str
+    phase: str
+    baseline_seconds: float
+    seconds: float
+
+    @property
+    def ratio(self) -> float:
+        """
+        Time relative to the baseline, so above 1 is slower.
+        """
+        return self.seconds / self.baseline_seconds
+
+
+def compare(report: dict, baseline: dict) -> list[Comparison]:
+    """
+    Compares the timings of the benchmarks that are in both reports.
+    """
+    comparisons = []
+    for shape, result in report["results"].items():
+        baseline_result = baseline["results"].get(shape)
+        if baseline_result is None:
+            continue
+        for phase, timing in result["phases"].items():
+            baseline_timing = baseline_result["phases"].get(phase)
+            if baseline_timing is not None:
+                comparisons.append(
+                    Comparison(shape, phase, baseline_timing["seconds"], timing["seconds"])
+                )
+    return comparisons
@@ -0,0 +1,448 @@
+"""
+A compact binary serialisation of documents, for shipping parsed documents between processes
+without parsing their text again.
+
+Layout (integers are unsigned LEB128 varints unless noted):
+
+    magic       b"EDFB"
+    version     u8
+    strings     count, then count + 1 u32 byte offsets into the blob, then the blob size and the
+                UTF-8 blob itself. Kinds, names, attribute keys and string values are stored here
+                once and referred to by index.
+    shapes      count, then for each shape its kind's string index, a u8 that is 1 if blocks of
+                the shape have a value, and its attribute count followed by the keys' string
+                indices.
+    roots       count, then count + 1 u64 byte offsets into the block section, so any root block can
+                be found without decoding the others.
+    blocks      each root block in pre-order, see below.
+
+A block is its shape's index, its name's string index plus one (zero for no name), its value if
+its shape has one, a value for each of its shape's keys in order, and its child count followed by
+its children. Blocks of the same kind with the same attribute keys share a shape, which keeps
+the per-block structure down to a few bytes.
+
+Values are tagged scalars: a tag byte followed by a payload of nothing for `TAG_NONE`,
+`TAG_FALSE` and `TAG_TRUE`, a zigzag encoded varint for `TAG_INT`, a little-endian f64 for
+`TAG_FLOAT` and a string index for `TAG_STRING`. Lists are `TAG_LIST` followed by their length
+and their items as tagged scalars, and read back as arrays where the parser would make arrays.
+"""
+
+import mmap
+import struct
+from array import array
+from collections.abc import Iterable, Iterator, Sequence
+from contextlib import contextmanager
+from os import PathLike
+from typing import Any, BinaryIO, overload
+
+from edf.block import Block, Document
+from edf.parser.build import list_value
+
+MAGIC = b"EDFB"
+VERSION = 1
+
+TAG_NONE = 0
+TAG_FALSE = 1
+TAG_TRUE = 2
+TAG_INT = 3
+TAG_FLOAT = 4
+TAG_STRING = 5
+TAG_LIST = 6
+
+_u32 = struct.Struct("<I")
+_u64 = struct.Struct("<Q")
+_f64 = struct.Struct("<d")
+
+type _Shape = tuple[str, bool, tuple[str, ...]]
+
+
+class BinaryFormatError(ValueError):
+    pass
+
+
+@contextmanager
+def _decoding() -> Iterator[None]:
+    # Corrupt data shows up as reads past the end of the data, or of the string table, or as
+    # invalid UTF-8, wherever the decoder happens to be, so those are caught rather than checked
+    # for at each read.
+    try:
+        yield
+    except (IndexError, struct.error, UnicodeDecodeError) as e:
+        raise BinaryFormatError(f"Corrupt binary EDF document: {e}") from e
+
+
+def _write_varint(out: bytearray, n: int):
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _read_varint(data: Any, pos: int) -> tuple[int, int]:
+    b = data[pos]
+    pos += 1
+    if b < 0x80:
+        return b, pos
+    n = b & 0x7F
+    shift = 7
+    while True:
+        b = data[pos]
+        pos += 1
+        n |= (b & 0x7F) << shift
+        if b < 0x80:
+            return n, pos
+        shift += 7
+
+
+class _Encoder:
+    def __init__(self):
+        self.strings: dict[str, int] = {}
+        self.shapes: dict[_Shape, int] = {}
+        self.out = bytearray()
+
+    def string(self, s: str) -> int:
+        index = self.strings.get(s)
+        if index is None:
+            index = self.strings[s] = len(self.strings)
+        return index
+
+    def shape(self, block: Block) -> int:
+        shape = (block.kind, block.value is not None, tuple(block.attributes))
+        index = self.shapes.get(shape)
+        if index is None:
+            index = self.shapes[shape] = len(self.shapes)
+        return index
+
+    def scalar(self, value: Any):
+        out = self.out
+        if value is None:
+            out.append(TAG_NONE)
+        elif value is True:
+            out.append(TAG_TRUE)
+        elif value is False:
+            out.append(TAG_FALSE)
+        elif isinstance(value, int):
+            out.append(TAG_INT)
+            _write_varint(out, value << 1 if value >= 0 else (~value << 1) | 1)
+        elif isinstance(value, float):
+            out.append(TAG_FLOAT)
+            out += _f64.pack(value)
+        elif isinstance(value, str):
+            out.append(TAG_STRING)
+            _write_varint(out, self.string(value))
+        elif isinstance(value, (list, array)):
+            out.append(TAG_LIST)
+            _write_varint(out, len(value))
+            for item in value:
+                if isinstance(item, (list, array)):
+                    raise TypeError("Cannot serialise lists of lists")
+                self.scalar(item)
+        else:
+            raise TypeError(f"Cannot serialise value of type {type(value).__name__}")
+
+    def block(self, root: Block):
+        out = self.out
+        # Pre-order, with an explicit stack so that depth is unbounded.
+        stack = [root]
+        while stack:
+            block = stack.pop()
+            _write_varint(out, self.shape(block))
+            _write_varint(out, 0 if block.name is None else self.string(block.name) + 1)
+            if block.value is not None:
+                self.scalar(block.value)
+            for v in block.attributes.values():
+                self.scalar(v)
+            _write_varint(out, len(block.children))
+            stack.extend(reversed(block.children))
+
+    def header(self, root_offsets: list[int]) -> bytearray:
+        # Shapes are encoded first so that their kinds and keys are in the string table.
+        shapes = bytearray()
+        _write_varint(shapes, len(self.shapes))
+        for kind, has_value, keys in self.shapes:
+            _write_varint(shapes, self.string(kind))
+            shapes.append(has_value)
+            _write_varint(shapes, len(keys))
+            for key in keys:
+                _write_varint(shapes, self.string(key))
+
+        blobs = [s.encode() for s in self.strings]
+        string_offsets = [0]
+        for blob in blobs:
+            string_offsets.append(string_offsets[-1] + len(blob))
+
+        out = bytearray(MAGIC)
+        out.append(VERSION)
+        _write_varint(out, len(blobs))
+        out += struct.pack(f"<{len(string_offsets)}I", *string_offsets)
+        _write_varint(out, string_offsets[-1])
+        out += b"".join(blobs)
+        out += shapes
+        _write_varint(out, len(root_offsets) - 1)
+        out += struct.pack(f"<{len(root_offsets)}Q", *root_offsets)
+        return out
+
+
+def dumps(doc: Iterable[Block]) -> bytes:
+    encoder = _Encoder()
+    root_offsets = [0]
+    for block in doc:
+        encoder.block(block)
+        root_offsets.append(len(encoder.out))
+    return bytes(encoder.header(root_offsets) + encoder.out)
+
+
+def dump(doc: Iterable[Block], fp: BinaryIO):
+    fp.write(dumps(doc))
+
+
+class _Header:
+    """
+    The decoded header of a serialised document: its string table, its shapes and where its
+    sections are. Strings other than those the shapes use are decoded on first use.
+    """
+
+    def __init__(self, data: Any):
+        if data[: len(MAGIC)] != MAGIC:
+            raise BinaryFormatError("Not a binary EDF document")
+        with _decoding():
+            self._decode(data)
+
+    def _decode(self, data: Any):
+        if data[len(MAGIC)] != VERSION:
+            raise BinaryFormatError(f"Unsupported binary EDF version {data[len(MAGIC)]}")
+        pos = len(MAGIC) + 1
+        self.data = data
+
+        self.string_count, pos = _read_varint(data, pos)
+        self.string_offsets_pos = pos
+        pos += (self.string_count + 1) * _u32.size
+        if pos > len(data):
+            # Before the string list is allocated, as a corrupt count may be huge.
+            raise BinaryFormatError("Truncated binary EDF document")
+        blob_size, pos = _read_varint(data, pos)
+        self.blob_pos = pos
+        pos += blob_size
+        self.strings: list[str | None] = [None] * self.string_count
+
+        shape_count, pos = _read_varint(data, pos)
+        self.shapes: list[_Shape] = []
+        for _ in range(shape_count):
+            kind, pos = _read_varint(data, pos)
+            has_value = data[pos] == 1
+            key_count, pos = _read_varint(data, pos + 1)
+            keys = []
+            for _ in range(key_count):
+                key, pos = _read_varint(data, pos)
+                keys.append(self.string(key))
+            self.shapes.append((self.string(kind), has_value, tuple(keys)))
+
+        self.root_count, pos = _read_varint(data, pos)
+        self.root_offsets_pos = pos
+        pos += (self.root_count + 1) * _u64.size
+        self.blocks_pos = pos
+        # Checked up front, so that a truncated document fails here rather than at whichever
+        # root block is read first.
+        (blocks_size,) = _u64.unpack_from(data, pos - _u64.size)
+        if pos + blocks_size > len(data):
+            raise BinaryFormatError("Truncated binary EDF document")
+
+    def decode_strings(self) -> list[str]:
+        data = self.data
+        count = self.string_count
+        offsets = struct.unpack_from(f"<{count + 1}I", data, self.string_offsets_pos)
+        blob = data[self.blob_pos : self.blob_pos + offsets[-1]]
+        self.strings = [str(blob[offsets[i] : offsets[i + 1]], "utf-8") for i in range(count)]
+        return self.strings  # type: ignore
+
+    def string(self, index: int) -> str:
+        s = self.strings[index]
+        if s is None:
+            start, end = struct.unpack_from("<2I", self.data, self.string_offsets_pos + index * 4)
+            # str() rather than .decode() so that `data` can also be a memoryview.
+            s = str(self.data[self.blob_pos + start : self.blob_pos + end], "utf-8")
+            self.strings[index] = s
+        return s
+
+    def root_span(self, index: int) -> tuple[int, int]:
+        start, end = struct.unpack_from("<2Q", self.data, self.root_offsets_pos + index * 8)
+        return self.blocks_pos + start, self.blocks_pos + end
+
+
+class _LazyStrings:
+    # Indexable like the decoded string list, decoding entries on demand.
+    def __init__(self, header: _Header):
+        self._header = header
+
+    def __getitem__(self, index: int) -> str:
+        return self._header.string(index)
+
+
+def _read_block(
+    data: list[int], pos: int, strings: Any, shapes: list[_Shape]
+) -> tuple[Block, int]:
+    """
+    Decodes the block at `pos`, returning it and the position after it. `data` is the block
+    section as a list of byte values, which indexes faster than `bytes`.
+    """
+    new_block = Block.__new__
+    # Remaining child counts and child lists of the blocks being decoded.
+    counts = []
+    parents = []
+    root = None
+    # This loop dominates load time, so single byte varints and common scalars are read inline.
+    while True:
+        n = data[pos]
+        pos += 1
+        if n >= 0x80:
+            n, pos = _read_varint(data, pos - 1)
+        kind, has_value, keys = shapes[n]
+
+        n = data[pos]
+        pos += 1
+        if n >= 0x80:
+            n, pos = _read_varint(data, pos - 1)
+        name = strings[n - 1] if n else None
+
+        if has_value:
+            value, pos = _read_scalar(data, pos + 1, data[pos], strings)
+        else:
+            value = None
+
+        attributes = {}
+        for key in keys:
+            tag = data[pos]
+            v = data[pos + 1]
+            if tag == TAG_STRING and v < 0x80:
+                attributes[key] = strings[v]
+                pos += 2
+            elif tag == TAG_INT and v < 0x80:
+                attributes[key] = (v >> 1) ^ -(v & 1)
+                pos += 2
+            else:
+                attributes[key], pos = _read_scalar(data, pos + 1, tag, strings)
+
+        n = data[pos]
+        pos += 1
+        if n >= 0x80:
+            n, pos = _read_varint(data, pos - 1)
+
+        # Skips the dataclass __init__, which costs more than the rest of the decoding.
+        block = new_block(Block)
+        children = []
+        block.__dict__ = {
+            "kind": kind,
+            "name": name,
+            "value": value,
+            "attributes": attributes,
+            "children": children,
+        }
+
+        if parents:
+            parents[-1].append(block)
+            counts[-1] -= 1
+        else:
+            root = block
+        if n:
+            parents.append(children)
+            counts.append(n)
+        else:
+            while counts and not counts[-1]:
+                counts.pop()
+                parents.pop()
+            if not parents:
+                return root, pos  # type: ignore
+
+
+def _read_scalar(data: list[int], pos: int, tag: int, strings: Any) -> tuple[Any, int]:
+    if tag == TAG_INT:
+        n, pos = _read_varint(data, pos)
+        return (n >> 1) ^ -(n & 1), pos
+    elif tag == TAG_STRING:
+        n, pos = _read_varint(data, pos)
+        return strings[n], pos
+    elif tag == TAG_TRUE:
+        return True, pos
+    elif tag == TAG_FALSE:
+        return False, pos
+    elif tag == TAG_FLOAT:
+        return _f64.unpack(bytes(data[pos : pos + _f64.size]))[0], pos + _f64.size
+    elif tag == TAG_NONE:
+        return None, pos
+    elif tag == TAG_LIST:
+        n, pos = _read_varint(data, pos)
+        items = []
+        for _ in range(n):
+            item, pos = _read_scalar(data, pos + 1, data[pos], strings)
+            items.append(item)
+        return list_value(items), pos
+    else:
+        raise BinaryFormatError(f"Unknown scalar tag {tag}")
+
+
+def loads(data: bytes) -> Document:
+    """
+    Decodes a serialised document, raising `BinaryFormatError` if it is truncated or corrupt.
+    """
+    header = _Header(data)
+    with _decoding():
+        strings = header.decode_strings()
+        blocks = list(memoryview(data)[header.blocks_pos :])
+        doc = []
+        pos = 0
+        for _ in range(header.root_count):
+            block, pos = _read_block(blocks, pos, strings, header.shapes)
+            doc.append(block)
+    return doc
+
+
+def load(fp: BinaryIO) -> Document:
+    return loads(fp.read())
+
+
+class MappedDocument(Sequence[Block]):
+    """
+    A serialised document in a memory-mapped file. Root blocks are decoded when they are accessed
+    (and not kept), and the rest of the file is left alone.
+    """
+
+    def __init__(self, path: str | PathLike):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._header = _Header(self._mmap)
+        except BaseException:
+            self._mmap.close()
+            raise
+        self._strings = _LazyStrings(self._header)
+
+    def __len__(self) -> int:
+        return self._header.root_count
+
+    @overload
+    def __getitem__(self, index: int) -> Block: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[Block]: ...
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("root block index out of range")
+        with _decoding():
+            start, end = self._header.root_span(index)
+            data = list(self._mmap[start:end])
+            block, _ = _read_block(data, 0, self._strings, self._header.shapes)
+        return block
+
+    def close(self):
+        self._mmap.close()
+
+    def __enter__(self) -> "MappedDocument":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
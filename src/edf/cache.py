@@ -0,0 +1,142 @@
+"""
+A persistent, content-addressed cache for parsed documents and analysed schemas.
+
+Entries are keyed by a hash of the source text and of the library's own code (see
+`code_fingerprint`), and stored as pickles so that unchanged inputs can be loaded without lexing,
+parsing or analysing them again. Any change to the library, released or not, starts a fresh set of
+entries. The cache is opt-in: pass a `Cache` to the loading functions in `edf.io`.
+
+Entries are unpickled when loaded, which can run arbitrary code, so the cache directory (e.g.
+`EDF_CACHE_DIR`) must only be writable by users trusted to run code in the loading process.
+"""
+
+import functools
+import hashlib
+import os
+import pickle
+import tempfile
+from collections.abc import Callable
+from dataclasses import dataclass
+from importlib import metadata
+from pathlib import Path
+
+
+def library_version() -> str:
+    try:
+        return metadata.version("entity-document-format")
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+@functools.cache
+def code_fingerprint() -> str:
+    """
+    A hash of the library's version and the source of its modules, which changes whenever what
+    they produce might.
+    """
+    h = hashlib.sha256(library_version().encode())
+    package = Path(__file__).parent
+    for path in sorted(package.rglob("*.py")):
+        h.update(path.relative_to(package).as_posix().encode() + b"\0")
+        h.update(path.read_bytes())
+    return h.hexdigest()
+
+
+@dataclass
+class Cache:
+    directory: Path
+
+    # Total size of the entries, in bytes, above which the least recently used are evicted.
+    max_size: int = 256 * 1024 * 1024
+
+    def __post_init__(self):
+        self.directory = Path(self.directory)
+        self._version = code_fingerprint()
+
+    def key(self, namespace: str, source: str) -> str:
+        h = hashlib.sha256()
+        for part in (namespace, self._version, source):
+            h.update(part.encode())
+            h.update(b"\0")
+        return h.hexdigest()
+
+    def path(self, key: str) -> Path:
+        return self.directory / f"{key}.pickle"
+
+    def load[T](self, namespace: str, source: str, compute: Callable[[str], T]) -> T:
+        """
+        Returns the cached result for `source` in `namespace`, calling `compute` and storing its
+        result on a miss.
+        """
+        path = self.path(self.key(namespace, source))
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            pass
+        except Exception:
+            # A corrupt or incompatible entry is treated as a miss and replaced.
+            path.unlink(missing_ok=True)
+        else:
+            # Recency is tracked with the modification time.
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                pass
+            return value
+
+        value = compute(source)
+        self.store(path, value)
+        return value
+
+    def store(self, path: Path, value: object):
+        try:
+            data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except RecursionError:
+            # Too deeply nested to pickle. Not worth failing the load over.
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Write then rename, so concurrent readers never see a partial entry.
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self.evict()
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache fits within `max_size`.
+        """
+        entries = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".pickle"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    # Evicted by another thread or process.
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        if total <= self.max_size:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_size:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        if not self.directory.exists():
+            return
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".pickle"):
+                os.unlink(entry.path)
@@ -0,0 +1,67 @@
+"""
+Cooperative cancellation of loads, for callers with latency budgets.
+
+A `CancellationToken` given to a load (`edf.parser.read_document`, `edf.datafy.datafy_document` or
+`edf.io.loads_data` and friends) is checked every `CHECK_INTERVAL` tokens while lexing, parse
+steps while parsing, and nodes or blocks while building and datafying. Once the token has been
+cancelled, from any thread, or its timeout has passed, the next check raises `Cancelled` (or
+`DeadlineExceeded` for timeouts). Loads without a token run the same loops as before, with no
+checks at all.
+"""
+
+import time
+from collections.abc import Iterable, Iterator
+from typing import Optional
+
+# How many tokens, parse steps, nodes or blocks are processed between checks.
+CHECK_INTERVAL = 1024
+
+
+class Cancelled(Exception):
+    pass
+
+
+class DeadlineExceeded(Cancelled, TimeoutError):
+    pass
+
+
+class CancellationToken:
+    """
+    Cancels the loads it is given when `cancel` is called, or once `timeout` seconds have passed
+    since it was made.
+    """
+
+    def __init__(self, timeout: Optional[float] = None):
+        self.timeout = timeout
+        self.deadline = None if timeout is None else time.monotonic() + timeout
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled or (self.deadline is not None and time.monotonic() >= self.deadline)
+
+    def check(self):
+        """
+        Raises `Cancelled` if the token has been cancelled, or `DeadlineExceeded` if its timeout
+        has passed.
+        """
+        if self._cancelled:
+            raise Cancelled("Load cancelled")
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            raise DeadlineExceeded(f"Load exceeded its timeout of {self.timeout}s")
+
+
+def checked[T](items: Iterable[T], cancel: CancellationToken) -> Iterator[T]:
+    """
+    Yields `items`, checking `cancel` every `CHECK_INTERVAL` items.
+    """
+    countdown = CHECK_INTERVAL
+    for item in items:
+        countdown -= 1
+        if not countdown:
+            cancel.check()
+            countdown = CHECK_INTERVAL
+        yield item
@@ -3,17 +3,23 @@ Functions for representing EDF documents using JSON data (objects and arrays) in
 """
 
 from typing import Any
+
 from edf.block import Block, Document
+from edf.traverse import fold
 
 
-def canonicalize_block_json(block: Block) -> Any:
+def _leave(block: Block, _: None, children: list[Any]) -> Any:
     return {
         "$kind": block.kind,
         "$name": block.name,
-        "$children": [canonicalize_block_json(child) for child in block.children],
+        "$children": children,
         **block.attributes,
     }
 
 
+def canonicalize_block_json(block: Block) -> Any:
+    return fold(block, None, _leave)
+
+
 def canonicalize_json(doc: Document) -> Any:
     return [canonicalize_block_json(block) for block in doc]
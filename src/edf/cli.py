@@ -1,59 +1,432 @@
-from typing import TextIO
+import functools
+from pathlib import Path
+from typing import TYPE_CHECKING, BinaryIO, Optional, TextIO
 
 import click
 
+if TYPE_CHECKING:
+    from edf.cache import Cache
+    from edf.client import Client
+
+
+cache_dir_option = click.option(
+    "--cache-dir",
+    type=click.Path(file_okay=False, path_type=Path),
+    envvar="EDF_CACHE_DIR",
+    help="Cache parsed documents and schemas in this directory",
+)
+
+
+def stats_option(f):
+    """
+    Adds a --stats option, which prints the stats of each load the command makes to stderr.
+    """
+
+    @click.option("--stats", "print_stats", is_flag=True, help="Print load statistics to stderr")
+    @functools.wraps(f)
+    def wrapper(*args, print_stats: bool, **kwargs):
+        if not print_stats:
+            return f(*args, **kwargs)
+        from edf import stats
+
+        with stats.collect(trace_memory=True) as collected:
+            try:
+                return f(*args, **kwargs)
+            finally:
+                for load_stats in collected:
+                    click.echo(load_stats.format(), err=True)
+
+    return wrapper
+
+
+def open_cache(cache_dir: Optional[Path]) -> Optional["Cache"]:
+    if cache_dir is None:
+        return None
+    from edf.cache import Cache
+
+    return Cache(cache_dir)
+
 
 @click.group("edf")
 def edf_group():
     pass
 
 
+def expand_inputs(inputs: tuple[str, ...]) -> list[str]:
+    """
+    Expands glob patterns among `inputs`, which the shell may have left alone (e.g. when quoted).
+    """
+    import glob
+
+    paths = []
+    for input in inputs:
+        if glob.has_magic(input):
+            matches = sorted(glob.glob(input, recursive=True))
+            if not matches:
+                raise click.BadParameter(f"No files match {input!r}", param_hint="INPUTS")
+            paths.extend(matches)
+        else:
+            paths.append(input)
+    return paths
+
+
+def several_inputs(inputs: tuple[str, ...]) -> bool:
+    """
+    Whether `inputs` name several files: more than one input, or a glob pattern (however many files
+    it matches).
+    """
+    import glob
+
+    return len(inputs) > 1 or any(glob.has_magic(input) for input in inputs)
+
+
+def input_dir(name: str) -> Path:
+    """
+    The directory that includes in the input `name` are relative to: the current directory for
+    standard input.
+    """
+    return Path.cwd() if name in ("-", "<stdin>") else Path(name).parent
+
+
+def single_object(data: list):
+    if len(data) != 1:
+        raise ValueError("Expected a single object")
+    return data[0]
+
+
 @edf_group.command("to-json")
-@click.argument("input", type=click.File("r"))
+@click.argument("inputs", nargs=-1, required=True)
 @click.option("--output", "-o", type=click.File("w"), default="-")
 @click.option("--schema", "-s", type=click.File("r"))
 @click.option("--indent", "-i", type=int, default=2)
 @click.option("--compact", "-c", is_flag=True, help="Produce compact JSON output")
 @click.option("--object", is_flag=True, help="Interpret the input as an object instead of a list")
-def edf_to_json_cmd(input: TextIO, output: TextIO, schema: TextIO, indent: int, compact: bool, object: bool):
+@click.option("--stream", is_flag=True, help="Write each root block as soon as it is converted")
+@click.option("--ndjson", is_flag=True, help="Write one root block (or input file) per line")
+@click.option("--workers", "-j", type=click.IntRange(min=1), help="Convert several files in this many processes")
+@cache_dir_option
+@stats_option
+def edf_to_json_cmd(inputs: tuple[str, ...], output: TextIO, schema: TextIO, indent: int, compact: bool, object: bool, stream: bool, ndjson: bool, workers: Optional[int], cache_dir: Optional[Path]):
+    """
+    Converts INPUTS to JSON. Given several inputs or a glob pattern, writes an object mapping each
+    file to its conversion (even if the pattern matches a single file), or with --ndjson a line per
+    file of the form {"path": ..., "data": ...}; standard input (-) can't be one of several inputs.
+    A single input is read a root block at a time with --stream or --ndjson, and isn't cached.
+    Includes are resolved relative to the file that includes them.
+    """
     import json
-    from edf.canonical import canonicalize_json
-    from edf.io import loads_schema, loads_data, loads_document
+    from edf.canonical import canonicalize_block_json, canonicalize_json
+    from edf.columnar import json_default
+    from edf.io import iter_data, iter_document, loads_schema
+    from edf.json_stream import dump_array, dump_ndjson
 
-    if schema:
-        schema_loaded = loads_schema(schema.read())
-        data = loads_data(input.read(), schema_loaded)
-    else:
-        doc = loads_document(input.read())
-        data = canonicalize_json(doc)
+    if object and (stream or ndjson):
+        raise click.UsageError("--object cannot be combined with --stream or --ndjson")
+
+    cache = open_cache(cache_dir)
+    if several_inputs(inputs):
+        if stream:
+            raise click.UsageError("--stream cannot be used with several input files")
+        if "-" in inputs:
+            raise click.UsageError("Standard input (-) cannot be read with other input files")
+        from edf.io import load_many
+
+        paths = expand_inputs(inputs)
+
+        if schema:
+            results = load_many(paths, schema.read(), workers, cache=cache)
+        else:
+            results = load_many(paths, workers=workers, cache=cache, convert=canonicalize_json)
+        if object:
+            results = ((path, single_object(data)) for path, data in results)
+        if ndjson:
+            dump_ndjson(({"path": str(path), "data": data} for path, data in results), output)
+        else:
+            data = {str(path): data for path, data in results}
+            json.dump(data, output, indent=None if compact else indent, default=json_default)
+        return
+
+    (path,) = inputs
+    schema_loaded = loads_schema(schema.read(), cache) if schema else None
+    if stream or ndjson:
+        # Read a root block at a time, so that the whole document is never held (or cached).
+        from edf.datafy import iter_datafy_document
+        from edf.incremental import iter_file
+        from edf.include import iter_resolved
+
+        with click.open_file(path) as input:
+            items = iter_resolved(iter_file(input), input_dir(path))
+            if schema_loaded is None:
+                items = map(canonicalize_block_json, items)
+            else:
+                items = iter_datafy_document(schema_loaded, items)
+            if ndjson:
+                dump_ndjson(items, output)
+            else:
+                dump_array(items, output, indent=None if compact else indent)
+        return
 
+    with click.open_file(path) as input:
+        source = input.read()
+    base_dir = input_dir(path)
+    if schema_loaded is not None:
+        items = iter_data(source, schema_loaded, cache, base_dir=base_dir)
+    else:
+        items = map(canonicalize_block_json, iter_document(source, cache, base_dir=base_dir))
+    data = list(items)
     if object:
-        if len(data) != 1:
-            raise ValueError("Expected a single object")
-        data = data[0]
-    json.dump(data, output, indent=None if compact else indent)
+        data = single_object(data)
+    json.dump(data, output, indent=None if compact else indent, default=json_default)
 
 
 @edf_group.command("parse-schema")
 @click.argument("input", type=click.File("r"))
 @click.option("--output", "-o", type=click.File("w"), default="-")
-def edf_parse_schema_cmd(input: TextIO, output: TextIO):
+@cache_dir_option
+@stats_option
+def edf_parse_schema_cmd(input: TextIO, output: TextIO, cache_dir: Optional[Path]):
     from pprint import pprint
     from edf.io import loads_schema
 
-    schema = loads_schema(input.read())
+    schema = loads_schema(input.read(), open_cache(cache_dir))
     pprint(schema, stream=output)
 
 
 @edf_group.command("to-xml")
 @click.argument("input", type=click.File("r"))
 @click.option("--output", "-o", type=click.File("w"), default="-")
-def edf_to_xml_cmd(input: TextIO, output: TextIO):
-    from edf.io import loads_document
-    from edf.xml import document_to_xml_string
+@click.option("--indent", "-i", type=int, default=2)
+@click.option("--compact", "-c", is_flag=True, help="Produce compact XML output")
+@cache_dir_option
+@stats_option
+def edf_to_xml_cmd(input: TextIO, output: TextIO, indent: int, compact: bool, cache_dir: Optional[Path]):
+    from edf.io import iter_document
+    from edf.xml import dump_document_xml
+
+    doc = iter_document(input.read(), open_cache(cache_dir), base_dir=input_dir(input.name))
+    dump_document_xml(doc, output, indent=None if compact else " " * indent)
+
+
+@edf_group.command("minify")
+@click.argument("input", type=click.File("r"))
+@click.option("--output", "-o", type=click.File("w"), default="-")
+@cache_dir_option
+@stats_option
+def edf_minify_cmd(input: TextIO, output: TextIO, cache_dir: Optional[Path]):
+    """
+    Rewrites INPUT in the minified dialect, which `edf.parser.read_minified` reads much faster.
+    Includes are kept as they are.
+    """
+    from edf.io import iter_document
+    from edf.writer import dump_minified
+
+    dump_minified(iter_document(input.read(), open_cache(cache_dir)), output)
+
+
+@edf_group.command("bench")
+@click.option("--corpus", "shapes", multiple=True, help="Corpus shape to run (default: all)")
+@click.option("--phase", "phase_names", multiple=True, help="Phase to time (default: all)")
+@click.option("--blocks", "-n", type=click.IntRange(min=1), default=2000, help="Blocks per corpus")
+@click.option("--repeat", "-r", type=click.IntRange(min=1), default=3, help="Runs per timing")
+@click.option("--output", "-o", type=click.File("w"), default="-")
+@click.option("--baseline", type=click.File("r"), help="Compare against a saved report")
+@click.option(
+    "--max-regression",
+    type=float,
+    help="Fail if any timing is this fraction slower than the baseline, e.g. 0.1",
+)
+@click.option("--threads", "-t", type=click.IntRange(min=1), multiple=True, help="Also time loading documents in this many threads")
+@click.option("--documents", type=click.IntRange(min=1), default=16, help="Documents to load with --threads")
+@stats_option
+def edf_bench_cmd(shapes: tuple[str, ...], phase_names: tuple[str, ...], blocks: int, repeat: int, output: TextIO, baseline: Optional[TextIO], max_regression: Optional[float], threads: tuple[int, ...], documents: int):
+    """
+    Times each phase of loading and converting synthetic documents, and writes a JSON report.
+    """
+    import json
+    from edf import bench
+
+    for shape in shapes:
+        if shape not in bench.corpora:
+            raise click.BadParameter(f"Unknown corpus shape {shape!r}", param_hint="--corpus")
+    for name in phase_names:
+        if name not in bench.phases:
+            raise click.BadParameter(f"Unknown phase {name!r}", param_hint="--phase")
+    if max_regression is not None and baseline is None:
+        raise click.UsageError("--max-regression requires --baseline")
+
+    report = bench.run(shapes or None, phase_names or None, blocks, repeat, threads or None, documents)
+    json.dump(report, output, indent=2)
+    output.write("\n")
+
+    if baseline is not None:
+        regressed = False
+        for comparison in bench.compare(report, json.load(baseline)):
+            slower = max_regression is not None and comparison.ratio > 1 + max_regression
+            regressed |= slower
+            click.echo(
+                f"{comparison.shape:10} {comparison.phase:24} "
+                f"{comparison.baseline_seconds * 1000:10.2f}ms {comparison.seconds * 1000:10.2f}ms "
+                f"{comparison.ratio:6.2f}x{'  REGRESSION' if slower else ''}",
+                err=True,
+            )
+        if regressed:
+            raise SystemExit(1)
+
+
+socket_option = click.option(
+    "--socket",
+    "socket_path",
+    type=click.Path(dir_okay=False, path_type=Path),
+    envvar="EDF_SOCKET",
+    help="Unix socket of the edf serve daemon",
+)
+
+
+@edf_group.command("serve")
+@socket_option
+@click.option("--workers", "-j", type=click.IntRange(min=0), help="Worker processes (0: use a thread)")
+@click.option("--schema-cache-size", type=click.IntRange(min=1), default=64, help="Compiled schemas to keep per worker")
+@click.option("--max-bytes", type=click.IntRange(min=0), help="Reject documents larger than this")
+@click.option("--max-tokens", type=click.IntRange(min=0), help="Reject documents with more tokens")
+@click.option("--max-depth", type=click.IntRange(min=0), help="Reject documents nested deeper")
+@click.option("--max-string-length", type=click.IntRange(min=0), help="Reject longer string literals")
+@click.option("--max-attributes", type=click.IntRange(min=0), help="Reject blocks with more attributes")
+@click.option("--max-blocks", type=click.IntRange(min=0), help="Reject documents with more blocks")
+@click.option("--timeout", type=click.FloatRange(min=0, min_open=True), help="Cancel conversions taking longer, in seconds")
+@stats_option
+def edf_serve_cmd(socket_path: Optional[Path], workers: Optional[int], schema_cache_size: int, timeout: Optional[float], **limit_values: Optional[int]):
+    """
+    Serves conversions to `edf client` from a long-lived process.
+    """
+    import asyncio
+    import signal
+    from edf.limits import Limits
+    from edf.server import Server
+
+    limits = Limits(**limit_values) if any(v is not None for v in limit_values.values()) else None
+    server = Server(socket_path, workers, schema_cache_size, limits, timeout)
+
+    async def serve():
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, server.close)
+        await server.serve(lambda: click.echo(f"Listening on {server.path}", err=True))
+
+    asyncio.run(serve())
+
+
+def convert_with_client(client: "Client", paths: list[str], output: BinaryIO, schema_source: Optional[str], indent: Optional[int], object: bool, ndjson: bool):
+    import json
+
+    for path in paths:
+        with click.open_file(path) as input:
+            source = input.read()
+        if ndjson:
+            data = client.to_json(source, schema_source, None, object)
+            output.write(b'{"path": %s, "data": %s}\n' % (json.dumps(path).encode(), data))
+        else:
+            output.write(client.to_json(source, schema_source, indent, object))
+
+
+@edf_group.command("client")
+@click.argument("inputs", nargs=-1)
+@socket_option
+@click.option("--output", "-o", type=click.File("wb"), default="-")
+@click.option("--schema", "-s", type=click.File("r"))
+@click.option("--indent", "-i", type=int, default=2)
+@click.option("--compact", "-c", is_flag=True, help="Produce compact JSON output")
+@click.option("--object", is_flag=True, help="Interpret the input as an object instead of a list")
+@click.option("--ndjson", is_flag=True, help="Write one line per input file")
+@click.option("--server-stats", is_flag=True, help="Print the server's counters")
+@stats_option
+def edf_client_cmd(inputs: tuple[str, ...], socket_path: Optional[Path], output: BinaryIO, schema: Optional[TextIO], indent: int, compact: bool, object: bool, ndjson: bool, server_stats: bool):
+    """
+    Converts INPUTS to JSON like `edf to-json`, using the `edf serve` daemon.
+    """
+    import json
+    from edf.client import Client, ServerError
+
+    if not inputs and not server_stats:
+        raise click.UsageError("Expected input files or --server-stats")
+    paths = expand_inputs(inputs)
+    if len(paths) > 1 and not ndjson:
+        raise click.UsageError("Several input files require --ndjson")
+
+    schema_source = schema.read() if schema else None
+    try:
+        client = Client(socket_path)
+    except OSError as e:
+        raise click.ClickException(f"Cannot connect to the edf server: {e}")
+    with client:
+        try:
+            convert_with_client(client, paths, output, schema_source, None if compact else indent, object, ndjson)
+        except ServerError as e:
+            raise click.ClickException(str(e))
+        if server_stats:
+            click.echo(json.dumps(client.stats(), indent=2), err=True)
+
+
+@edf_group.command("watch")
+@click.argument("paths", nargs=-1, required=True, type=click.Path(exists=True, path_type=Path))
+@click.option("--output", "-o", type=click.File("w"), default="-")
+@click.option("--schema", "-s", "schema_path", type=click.Path(exists=True, dir_okay=False, path_type=Path), help="Schema file, reloaded when it changes")
+@click.option("--pattern", default="*.edf", show_default=True, help="Files to watch in directories")
+@click.option("--backend", type=click.Choice(["auto", "inotify", "poll"]), default="auto", show_default=True)
+@click.option("--interval", type=click.FloatRange(min=0, min_open=True), default=0.5, show_default=True, help="Seconds between polls")
+@stats_option
+def edf_watch_cmd(paths: tuple[Path, ...], output: TextIO, schema_path: Optional[Path], pattern: str, backend: str, interval: float):
+    """
+    Watches PATHS (files or directories) and writes a line of JSON for each set of changes, with
+    the root blocks added, changed and removed. The first line has the initial contents.
+    """
+    import json
+    from edf.canonical import canonicalize_block_json
+    from edf.columnar import json_default
+    from edf.watch import Change, ChangeSet, Watcher
+
+    def encode(change: Change) -> dict:
+        data = change.data
+        if schema_path is None and data is not None:
+            data = canonicalize_block_json(data)
+        return {"path": str(change.path), "kind": change.kind, "name": change.name, "data": data}
+
+    def write(changes: ChangeSet):
+        line = {
+            "added": [encode(change) for change in changes.added],
+            "changed": [encode(change) for change in changes.changed],
+            "removed": [encode(change) for change in changes.removed],
+            "errors": {str(path): error for path, error in changes.errors.items()},
+        }
+        output.write(json.dumps(line, default=json_default) + "\n")
+        output.flush()
+
+    with Watcher(paths, schema_path=schema_path, pattern=pattern, backend=backend, poll_interval=interval) as watcher:
+        write(watcher.load())
+        try:
+            for changes in watcher:
+                write(changes)
+        except KeyboardInterrupt:
+            pass
+
+
+@edf_group.group("index")
+def edf_index_group():
+    """
+    Sidecar indexes for loading single root blocks from large documents.
+    """
+
+
+@edf_index_group.command("build")
+@click.argument("input", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.option("--output", "-o", type=click.Path(dir_okay=False, path_type=Path), help="Index file (default: INPUT.idx)")
+@stats_option
+def edf_index_build_cmd(input: Path, output: Optional[Path]):
+    """
+    Indexes the root blocks of INPUT by kind and name, for `edf.index.load_block`.
+    """
+    from edf.index import build_index
 
-    doc = loads_document(input.read())
-    output.write(document_to_xml_string(doc))
+    click.echo(f"Wrote {build_index(input, output)}", err=True)
 
 
 if __name__ == "__main__":
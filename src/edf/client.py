@@ -0,0 +1,90 @@
+"""
+A client for the `edf serve` daemon (see `edf.server`).
+
+Requests and responses are a line of JSON, followed by the byte payloads whose sizes it gives.
+This module only depends on the standard library's socket support, so that clients start quickly.
+"""
+
+import json
+import os
+import socket
+import tempfile
+from typing import Any, Optional
+
+
+def default_socket_path() -> str:
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return os.path.join(runtime_dir, f"edf-{os.getuid()}.sock")
+
+
+class ServerError(ValueError):
+    pass
+
+
+def write_message(fp, header: dict, *payloads: bytes):
+    fp.write(json.dumps(header).encode() + b"\n")
+    for payload in payloads:
+        fp.write(payload)
+    fp.flush()
+
+
+class Client:
+    def __init__(self, path: Optional[str | os.PathLike] = None):
+        self.path = os.fspath(path) if path is not None else default_socket_path()
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self._socket.connect(self.path)
+        except OSError:
+            self._socket.close()
+            raise
+        self._file = self._socket.makefile("rwb")
+
+    def _request(self, header: dict, *payloads: bytes) -> tuple[dict, bytes]:
+        write_message(self._file, header, *payloads)
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("Server closed the connection")
+        response = json.loads(line)
+        payload = self._file.read(response.get("size", 0))
+        if "error" in response:
+            raise ServerError(response["error"])
+        return response, payload
+
+    def to_json(
+        self,
+        source: str,
+        schema: Optional[str] = None,
+        indent: Optional[int] = None,
+        object: bool = False,
+    ) -> bytes:
+        """
+        Converts `source` like `edf to-json`, returning the encoded JSON.
+        """
+        source_bytes = source.encode()
+        schema_bytes = schema.encode() if schema is not None else b""
+        header = {
+            "op": "to-json",
+            "source": len(source_bytes),
+            "schema": len(schema_bytes) if schema is not None else None,
+            "indent": indent,
+            "object": object,
+        }
+        _, payload = self._request(header, source_bytes, schema_bytes)
+        return payload
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Returns the server's counters.
+        """
+        _, payload = self._request({"op": "stats"})
+        return json.loads(payload)
+
+    def close(self):
+        self._file.close()
+        self._socket.close()
+
+    def __enter__(self) -> "Client":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
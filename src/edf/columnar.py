@@ -0,0 +1,77 @@
+"""
+Columnar output for `many` sub-blocks marked `columnar = true` in the schema.
+
+Instead of a list with a dict per child, a columnar field is a dict with a column per attribute of
+the child block (and an "id" column for named blocks), each holding the children's values in
+order. Columns of numbers are `array("q")` when every value is an integer and `array("d")`
+otherwise, and columns of booleans are `BooleanArray`s, so that they take a few bytes per value and
+can be handed to NumPy (`numpy.asarray(column)`) without copying. A column with missing values
+(attributes that are neither required nor defaulted) is a list, with None for each missing value.
+"""
+
+from array import array
+from typing import Any
+
+from edf.schema import BlockSchema
+
+
+class BooleanArray(array):
+    """
+    An array of booleans, stored a byte each. Items read back as 0 or 1, but `tolist` returns
+    booleans.
+    """
+
+    def __new__(cls, values=()):
+        return super().__new__(cls, "B", values)
+
+    def tolist(self) -> list[bool]:
+        return [bool(value) for value in super().tolist()]
+
+    def __reduce_ex__(self, protocol):
+        return type(self), (self.tolist(),)
+
+    def __repr__(self) -> str:
+        return f"BooleanArray({self.tolist()!r})"
+
+
+def _number_column(values: list) -> array | list:
+    try:
+        if all(type(value) is int for value in values):
+            return array("q", values)
+        return array("d", values)
+    except (OverflowError, TypeError):
+        # Integers too large for 64 bits, or missing values.
+        return values
+
+
+def _boolean_column(values: list) -> BooleanArray | list:
+    if None in values:
+        return values
+    return BooleanArray(values)
+
+
+def build_columns(schema: BlockSchema, rows: list[dict]) -> dict[str, Any]:
+    """
+    Turns the data of a list of blocks of the given (flat) schema into columns.
+    """
+    columns: dict[str, Any] = {}
+    if not schema.anonymous:
+        columns["id"] = [row.get("id") for row in rows]
+    for attribute in schema.attributes:
+        values = [row.get(attribute.name) for row in rows]
+        if attribute.type == "number":
+            columns[attribute.name] = _number_column(values)
+        elif attribute.type == "boolean":
+            columns[attribute.name] = _boolean_column(values)
+        else:
+            columns[attribute.name] = values
+    return columns
+
+
+def json_default(o: Any) -> Any:
+    """
+    Converts columns for JSON encoding, for use as `json.dump`'s `default`.
+    """
+    if isinstance(o, array):
+        return o.tolist()
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
@@ -1,6 +1,13 @@
+import copy
+from array import array
+from collections.abc import Callable, Iterable, Iterator, Mapping, Sequence
 from dataclasses import dataclass, field
+from typing import Any, Optional
 from edf.block import Block, Document
+from edf.cancel import CHECK_INTERVAL, CancellationToken
+from edf.columnar import build_columns
 from edf.schema import AttributeSchema, BlockSchema, Schema, SubBlockSchema
+from edf.traverse import fold
 
 
 @dataclass
@@ -8,6 +15,7 @@ class BlockSchemaContext:
     blocks: dict[str, tuple[SubBlockSchema, BlockSchema]]
     attributes: dict[str, AttributeSchema] = field(default_factory=dict)
     required_attributes: set[str] = field(default_factory=set)
+    columnar: list[tuple[SubBlockSchema, BlockSchema]] = field(default_factory=list)
 
     @classmethod
     def from_schema(cls, schema: Schema) -> "BlockSchemaContext":
@@ -24,6 +32,7 @@ class BlockSchemaContext:
         attributes = {}
         required_attributes = set()
         blocks = {}
+        columnar = []
         for attribute in block.attributes:
             attributes[attribute.name] = attribute
             if attribute.required:
@@ -37,12 +46,50 @@ class BlockSchemaContext:
             if block.aliases:
                 for alias in block.aliases:
                     blocks[alias] = (sub_block, block)
-        return cls(blocks=blocks, attributes=attributes, required_attributes=required_attributes)
+            if sub_block.columnar:
+                columnar.append((sub_block, block))
+        return cls(
+            blocks=blocks,
+            attributes=attributes,
+            required_attributes=required_attributes,
+            columnar=columnar,
+        )
 
 
-def datafy_block(schema: BlockSchema, block: Block) -> dict:
-    assert block.kind == schema.kind or block.kind in schema.aliases
-    ctx = BlockSchemaContext.from_block_schema(schema)
+# The item types of list attribute types, or None for lists of anything.
+_list_item_types: dict[str, Any] = {
+    "list": None,
+    "list<number>": (int, float),
+    "list<string>": str,
+    "list<boolean>": bool,
+}
+
+
+def _is_list_of(value: Any, type_: str) -> bool:
+    if type_ not in _list_item_types:
+        raise ValueError(f"Unexpected attribute type: {type_}")
+    if isinstance(value, array):
+        # The parser only makes arrays of numbers, which are checked by typecode alone.
+        return value.typecode in "qd" and type_ in ("list", "list<number>")
+    if not isinstance(value, list):
+        return False
+    item_type = _list_item_types[type_]
+    return item_type is None or all(isinstance(item, item_type) for item in value)
+
+
+# Traversal state for a block: its schema context, its output dict, and the contexts built so far
+# during this traversal (keyed by schema identity) so that each is only built once.
+type _State = tuple[BlockSchemaContext, dict, dict[int, BlockSchemaContext]]
+
+
+def _enter(block: Block, parent: _State) -> tuple[_State, Sequence[Block]]:
+    parent_ctx, _, contexts = parent
+    if block.kind not in parent_ctx.blocks:
+        raise ValueError(f"Unexpected child block: {block.kind}")
+    _, schema = parent_ctx.blocks[block.kind]
+    ctx = contexts.get(id(schema))
+    if ctx is None:
+        ctx = contexts[id(schema)] = BlockSchemaContext.from_block_schema(schema)
 
     # The output dict we're building.
     data = {}
@@ -69,6 +116,9 @@ def datafy_block(schema: BlockSchema, block: Block) -> dict:
                 elif attribute_schema.type == "boolean":
                     if not isinstance(v, bool):
                         raise ValueError(f"Expected boolean for attribute {k}")
+                elif attribute_schema.type.startswith("list"):
+                    if not _is_list_of(v, attribute_schema.type):
+                        raise ValueError(f"Expected {attribute_schema.type} for attribute {k}")
                 else:
                     raise ValueError(f"Unexpected attribute type: {attribute_schema.type}")
         else:
@@ -79,8 +129,10 @@ def datafy_block(schema: BlockSchema, block: Block) -> dict:
     for k in ctx.required_attributes:
         if k not in data:
             attribute_schema = ctx.attributes[k]
-            if attribute_schema.default is not None:
-                data[k] = attribute_schema.default
+            default = attribute_schema.default
+            if default is not None:
+                # List defaults are copied, as the schema (and so the default) is shared by loads.
+                data[k] = copy.copy(default) if isinstance(default, (list, array)) else default
             else:
                 raise ValueError(f"Missing required attribute: {k}")
 
@@ -95,25 +147,195 @@ def datafy_block(schema: BlockSchema, block: Block) -> dict:
         else:
             raise ValueError(f"Unexpected multiplicity: {sub_block.multiplicity}")
 
+    # Sub-blocks are looked up in `ctx` as they are entered.
+    return (ctx, data, contexts), block.children
+
+
+def _leave(block: Block, state: _State, children: list[dict]) -> dict:
+    ctx, data, _ = state
+
     # Process sub-blocks.
-    for child in block.children:
-        if child.kind not in ctx.blocks:
-            raise ValueError(f"Unexpected child block: {child.kind}")
-        sub_block_schema, child_schema = ctx.blocks[child.kind]
+    for child, child_data in zip(block.children, children):
+        sub_block_schema, _ = ctx.blocks[child.kind]
         k = sub_block_schema.field
-        if sub_block_schema.multiplicity == "one" and data[k] is not None:
-            raise ValueError(f"Duplicate child with multiplicity of one: {k}")
-        child_data = datafy_block(child_schema, child)
         if sub_block_schema.multiplicity == "one":
+            if data[k] is not None:
+                raise ValueError(f"Duplicate child with multiplicity of one: {k}")
             data[k] = child_data
         elif sub_block_schema.multiplicity == "many":
             data[k].append(child_data)
         else:
             raise ValueError(f"Unexpected multiplicity: {sub_block_schema.multiplicity}")
 
+    # Columnar fields are collected as a list of dicts like any other, and turned into columns
+    # once complete.
+    for sub_block_schema, child_schema in ctx.columnar:
+        data[sub_block_schema.field] = build_columns(child_schema, data[sub_block_schema.field])
+
+    return data
+
+
+def _root_state(
+    schema: BlockSchema, block: Block, contexts: dict[int, BlockSchemaContext]
+) -> _State:
+    assert block.kind == schema.kind or block.kind in schema.aliases
+    return BlockSchemaContext(blocks={block.kind: (None, schema)}), {}, contexts
+
+
+def _checked_enter(cancel: CancellationToken) -> Callable[[Block, _State], tuple]:
+    # `_enter`, checking `cancel` every `CHECK_INTERVAL` blocks.
+    countdown = CHECK_INTERVAL
+
+    def enter(block: Block, parent: _State) -> tuple[_State, Sequence[Block]]:
+        nonlocal countdown
+        countdown -= 1
+        if not countdown:
+            cancel.check()
+            countdown = CHECK_INTERVAL
+        return _enter(block, parent)
+
+    return enter
+
+
+def _datafy_block(
+    schema: BlockSchema,
+    block: Block,
+    contexts: dict[int, BlockSchemaContext],
+    enter: Callable[[Block, _State], tuple] = _enter,
+) -> dict:
+    return fold(block, _root_state(schema, block, contexts), _leave, enter)
+
+
+def datafy_block(schema: BlockSchema, block: Block) -> dict:
+    return _datafy_block(schema, block, {})
+
+
+def _root_schema(ctx: BlockSchemaContext, kind: str) -> BlockSchema:
+    if kind not in ctx.blocks:
+        raise ValueError(f"Unknown block kind: {kind}")
+    return ctx.blocks[kind][1]
+
+
+def iter_datafy_document(
+    schema: Schema, blocks: Iterable[Block], cancel: Optional[CancellationToken] = None
+) -> Iterator[dict]:
+    """
+    Datafies each block in turn. Given `cancel`, raises `edf.cancel.Cancelled` soon after it is
+    cancelled or times out.
+    """
+    ctx = BlockSchemaContext.from_schema(schema)
+    contexts = {}
+    enter = _enter if cancel is None else _checked_enter(cancel)
+    for block in blocks:
+        yield _datafy_block(_root_schema(ctx, block.kind), block, contexts, enter)
+
+
+def datafy_document(
+    schema: Schema, document: Document, cancel: Optional[CancellationToken] = None
+) -> list:
+    return list(iter_datafy_document(schema, document, cancel))
+
+
+
+class LazyData(Mapping[str, Any]):
+    """
+    A block's data as a read-only mapping, whose sub-block fields are only datafied when first
+    read, and then kept. The block's own attributes, and the kinds and multiplicities of its
+    children, are validated up front. See `materialize` for plain data.
+    """
+
+    __slots__ = ("_block", "_parent", "_state", "_pending")
+
+    def __init__(self, block: Block, parent: _State):
+        state, _ = _enter(block, parent)
+        ctx = state[0]
+        ones = set()
+        for child in block.children:
+            if child.kind not in ctx.blocks:
+                raise ValueError(f"Unexpected child block: {child.kind}")
+            sub_block_schema, _ = ctx.blocks[child.kind]
+            if sub_block_schema.multiplicity == "one":
+                if sub_block_schema.field in ones:
+                    raise ValueError(
+                        f"Duplicate child with multiplicity of one: {sub_block_schema.field}"
+                    )
+                ones.add(sub_block_schema.field)
+
+        self._block = block
+        self._parent = parent
+        self._state = state
+        # The sub-block fields that are yet to be datafied.
+        self._pending = {
+            sub_block_schema.field: (sub_block_schema, child_schema)
+            for sub_block_schema, child_schema in ctx.blocks.values()
+        }
+
+    def _datafy_field(self, sub_block_schema: SubBlockSchema, child_schema: BlockSchema):
+        ctx, data, _ = self._state
+        children = [
+            LazyData(child, self._state)
+            for child in self._block.children
+            if ctx.blocks[child.kind][0] is sub_block_schema
+        ]
+        k = sub_block_schema.field
+        if sub_block_schema.multiplicity == "one":
+            data[k] = children[0] if children else None
+        elif sub_block_schema.columnar:
+            # Columnar blocks have no sub-blocks, so their data is already complete.
+            data[k] = build_columns(child_schema, [child._state[1] for child in children])
+        else:
+            data[k] = children
+
+    def __getitem__(self, key: str) -> Any:
+        pending = self._pending.get(key)
+        if pending is not None:
+            self._datafy_field(*pending)
+            del self._pending[key]
+        return self._state[1][key]
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._state[1]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._state[1])
+
+    def __len__(self) -> int:
+        return len(self._state[1])
+
+    def __repr__(self) -> str:
+        items = ", ".join(
+            f"{k!r}: {'...' if k in self._pending else repr(v)}" for k, v in self._state[1].items()
+        )
+        return f"LazyData({{{items}}})"
+
+    def materialize(self) -> dict:
+        """
+        Returns the block's data as plain dicts and lists, like `datafy_block` would.
+        """
+        return fold(self._block, self._parent, _leave, _enter)
+
+
+def materialize(data: Any) -> Any:
+    """
+    Returns lazy data (or a list of it) as plain dicts and lists, e.g. for `json.dumps`.
+    """
+    if isinstance(data, LazyData):
+        return data.materialize()
+    elif isinstance(data, list):
+        return [materialize(item) for item in data]
     return data
 
 
-def datafy_document(schema: Schema, document: Document) -> list:
+def lazy_datafy_block(schema: BlockSchema, block: Block) -> LazyData:
+    return LazyData(block, _root_state(schema, block, {}))
+
+
+def iter_lazy_datafy_document(schema: Schema, blocks: Iterable[Block]) -> Iterator[LazyData]:
     ctx = BlockSchemaContext.from_schema(schema)
-    return [datafy_block(ctx.blocks[block.kind][1], block) for block in document]
+    contexts = {}
+    for block in blocks:
+        yield LazyData(block, _root_state(_root_schema(ctx, block.kind), block, contexts))
+
+
+def lazy_datafy_document(schema: Schema, document: Document) -> list[LazyData]:
+    return list(iter_lazy_datafy_document(schema, document))
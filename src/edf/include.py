@@ -0,0 +1,192 @@
+"""
+Resolution of `include "path.edf"` root blocks, which stand for the root blocks of another file.
+
+Included paths are relative to the including file. An `IncludeSession` parses each file once for
+as long as it is unchanged (by modification time), however many files include it, and records the
+include graph between the files it has loaded. The files of each level of the graph can be parsed
+in parallel by giving the session an executor.
+
+The blocks of an included file are shared by every document that includes it, so documents loaded
+through a session shouldn't be modified.
+
+Includes are resolved by `edf.io.load_document` and `load_data`, and by the loaders of source text
+in `edf.io` when given a `base_dir` for them to be relative to (see `iter_resolved`). Without one,
+`loads_data` and `iter_data` reject documents with includes, while `loads_document`,
+`iter_document` and the parser leave include blocks as they are.
+"""
+
+import os
+import threading
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Executor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+from edf.block import Block, Document
+from edf.parser import read_document
+from edf.projection import Projection, project_block
+
+INCLUDE_KIND = "include"
+
+
+def _read_fragment(path: Path) -> Document:
+    with open(path) as f:
+        return read_document(f.read())
+
+
+def _include_path(block: Block, directory: Path, including: object) -> Path:
+    if not isinstance(block.value, str) or block.name is not None:
+        raise ValueError(f'Expected an include of the form include "path" in {including}')
+    return (directory / block.value).resolve()
+
+
+@dataclass
+class _Fragment:
+    mtime_ns: int
+    document: Document
+    includes: list[Path]
+
+
+@dataclass
+class IncludeSession:
+    """
+    Loads documents, resolving their includes, with a cache of parsed files shared by every load
+    made through the session. Given an `executor`, the files at each level of the include graph
+    are parsed in parallel with it.
+    """
+
+    executor: Optional[Executor] = None
+
+    _fragments: dict[Path, _Fragment] = field(default_factory=dict, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def load(self, path: str | os.PathLike) -> Document:
+        """
+        Loads the document at `path`, with its includes replaced by the root blocks of the files
+        they include.
+        """
+        path = Path(path).resolve()
+        self._parse_graph(path)
+        return self._resolve(path, [])
+
+    def includes(self, path: str | os.PathLike) -> list[Path]:
+        """
+        Returns the files that the file at `path` includes directly, as of its last load.
+        """
+        return list(self._fragments[Path(path).resolve()].includes)
+
+    def dependencies(self, path: str | os.PathLike) -> set[Path]:
+        """
+        Returns the files that the file at `path` includes, directly or indirectly.
+        """
+        result: set[Path] = set()
+        pending = self.includes(path)
+        while pending:
+            dependency = pending.pop()
+            if dependency not in result:
+                result.add(dependency)
+                pending.extend(self._fragments[dependency].includes)
+        return result
+
+    def dependents(self, path: str | os.PathLike) -> set[Path]:
+        """
+        Returns the loaded files that include the file at `path`, directly or indirectly.
+        """
+        path = Path(path).resolve()
+        return {
+            dependent for dependent in self._fragments if path in self.dependencies(dependent)
+        }
+
+    def _parse_graph(self, root: Path):
+        # Breadth first, parsing all the files of each level together.
+        seen = {root}
+        level = [root]
+        while level:
+            stale = []
+            for path in level:
+                fragment = self._fragments.get(path)
+                if fragment is None or fragment.mtime_ns != os.stat(path).st_mtime_ns:
+                    stale.append(path)
+            self._parse(stale)
+
+            next_level = []
+            for path in level:
+                for include in self._fragments[path].includes:
+                    if include not in seen:
+                        seen.add(include)
+                        next_level.append(include)
+            level = next_level
+
+    def _parse(self, paths: list[Path]):
+        # The modification time is read first, so that a file changed while it is being parsed is
+        # parsed again on the next load.
+        mtimes = [os.stat(path).st_mtime_ns for path in paths]
+        if self.executor is not None and len(paths) > 1:
+            documents: Iterable[Document] = self.executor.map(_read_fragment, paths)
+        else:
+            documents = map(_read_fragment, paths)
+        for path, mtime_ns, document in zip(paths, mtimes, documents):
+            includes = [
+                _include_path(block, path.parent, path)
+                for block in document
+                if block.kind == INCLUDE_KIND
+            ]
+            with self._lock:
+                self._fragments[path] = _Fragment(mtime_ns, document, includes)
+
+    def _resolve(self, path: Path, including: list[Path]) -> Document:
+        if path in including:
+            cycle = " -> ".join(str(p) for p in [*including[including.index(path) :], path])
+            raise ValueError(f"Include cycle: {cycle}")
+        including.append(path)
+        fragment = self._fragments[path]
+        result = []
+        includes = iter(fragment.includes)
+        for block in fragment.document:
+            if block.kind == INCLUDE_KIND:
+                result.extend(self._resolve(next(includes), including))
+            else:
+                result.append(block)
+        including.pop()
+        return result
+
+
+def iter_resolved(
+    blocks: Iterable[Block],
+    base_dir: str | os.PathLike,
+    session: Optional[IncludeSession] = None,
+    projection: Optional[Projection] = None,
+) -> Iterator[Block]:
+    """
+    Yields the root blocks of a document read from source text, with its includes (relative to
+    `base_dir`) replaced by the root blocks of the files they include, loaded through `session`.
+    Given the `projection` of the document, included blocks are projected the same way.
+    """
+    directory = Path(base_dir)
+    if session is None:
+        session = IncludeSession()
+    for block in blocks:
+        if block.kind != INCLUDE_KIND:
+            yield block
+            continue
+        included = session.load(_include_path(block, directory, f"a document in {directory}"))
+        if projection is None:
+            yield from included
+        else:
+            for block in included:
+                if block.kind in projection.blocks:
+                    yield project_block(block, projection.blocks[block.kind])
+
+
+def reject_includes(blocks: Iterable[Block]) -> Iterator[Block]:
+    """
+    Yields the root blocks of a document read from source text, raising on the first include, which
+    can't be resolved without knowing where the document is.
+    """
+    for block in blocks:
+        if block.kind == INCLUDE_KIND:
+            raise ValueError(
+                f"Can't resolve include {block.value!r} without a base directory for it"
+            )
+        yield block
@@ -0,0 +1,242 @@
+"""
+Push-based reading of documents that arrive in chunks, e.g. over a socket.
+
+Root blocks end with a closing brace, so `IncrementalReader` scans the text it is fed for braces
+outside strings and comments, and parses each stretch of text that ends in a root block's closing
+brace as soon as it is complete. Parsing whole root blocks at a time means a block is only ever
+lexed once, and behaves exactly as it would in a document parsed in one go. (Root blocks written
+without braces, like `include "common.edf"`, are returned along with the next block that has them.)
+"""
+
+import asyncio
+import codecs
+import re
+from collections.abc import AsyncIterator, Iterator
+from dataclasses import dataclass
+from typing import IO, Any, Optional
+
+from edf.block import Block, Document
+from edf.datafy import iter_datafy_document
+from edf.parser import iter_document, read_document
+from edf.parser.lex import LexicalError, is_word_char
+from edf.schema import Schema
+
+# The characters that can change the scanner's state, in each state.
+_code_specials = re.compile(r'[{}"#]')
+_string_specials = re.compile(r'["\\\r\n]')
+_comment_specials = re.compile(r"[\r\n]")
+
+_CODE = 0
+_STRING = 1
+_COMMENT = 2
+
+
+class RootBlockScanner:
+    """
+    Finds the ends of root blocks in text fed to it in chunks, like `split_root_blocks`.
+    """
+
+    def __init__(self):
+        self.state = _CODE
+        self.depth = 0
+        self.escaped = False
+        self.last_char = ""
+
+    def scan(self, chunk: str) -> list[int]:
+        """
+        Scans the next chunk, returning the ends of the root blocks it completes.
+        """
+        ends = []
+        pos = 0
+        while True:
+            if self.state == _CODE:
+                match = _code_specials.search(chunk, pos)
+                if match is None:
+                    break
+                pos = match.end()
+                c = match.group()
+                if c == "{":
+                    self.depth += 1
+                elif c == "}":
+                    self.depth -= 1
+                    if self.depth <= 0:
+                        # Unbalanced braces are left for the parser to report.
+                        self.depth = 0
+                        ends.append(pos)
+                elif c == '"':
+                    self.state = _STRING
+                else:
+                    # A "#" directly after a name or number is part of it.
+                    before = chunk[pos - 2] if pos >= 2 else self.last_char
+                    if not before or not is_word_char(before) or before == "#":
+                        self.state = _COMMENT
+            elif self.state == _STRING:
+                if self.escaped:
+                    # The escaped character may be in the next chunk.
+                    if pos == len(chunk):
+                        break
+                    self.escaped = False
+                    pos += 1
+                match = _string_specials.search(chunk, pos)
+                if match is None:
+                    break
+                pos = match.end()
+                if match.group() == "\\":
+                    self.escaped = True
+                else:
+                    # Strings can't span lines, so the lexer will reject one that reaches a newline.
+                    self.state = _CODE
+            else:
+                match = _comment_specials.search(chunk, pos)
+                if match is None:
+                    break
+                pos = match.end()
+                self.state = _CODE
+        if chunk:
+            self.last_char = chunk[-1]
+        return ends
+
+
+def split_root_blocks(text: str) -> list[str]:
+    """
+    Splits a document's text into pieces that each end with a root block's closing brace (apart
+    from any text after the last one), and can be parsed on their own.
+    """
+    ends = RootBlockScanner().scan(text)
+    starts = [0, *ends]
+    pieces = [text[start:end] for start, end in zip(starts, ends)]
+    if starts[-1] < len(text):
+        pieces.append(text[starts[-1] :])
+    return pieces
+
+
+@dataclass(frozen=True)
+class TextPosition:
+    """
+    Where a piece of a document (such as one of `split_root_blocks`) starts in the whole document,
+    for reporting errors in the piece in terms of the document.
+    """
+
+    offset: int = 0
+    line: int = 1
+    col: int = 1
+
+    def advance(self, text: str) -> "TextPosition":
+        """
+        The position just after `text`, which starts at this position.
+        """
+        lines = text.count("\n") + text.count("\r") - text.count("\r\n")
+        if not lines:
+            return TextPosition(self.offset + len(text), self.line, self.col + len(text))
+        col = len(text) - max(text.rfind("\n"), text.rfind("\r"))
+        return TextPosition(self.offset + len(text), self.line + lines, col)
+
+    def rebase(self, e: LexicalError) -> LexicalError:
+        """
+        Moves an error from reading the piece that starts at this position to its place in the
+        document.
+        """
+        col = e.col + self.col - 1 if e.line == 1 else e.col
+        return LexicalError(e.offset + self.offset, e.line + self.line - 1, col, e.message)
+
+
+def read_piece(text: str, position: TextPosition) -> Document:
+    """
+    Reads a piece of a document that starts at `position`, with `read_document`.
+    """
+    try:
+        return read_document(text)
+    except LexicalError as e:
+        raise position.rebase(e)
+
+
+class IncrementalReader:
+    """
+    Reads a document fed to it in chunks of text (or UTF-8 bytes), returning each root block, or
+    its data if a `schema` is given, from the call to `feed` that completes it.
+    """
+
+    def __init__(self, schema: Optional[Schema] = None):
+        self.schema = schema
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._scanner = RootBlockScanner()
+
+        # Text after the last complete root block, in the chunks it was fed in.
+        self._pending: list[str] = []
+
+        # Where the pending text starts in the whole document, to report errors in its terms.
+        self._position = TextPosition()
+
+        self._closed = False
+
+    def feed(self, chunk: str | bytes) -> list[Any]:
+        """
+        Adds a chunk of the document, returning the root blocks it completes.
+        """
+        if self._closed:
+            raise ValueError("Reader is closed")
+        if isinstance(chunk, bytes):
+            chunk = self._decoder.decode(chunk)
+        ends = self._scanner.scan(chunk)
+        if not ends:
+            self._pending.append(chunk)
+            return []
+        self._pending.append(chunk[: ends[-1]])
+        text = "".join(self._pending)
+        self._pending = [chunk[ends[-1] :]]
+        return self._parse(text)
+
+    def close(self) -> list[Any]:
+        """
+        Ends the document, returning its remaining root blocks. Unclosed blocks are closed as they
+        would be at the end of a document parsed in one go.
+        """
+        if self._closed:
+            return []
+        self._closed = True
+        self._pending.append(self._decoder.decode(b"", final=True))
+        text = "".join(self._pending)
+        self._pending = []
+        return self._parse(text)
+
+    def _parse(self, text: str) -> list[Any]:
+        if not text:
+            return []
+        try:
+            blocks: Iterator[Any] = iter_document(text)
+            if self.schema is not None:
+                blocks = iter_datafy_document(self.schema, blocks)
+            result = list(blocks)
+        except LexicalError as e:
+            raise self._position.rebase(e)
+        self._position = self._position.advance(text)
+        return result
+
+
+def iter_file(
+    file: IO[str] | IO[bytes], schema: Optional[Schema] = None, chunk_size: int = 64 * 1024
+) -> Iterator[Block | dict]:
+    """
+    Reads a document from an open file until EOF, yielding each root block (or its data, given a
+    `schema`) as soon as it has been read, so that only about one root block is held at a time.
+    """
+    incremental = IncrementalReader(schema)
+    while chunk := file.read(chunk_size):
+        yield from incremental.feed(chunk)
+    yield from incremental.close()
+
+
+async def read_stream(
+    reader: asyncio.StreamReader, schema: Optional[Schema] = None, chunk_size: int = 64 * 1024
+) -> AsyncIterator[Block | dict]:
+    """
+    Reads a document from `reader` until EOF, yielding each root block (or its data, given a
+    `schema`) as soon as it has arrived.
+    """
+    incremental = IncrementalReader(schema)
+    while chunk := await reader.read(chunk_size):
+        for item in incremental.feed(chunk):
+            yield item
+    for item in incremental.close():
+        yield item
+
@@ -0,0 +1,203 @@
+"""
+Sidecar indexes, for loading single root blocks from documents too large to parse whole.
+
+`build_index` reads a document once and writes an index next to it, mapping each root block's kind
+and name to the byte offset and length of its text (found as by `edf.incremental`, so a root block
+written without braces shares its span with the next block). The index's entries are sorted lines,
+so `load_block` finds one with a binary search over the index file, then reads and parses only
+that span of the document: a lookup costs a few seeks and the size of the block, however large the
+document is. The index records the document's size, modification time and SHA-256 hash, and
+`load_block` refuses to use an index that no longer matches its document.
+"""
+
+import codecs
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import BinaryIO, Optional
+
+from edf import stats
+from edf.block import Block
+from edf.incremental import RootBlockScanner, TextPosition, read_piece
+from edf.parser import read_document
+
+FORMAT_VERSION = 1
+
+# Bytes of the document read at a time while building an index.
+_CHUNK_SIZE = 1024 * 1024
+
+# An index entry: the encoded kind and name of a root block, and its offset and length in bytes.
+type _Entry = tuple[tuple[bytes, bytes], int, int]
+
+
+class StaleIndex(ValueError):
+    pass
+
+
+def default_index_path(path: str | os.PathLike) -> Path:
+    return Path(f"{os.fspath(path)}.idx")
+
+
+def _hash_file(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(_CHUNK_SIZE):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _entry_key(kind: str, name: Optional[str]) -> tuple[bytes, bytes]:
+    # Names are JSON encoded, so that anonymous blocks (null) and names with tabs or newlines fit
+    # on a line; entries are sorted by their encoded key, as they are compared when searched.
+    return kind.encode(), json.dumps(name).encode()
+
+
+def build_index(path: str | os.PathLike, index_path: Optional[str | os.PathLike] = None) -> Path:
+    """
+    Indexes the root blocks of the document at `path`, writing the index to `index_path` (by
+    default `path` with ".idx" appended) and returning its path.
+    """
+    path = Path(path)
+    index_path = Path(index_path) if index_path is not None else default_index_path(path)
+    # Each root block is read with `read_document`, whose phases are accumulated in this operation.
+    with stats.operation("build_index"):
+        entries, stat, digest = _scan(path)
+        header = {
+            "format": FORMAT_VERSION,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": digest,
+        }
+        with stats.phase("write"):
+            # Readable by whoever can read the document.
+            _write_index(index_path, entries, header, stat.st_mode & 0o666)
+    return index_path
+
+
+def _scan(path: Path) -> tuple[list[_Entry], os.stat_result, str]:
+    # Returns the sorted index entries of the document at `path`, its stat and its SHA-256 hash.
+    entries: list[_Entry] = []
+    h = hashlib.sha256()
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    scanner = RootBlockScanner()
+    pending: list[str] = []
+    # The byte offset of the next piece, and its position for reporting errors.
+    offset = 0
+    position = TextPosition()
+
+    def add(piece: str):
+        nonlocal offset, position
+        length = len(piece.encode())
+        for block in read_piece(piece, position):
+            entries.append((_entry_key(block.kind, block.name), offset, length))
+        offset += length
+        position = position.advance(piece)
+
+    with open(path, "rb") as f:
+        stat = os.fstat(f.fileno())
+        while True:
+            data = f.read(_CHUNK_SIZE)
+            h.update(data)
+            chunk = decoder.decode(data, final=not data)
+            start = 0
+            for end in scanner.scan(chunk):
+                pending.append(chunk[start:end])
+                add("".join(pending))
+                pending.clear()
+                start = end
+            pending.append(chunk[start:])
+            if not data:
+                break
+    # Text after the last closing brace may still hold root blocks written without braces.
+    add("".join(pending))
+
+    # Sorted stably, so that the first of several blocks with the same key is found.
+    entries.sort(key=lambda entry: entry[0])
+    return entries, stat, h.hexdigest()
+
+
+def _write_index(index_path: Path, entries: list[_Entry], header: dict, mode: int):
+    # Write then rename, so concurrent lookups never see a partial index.
+    fd, tmp = tempfile.mkstemp(dir=index_path.parent, prefix=f".{index_path.name}.", suffix=".tmp")
+    try:
+        # Temporary files are private.
+        os.fchmod(fd, mode)
+        with os.fdopen(fd, "wb") as f:
+            f.write(json.dumps(header).encode() + b"\n")
+            for (kind, name), entry_offset, length in entries:
+                f.write(b"%s\t%s\t%d\t%d\n" % (kind, name, entry_offset, length))
+        os.replace(tmp, index_path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _check_header(header: dict, path: Path):
+    if header.get("format") != FORMAT_VERSION:
+        raise StaleIndex(f"Unsupported index format for {path}")
+    stat = os.stat(path)
+    if stat.st_size != header["size"]:
+        raise StaleIndex(f"Index is out of date for {path}")
+    # A changed modification time alone (e.g. after a copy) doesn't mean the content has changed.
+    if stat.st_mtime_ns != header["mtime_ns"] and _hash_file(path) != header["sha256"]:
+        raise StaleIndex(f"Index is out of date for {path}")
+
+
+def _line_at(f: BinaryIO, pos: int, start: int) -> bytes:
+    # Returns the first line that starts at or after `pos`.
+    if pos <= start:
+        f.seek(start)
+    else:
+        f.seek(pos - 1)
+        f.readline()
+    return f.readline()
+
+
+def _find(f: BinaryIO, key: tuple[bytes, bytes]) -> Optional[tuple[int, int]]:
+    start = f.tell()
+    lo, hi = start, f.seek(0, os.SEEK_END)
+    # Finds the first position whose next line's key is not less than `key`.
+    while lo < hi:
+        mid = (lo + hi) // 2
+        line = _line_at(f, mid, start)
+        if not line or tuple(line.split(b"\t", 2)[:2]) >= key:
+            hi = mid
+        else:
+            lo = mid + 1
+    line = _line_at(f, lo, start)
+    if not line:
+        return None
+    kind, name, offset, length = line.split(b"\t")
+    if (kind, name) != key:
+        return None
+    return int(offset), int(length)
+
+
+def load_block(
+    path: str | os.PathLike,
+    kind: str,
+    name: Optional[str],
+    index_path: Optional[str | os.PathLike] = None,
+) -> Block:
+    """
+    Loads the first root block with the given kind and name (None for anonymous blocks) from the
+    document at `path`, using the index written by `build_index`. Raises `KeyError` if there is no
+    such block, and `StaleIndex` if the document has changed since it was indexed.
+    """
+    path = Path(path)
+    index_path = Path(index_path) if index_path is not None else default_index_path(path)
+    with open(index_path, "rb") as f:
+        _check_header(json.loads(f.readline()), path)
+        span = _find(f, _entry_key(kind, name))
+    if span is None:
+        raise KeyError(f"No {kind} block named {name} in {path}")
+    offset, length = span
+    with open(path, "rb") as f:
+        f.seek(offset)
+        text = f.read(length).decode()
+    for block in read_document(text):
+        if block.kind == kind and block.name == name:
+            return block
+    raise StaleIndex(f"Index is out of date for {path}")
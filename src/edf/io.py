@@ -1,18 +1,312 @@
-from edf.block import Document
-from edf.datafy import datafy_document
+import os
+from collections.abc import Callable, Iterable, Iterator, Mapping, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Any, Optional
+
+from edf import stats
+from edf.block import Block, Document
+from edf.cache import Cache
+from edf.cancel import CancellationToken
+from edf.datafy import datafy_document, iter_datafy_document, iter_lazy_datafy_document
+from edf.include import INCLUDE_KIND, IncludeSession, iter_resolved, reject_includes
+from edf.limits import Limits
+from edf.parser import iter_document as iter_read_document
 from edf.parser import read_document
+from edf.projection import Projection, compile_projection
 from edf.schema import Schema, analyze_schema_document
+from edf.writer import dump_document as dump_document
+from edf.writer import dumps_document as dumps_document
 
 
-def loads_document(data: str) -> Document:
-    return read_document(data)
+def loads_document(
+    data: str,
+    cache: Optional[Cache] = None,
+    limits: Optional[Limits] = None,
+    cancel: Optional[CancellationToken] = None,
+    base_dir: Optional[str | os.PathLike] = None,
+) -> Document:
+    """
+    Parses a document. Given `limits` (see `edf.limits`), documents that exceed them raise
+    `LimitExceeded`; cached documents are only reused by loads with equal limits. Given `cancel`
+    (see `edf.cancel`), the load raises `Cancelled` soon after it is cancelled or times out.
+    Given `base_dir`, `include "path"` blocks are resolved relative to it (see `edf.include`);
+    otherwise they are left in the document.
+    """
+    if cache is not None:
+        if limits is None and cancel is None:
+            doc = cache.load("document", data, read_document)
+        else:
+            namespace = "document" if limits is None else f"document {limits!r}"
+            doc = cache.load(
+                namespace, data, lambda source: read_document(source, None, limits, cancel)
+            )
+    else:
+        doc = read_document(data, None, limits, cancel)
+    if base_dir is not None:
+        return list(iter_resolved(doc, base_dir))
+    return doc
 
 
-def loads_data(data: str, schema: Schema) -> list:
-    doc = read_document(data)
-    return datafy_document(schema, doc)
+def iter_document(
+    data: str,
+    cache: Optional[Cache] = None,
+    limits: Optional[Limits] = None,
+    cancel: Optional[CancellationToken] = None,
+    base_dir: Optional[str | os.PathLike] = None,
+) -> Iterator[Block]:
+    """
+    Like `loads_document`, but yields each root block as soon as it has been built.
+    """
+    if cache is not None:
+        # Cached documents are stored whole.
+        return iter(loads_document(data, cache, limits, cancel, base_dir))
+    blocks = iter_read_document(data, None, limits, cancel)
+    if base_dir is not None:
+        return iter_resolved(blocks, base_dir)
+    return blocks
+
+
+def _iter_blocks(
+    data: str,
+    cache: Optional[Cache],
+    projection: Optional[Projection],
+    projected_schema: Schema,
+    limits: Optional[Limits],
+    cancel: Optional[CancellationToken],
+    base_dir: Optional[str | os.PathLike],
+) -> Iterator[Block]:
+    if projection is not None:
+        # Include blocks stand for root blocks, so they are kept to be resolved (or rejected).
+        projection = replace(projection, blocks={**projection.blocks, INCLUDE_KIND: None})
+    blocks = _iter_projected(data, cache, projection, projected_schema, limits, cancel)
+    if base_dir is None:
+        return reject_includes(blocks)
+    return iter_resolved(blocks, base_dir, projection=projection)
+
+
+def _iter_projected(
+    data: str,
+    cache: Optional[Cache],
+    projection: Optional[Projection],
+    projected_schema: Schema,
+    limits: Optional[Limits],
+    cancel: Optional[CancellationToken],
+) -> Iterator[Block]:
+    if projection is None:
+        return iter_document(data, cache, limits, cancel)
+    if cache is not None:
+        # The projected schema determines what is built, so it identifies the projected document.
+        namespace = f"document {projected_schema!r}"
+        if limits is not None:
+            namespace += f" {limits!r}"
+        return iter(
+            cache.load(
+                namespace, data, lambda source: read_document(source, projection, limits, cancel)
+            )
+        )
+    return iter_read_document(data, projection, limits, cancel)
+
+
+def _iter_datafy(
+    schema: Schema, blocks: Iterator[Block], lazy: bool, cancel: Optional[CancellationToken]
+) -> Iterator[Mapping[str, Any]]:
+    if lazy:
+        return iter_lazy_datafy_document(schema, blocks)
+    return iter_datafy_document(schema, blocks, cancel)
+
+
+def iter_data(
+    data: str,
+    schema: Schema,
+    cache: Optional[Cache] = None,
+    fields: Optional[Sequence[str]] = None,
+    lazy: bool = False,
+    limits: Optional[Limits] = None,
+    cancel: Optional[CancellationToken] = None,
+    base_dir: Optional[str | os.PathLike] = None,
+) -> Iterator[Mapping[str, Any]]:
+    """
+    Like `loads_data`, but yields each root block's data as soon as it has been built.
+    """
+    if stats.enabled():
+        # Instrumented loads are eager, see `edf.stats`.
+        return iter(loads_data(data, schema, cache, fields, lazy, limits, cancel, base_dir))
+    projection, projected_schema = None, schema
+    if fields is not None:
+        projection, projected_schema = compile_projection(schema, fields)
+    blocks = _iter_blocks(data, cache, projection, projected_schema, limits, cancel, base_dir)
+    return _iter_datafy(projected_schema, blocks, lazy, cancel)
 
 
-def loads_schema(data: str) -> Schema:
+def loads_data(
+    data: str,
+    schema: Schema,
+    cache: Optional[Cache] = None,
+    fields: Optional[Sequence[str]] = None,
+    lazy: bool = False,
+    limits: Optional[Limits] = None,
+    cancel: Optional[CancellationToken] = None,
+    base_dir: Optional[str | os.PathLike] = None,
+) -> list:
+    """
+    Parses and datafies a document.
+    Given `fields` (see `edf.projection`), only those fields of each root block are built and
+    validated. If `lazy`, each root block's data is a `LazyData` mapping, whose sub-block fields
+    are only datafied when first read. Given `limits` or `cancel`, documents that exceed the
+    limits or take too long raise errors, see `loads_document`. Lazy fields are datafied without
+    checking `cancel`. Given `base_dir`, `include "path"` blocks are resolved relative to it (see
+    `edf.include`); otherwise documents with includes raise `ValueError`.
+    """
+    with stats.operation("loads_data") as s:
+        if s is None:
+            return list(iter_data(data, schema, cache, fields, lazy, limits, cancel, base_dir))
+
+        projection, projected_schema = None, schema
+        if fields is not None:
+            with s.phase("project"):
+                projection, projected_schema = compile_projection(schema, fields)
+        blocks = _iter_blocks(data, cache, projection, projected_schema, limits, cancel, base_dir)
+        with s.phase("datafy"):
+            return list(_iter_datafy(projected_schema, blocks, lazy, cancel))
+
+
+def load_document(path: str | os.PathLike, session: Optional[IncludeSession] = None) -> Document:
+    """
+    Reads the document in a file, resolving its `include "path"` blocks (see `edf.include`).
+    Loads made with the same `session` share the files they parse.
+    """
+    if session is None:
+        session = IncludeSession()
+    return session.load(path)
+
+
+def load_data(
+    path: str | os.PathLike, schema: Schema, session: Optional[IncludeSession] = None
+) -> list:
+    """
+    Like `load_document`, then datafies the document.
+    """
+    return datafy_document(schema, load_document(path, session))
+
+
+def _loads_schema(data: str) -> Schema:
     doc = read_document(data)
-    return analyze_schema_document(doc)
+    with stats.phase("analyze"):
+        return analyze_schema_document(doc)
+
+
+def loads_schema(data: str, cache: Optional[Cache] = None) -> Schema:
+    with stats.operation("loads_schema"):
+        if cache is not None:
+            return cache.load("schema", data, _loads_schema)
+        return _loads_schema(data)
+
+
+@dataclass
+class _Loader:
+    schema: Optional[Schema]
+    cache: Optional[Cache]
+    convert: Optional[Callable[[list], Any]]
+
+    def __call__(self, path: Path) -> tuple[Path, Any]:
+        data = path.read_text()
+        if self.schema is None:
+            result = loads_document(data, self.cache, base_dir=path.parent)
+        else:
+            result = loads_data(data, self.schema, self.cache, base_dir=path.parent)
+        if self.convert is not None:
+            result = self.convert(result)
+        return path, result
+
+
+# The loader of the current worker process, set up once by `_init_worker`.
+_worker_loader: Optional[_Loader] = None
+
+
+def _init_worker(
+    schema: Optional[Schema | str],
+    cache: Optional[Cache],
+    convert: Optional[Callable[[list], Any]],
+):
+    global _worker_loader
+    if isinstance(schema, str):
+        schema = loads_schema(schema, cache)
+    _worker_loader = _Loader(schema, cache, convert)
+
+
+def _load_in_worker(path: Path) -> tuple[Path, Any]:
+    assert _worker_loader is not None
+    return _worker_loader(path)
+
+
+def load_many(
+    paths: Iterable[str | os.PathLike],
+    schema: Optional[Schema | str] = None,
+    workers: Optional[int] = None,
+    ordered: bool = True,
+    cache: Optional[Cache] = None,
+    convert: Optional[Callable[[list], Any]] = None,
+    chunksize: int = 8,
+) -> Iterator[tuple[Path, Any]]:
+    """
+    Loads many files in a pool of `workers` processes (by default one per CPU), yielding each
+    path with its document, or its data if a `schema` is given. A schema given as source is
+    compiled once per worker. `convert`, if given, is applied to each result in the worker and
+    must be picklable, e.g. a module level function.
+    Results are yielded in the order of `paths`, or as they complete if `ordered` is false. With a
+    single worker, files are loaded in this process.
+    """
+    paths = [Path(path) for path in paths]
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(paths))
+
+    if workers <= 1:
+        if isinstance(schema, str):
+            schema = loads_schema(schema, cache)
+        yield from map(_Loader(schema, cache, convert), paths)
+        return
+
+    with Pool(workers, _init_worker, (schema, cache, convert)) as pool:
+        if ordered:
+            yield from pool.imap(_load_in_worker, paths, chunksize)
+        else:
+            yield from pool.imap_unordered(_load_in_worker, paths, chunksize)
+
+
+def load_many_threaded(
+    sources: Iterable[str],
+    schema: Optional[Schema | str] = None,
+    workers: Optional[int] = None,
+    cache: Optional[Cache] = None,
+    convert: Optional[Callable[[list], Any]] = None,
+) -> Iterator[Any]:
+    """
+    Loads many documents given as source text in a pool of `workers` threads (by default one per
+    CPU), yielding each document, or its data if a `schema` is given, in the order of `sources`.
+    Nothing is pickled, unlike with `load_many`, but threads only load documents in parallel on
+    free-threaded builds of Python.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if isinstance(schema, str):
+        schema = loads_schema(schema, cache)
+
+    def load(source: str) -> Any:
+        if schema is None:
+            result = loads_document(source, cache)
+        else:
+            result = loads_data(source, schema, cache)
+        if convert is not None:
+            result = convert(result)
+        return result
+
+    if workers <= 1:
+        yield from map(load, sources)
+        return
+
+    with ThreadPoolExecutor(workers) as executor:
+        yield from executor.map(load, sources)
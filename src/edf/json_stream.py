@@ -0,0 +1,43 @@
+"""
+Incremental JSON output, writing each item of a sequence as soon as it is available.
+"""
+
+import json
+from collections.abc import Iterable
+from typing import Any, Optional, TextIO
+
+from edf.columnar import json_default
+
+
+def dump_array(items: Iterable[Any], fp: TextIO, indent: Optional[int] = None):
+    """
+    Writes `items` to `fp` as a JSON array, formatted as `json.dump` would format a list of them.
+    Only one item is held at a time.
+    """
+    if indent is None:
+        separator, start, end = ", ", "", ""
+    else:
+        separator = ",\n" + " " * indent
+        start, end = "\n" + " " * indent, "\n"
+    fp.write("[")
+    empty = True
+    for item in items:
+        fp.write(start if empty else separator)
+        empty = False
+        text = json.dumps(item, indent=indent, default=json_default)
+        if indent is not None:
+            # Nest the item one level in. JSON text never contains raw newlines within strings.
+            text = text.replace("\n", "\n" + " " * indent)
+        fp.write(text)
+    if not empty:
+        fp.write(end)
+    fp.write("]")
+
+
+def dump_ndjson(items: Iterable[Any], fp: TextIO):
+    """
+    Writes `items` to `fp` as newline-delimited JSON, one item per line.
+    """
+    for item in items:
+        json.dump(item, fp, default=json_default)
+        fp.write("\n")
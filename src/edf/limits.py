@@ -0,0 +1,46 @@
+"""
+Limits on the size of documents, for reading input that can't be trusted.
+
+A `Limits` given to `edf.parser.read_document` (or `edf.io.loads_data` and friends) caps the input's
+size in bytes, the number of tokens, the depth of nesting, the length of string literals, the
+number of attributes of any one block and the total number of blocks. Each limit is checked as the
+lexer or parser reaches it, so an input over a limit stops being read straight away, with a
+`LimitExceeded` error saying which limit and where. Limits left as None aren't checked.
+"""
+
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass(frozen=True)
+class Limits:
+    max_bytes: Optional[int] = None
+    max_tokens: Optional[int] = None
+    max_depth: Optional[int] = None
+    max_string_length: Optional[int] = None
+    max_attributes: Optional[int] = None
+    max_blocks: Optional[int] = None
+
+    def check_source(self, source: str):
+        """
+        Checks the size of a source text in (UTF-8 encoded) bytes.
+        """
+        if self.max_bytes is None or len(source) * 4 <= self.max_bytes:
+            return
+        if len(source) > self.max_bytes or len(source.encode()) > self.max_bytes:
+            raise LimitExceeded("max_bytes", self.max_bytes)
+
+
+@dataclass
+class LimitExceeded(ValueError):
+    # The name of the `Limits` field that was exceeded, and its value.
+    limit: str
+    maximum: int
+    # Where in the source the limit was exceeded, if the input got that far.
+    offset: Optional[int] = None
+    line: Optional[int] = None
+    col: Optional[int] = None
+
+    def __str__(self) -> str:
+        where = f" at line {self.line}, column {self.col}" if self.line is not None else ""
+        return f"Input exceeds {self.limit} of {self.maximum}{where}"
@@ -0,0 +1,115 @@
+"""
+Overlaying documents on a base document, as in building a configuration from a base document and
+environment and host overlays.
+
+Blocks are matched by kind and name, level by level: a root block of an overlay merges into the
+base's root block of the same kind and name, and its children merge into that block's children in
+the same way. Where a kind and name occur more than once among the blocks of a level (anonymous
+blocks of the same kind, say), they are matched in order, the first with the first and so on.
+
+When two blocks merge:
+
+- the overlay's attributes replace the base's attributes of the same name, and the base's other
+  attributes are kept, in their order, followed by the overlay's new attributes;
+- the overlay's children merge into the base's children, and children that match nothing are
+  added after the base's children;
+- if either block is a single-value block, the overlay's block replaces the base's.
+
+Overlays can't remove blocks or attributes.
+
+The result shares structure with its inputs: only the blocks on the path to a change are copied,
+and every other block (and list of children) is the base's or overlay's own object, so the cost of
+an overlay depends on its own size rather than the base's. In turn the result shouldn't be
+modified, as that would modify the inputs too.
+"""
+
+from collections.abc import Sequence
+from typing import Optional
+
+from edf.block import Block, Document
+from edf.traverse import fold
+
+
+class _Level:
+    """
+    The blocks of a level of the base that overlay blocks are matched against, and what the overlay
+    does to them.
+    """
+
+    __slots__ = ("blocks", "index", "counts", "slots")
+
+    def __init__(self, blocks: Sequence[Block]):
+        self.blocks = blocks
+        # Positions of the blocks by kind and name, built on the first match.
+        self.index: Optional[dict[tuple[str, Optional[str]], list[int]]] = None
+        # How many overlay blocks of each kind and name have been matched so far.
+        self.counts: dict[tuple[str, Optional[str]], int] = {}
+        # For each overlay block in turn, the position of the block it replaces, or None.
+        self.slots: list[Optional[int]] = []
+
+    def match(self, block: Block) -> Optional[Block]:
+        if self.index is None:
+            self.index = {}
+            for i, base in enumerate(self.blocks):
+                self.index.setdefault((base.kind, base.name), []).append(i)
+        key = (block.kind, block.name)
+        n = self.counts.get(key, 0)
+        self.counts[key] = n + 1
+        positions = self.index.get(key, ())
+        if n < len(positions):
+            self.slots.append(positions[n])
+            return self.blocks[positions[n]]
+        self.slots.append(None)
+        return None
+
+    def apply(self, results: list[Block]) -> list[Block]:
+        blocks = list(self.blocks)
+        for slot, result in zip(self.slots, results):
+            if slot is None:
+                blocks.append(result)
+            else:
+                blocks[slot] = result
+        return blocks
+
+
+# The state of an overlay block: the base block it merges into, and the level of its children.
+type _State = tuple[Optional[Block], Optional[_Level]]
+
+
+def _enter(block: Block, parent: _State) -> tuple[_State, Sequence[Block]]:
+    _, level = parent
+    assert level is not None
+    base = level.match(block)
+    if base is None or block.value is not None or base.value is not None:
+        # Nothing to merge with, or a replacement.
+        return (None, None), ()
+    if not block.children:
+        return (base, None), ()
+    return (base, _Level(base.children)), block.children
+
+
+def _leave(block: Block, state: _State, results: list[Block]) -> Block:
+    base, level = state
+    if base is None:
+        return block
+    if not block.attributes and level is None:
+        return base
+    if block.attributes:
+        attributes = {**base.attributes, **block.attributes}
+    else:
+        attributes = base.attributes
+    children = base.children if level is None else level.apply(results)
+    return Block(base.kind, base.name, None, attributes, children)
+
+
+def overlay(base: Document, *layers: Document) -> Document:
+    """
+    Merges each of `layers` in turn on top of `base`, returning a new document that shares every
+    unchanged block with its inputs.
+    """
+    result = list(base)
+    for layer in layers:
+        level = _Level(result)
+        merged = [fold(block, (None, level), _leave, _enter) for block in layer]
+        result = level.apply(merged)
+    return result
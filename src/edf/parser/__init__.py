@@ -1,11 +1,87 @@
-from edf.block import Document
-from edf.parser.build import build
+from collections.abc import Iterator
+from typing import Optional
+
+from edf import stats
+from edf.block import Block, Document
+from edf.cancel import CancellationToken
+from edf.limits import Limits
+from edf.parser.build import build, iter_build
 from edf.parser.lex import tokenize
+from edf.parser.minified import iter_minified
 from edf.parser.parse import parse
+from edf.projection import Projection
+
+
+def read_document(
+    source: str,
+    projection: Optional[Projection] = None,
+    limits: Optional[Limits] = None,
+    cancel: Optional[CancellationToken] = None,
+) -> Document:
+    """
+    Reads a document. Given `limits`, raises `edf.limits.LimitExceeded` as soon as the source is
+    found to exceed one of them. Given `cancel`, raises `edf.cancel.Cancelled` soon after it is
+    cancelled or times out.
+    """
+    if limits is not None:
+        limits.check_source(source)
+    if cancel is not None:
+        cancel.check()
+    with stats.operation("read_document") as s:
+        if s is None:
+            return build(parse(tokenize(source, limits, cancel), limits, cancel), projection, cancel)
+
+        with s.phase("lex"):
+            tokens = tokenize(source, limits, cancel)
+        with s.phase("parse"):
+            nodes = parse(tokens, limits, cancel)
+        with s.phase("build"):
+            doc = build(nodes, projection, cancel)
+
+        s.tokens += len(tokens)
+        s.fabricated_tokens += sum(token.fabricated for token in tokens)
+        s.nodes += len(nodes)
+        s.blocks += _count_blocks(doc)
+        return doc
+
+
+def _count_blocks(doc: Document) -> int:
+    count = 0
+    blocks = list(doc)
+    while blocks:
+        count += 1
+        blocks.extend(blocks.pop().children)
+    return count
+
+
+def read_minified(source: str) -> Document:
+    """
+    Reads a document in the minified dialect, see `edf.parser.minified`.
+    """
+    with stats.operation("read_minified") as s:
+        if s is None:
+            return list(iter_minified(source))
+
+        with s.phase("parse"):
+            doc = list(iter_minified(source))
+        s.blocks += _count_blocks(doc)
+        return doc
 
 
-def read_document(source: str) -> Document:
-    return build(parse(tokenize(source)))
+def iter_document(
+    source: str,
+    projection: Optional[Projection] = None,
+    limits: Optional[Limits] = None,
+    cancel: Optional[CancellationToken] = None,
+) -> Iterator[Block]:
+    if stats.enabled():
+        # Instrumented loads are eager, see `edf.stats`.
+        return iter(read_document(source, projection, limits, cancel))
+    if limits is not None:
+        limits.check_source(source)
+    if cancel is not None:
+        cancel.check()
+    return iter_build(parse(tokenize(source, limits, cancel), limits, cancel), projection, cancel)
 
 
-__all__ = ["read_document"]
+__all__ = ["iter_document", "iter_minified", "read_document", "read_minified"]
@@ -1,10 +1,13 @@
-from collections.abc import Sequence
+from array import array
+from collections.abc import Iterable, Iterator
 from dataclasses import dataclass
-from typing import Any
+from typing import Any, Optional
 
 from edf.block import Block, Document
+from edf.cancel import CancellationToken, checked
 from edf.parser.lex import TokenId
 from edf.parser.parse import Node, NodeId
+from edf.projection import Projection
 
 
 @dataclass
@@ -13,15 +16,101 @@ class StackElem:
     value: Any = None
 
 
-def build(parse_tree: Sequence[Node]) -> Document:
+def number_list(texts: list[str]) -> array | list:
+    """
+    Converts the texts of a list of number literals in bulk, to an `array("q")` if they are all
+    integers and an `array("d")` otherwise, or to a list if an integer doesn't fit in 64 bits.
+    """
+    try:
+        if "." in "".join(texts):
+            return array("d", map(float, texts))
+        return array("q", map(int, texts))
+    except OverflowError:
+        return [float(text) if "." in text else int(text) for text in texts]
+
+
+def list_value(values: list) -> array | list:
+    """
+    The value of a list literal with the given items: an array if they're all numbers (see
+    `number_list`), and otherwise the list itself.
+    """
+    if not values:
+        return values
+    try:
+        if all(type(value) is int for value in values):
+            return array("q", values)
+        if all(type(value) is int or type(value) is float for value in values):
+            return array("d", values)
+    except OverflowError:
+        pass
+    return values
+
+
+def string_value(token: str) -> str:
+    # The value of a string literal token. `edf.parser.minified` reads strings with this too, so
+    # that both readers agree on escapes.
+    return eval(token)  # FIXME: proper string unescaping
+
+
+def literal_value(node: Node) -> Any:
+    match node.kind.id:
+        case NodeId.LIT_STRING:
+            return string_value(node.token.value)
+        case NodeId.LIT_NUMBER:
+            s = node.token.value
+            return float(s) if "." in s else int(s)
+        case NodeId.LIT_BOOL:
+            match node.token.id:
+                case TokenId.KW_TRUE:
+                    return True
+                case TokenId.KW_FALSE:
+                    return False
+                case _:
+                    raise ValueError(f"Unexpected token id: {node.token.id}")
+        case _:
+            raise ValueError(f"Unexpected node in list: {node.kind.id}")
+
+
+def skip_until(nodes: Iterator[Node], open_id: NodeId, close_id: NodeId):
+    """
+    Advances `nodes` past the node that closes an already consumed `open_id` node.
+    """
+    depth = 1
+    for node in nodes:
+        if node.kind.id == open_id:
+            depth += 1
+        elif node.kind.id == close_id:
+            depth -= 1
+            if depth == 0:
+                return
+
+
+def iter_build(
+    parse_tree: Iterable[Node],
+    projection: Optional[Projection] = None,
+    cancel: Optional[CancellationToken] = None,
+) -> Iterator[Block]:
+    """
+    Builds the blocks described by a parse tree, yielding each root block as soon as it is closed.
+    Given a `projection`, blocks and attributes outside it are skipped without being built.
+    """
     stack: list[StackElem] = []
 
-    for node in parse_tree:
+    # Projections of the enclosing blocks. `projection` is that of the block being built, which is
+    # None within a block that is being kept whole.
+    projecting = projection is not None
+    projection_stack: list[Optional[Projection]] = []
+
+    nodes = iter(parse_tree) if cancel is None else checked(parse_tree, cancel)
+    for node in nodes:
         match node.kind.id:
             case NodeId.ATTRIBUTE_INTRODUCER:
+                if projection is not None and node.token.value not in projection.attributes:
+                    skip_until(nodes, NodeId.ATTRIBUTE_INTRODUCER, NodeId.ATTRIBUTE)
+                    continue
                 stack.append(StackElem(node, node.token.value))
             case NodeId.LIT_STRING:
-                stack.append(StackElem(node, eval(node.token.value))) # FIXME: proper string unescaping
+                stack.append(StackElem(node, string_value(node.token.value)))
             case NodeId.LIT_NUMBER:
                 s = node.token.value
                 if "." in s:
@@ -37,28 +126,65 @@ def build(parse_tree: Sequence[Node]) -> Document:
                         stack.append(StackElem(node, False))
                     case _:
                         raise ValueError(f"Unexpected token id: {node.token.id}")
+            case NodeId.LIST_START:
+                # Lists of numbers are converted in bulk, from the texts of their items.
+                numbers = []
+                for item in nodes:
+                    if item.kind.id != NodeId.LIT_NUMBER:
+                        break
+                    numbers.append(item)
+                if item.kind.id == NodeId.LIST:
+                    texts = [number.token.value for number in numbers]
+                    stack.append(StackElem(item, number_list(texts) if texts else []))
+                    continue
+                # A list of other values, which the LIST case below completes.
+                stack.append(StackElem(node))
+                for number in numbers:
+                    stack.append(StackElem(number, literal_value(number)))
+                stack.append(StackElem(item, literal_value(item)))
+            case NodeId.LIST:
+                idx = -1
+                while stack[idx].node.kind.id != NodeId.LIST_START:
+                    idx -= 1
+                values = [elem.value for elem in stack[idx + 1 :]]
+                del stack[idx:]
+                stack.append(StackElem(node, list_value(values)))
             case NodeId.ATTRIBUTE:
                 idx = -1
                 while stack[idx].node.kind.id != NodeId.ATTRIBUTE_INTRODUCER:
                     idx -= 1
                 children = stack[idx:]
-                stack = stack[:idx]
+                del stack[idx:]
                 assert len(children) == 3
                 attribute_name = children[0].value
                 attribute_value = children[2].value
                 stack.append(StackElem(node, (attribute_name, attribute_value)))
             case NodeId.BLOCK_INTRODUCER:
+                if projecting:
+                    if projection is None:
+                        child_projection = None
+                    elif node.token.value in projection.blocks:
+                        child_projection = projection.blocks[node.token.value]
+                    else:
+                        skip_until(nodes, NodeId.BLOCK_INTRODUCER, NodeId.BLOCK)
+                        continue
+                    projection_stack.append(projection)
+                    projection = child_projection
                 stack.append(StackElem(node, node.token.value))
             case NodeId.BLOCK_ID:
+                if projection is not None and not projection.keep_name:
+                    continue
                 stack.append(StackElem(node, node.token.value))
             case NodeId.BLOCK:
+                if projecting:
+                    projection = projection_stack.pop()
                 idx = -1
                 while stack[idx].node.kind.id != NodeId.BLOCK_INTRODUCER:
                     idx -= 1
                 
                 # Get children
                 children = stack[idx:]
-                stack = stack[:idx]
+                del stack[idx:]
 
                 # Ensure we have at least the kind and body start
                 assert len(children) >= 2 # At least a kind and body start
@@ -98,13 +224,23 @@ def build(parse_tree: Sequence[Node]) -> Document:
                     block = Block(kind, block_id, value=block_value)
                 else:
                     block = Block(kind, block_id, attributes=attributes, children=blocks)
-                stack.append(StackElem(node, block))
+                if not stack:
+                    # A root block, nothing more will be added to it.
+                    yield block
+                else:
+                    stack.append(StackElem(node, block))
             case _:
                 stack.append(StackElem(node))
 
-    assert all(isinstance(elem.value, Block) for elem in stack), "Expected all root-level elements to be blocks"
+    assert not stack, "Expected all root-level elements to be blocks"
+
 
-    return [elem.value for elem in stack]
+def build(
+    parse_tree: Iterable[Node],
+    projection: Optional[Projection] = None,
+    cancel: Optional[CancellationToken] = None,
+) -> Document:
+    return list(iter_build(parse_tree, projection, cancel))
                 
 
 if __name__ == "__main__":
@@ -1,6 +1,11 @@
 import re
+import sys
 from dataclasses import dataclass, field
 from enum import Enum
+from typing import Optional
+
+from edf.cancel import CHECK_INTERVAL, CancellationToken
+from edf.limits import LimitExceeded, Limits
 
 
 @dataclass
@@ -11,6 +16,16 @@ class LexicalError(BaseException):
     message: str
 
 
+def describe_error(e: BaseException) -> str:
+    """
+    Describes an error from reading a document in one line, starting with the line and column of
+    lexical errors.
+    """
+    if isinstance(e, LexicalError):
+        return f"{e.line}:{e.col}: {e.message}"
+    return str(e) or type(e).__name__
+
+
 class TokenId(Enum):
     EOF = "EOF"
     LPAREN = "LPAREN"
@@ -92,6 +107,7 @@ class LexicalAnalyzer:
 
     # Configuration.
     strict: bool = False
+    limits: Optional[Limits] = None
 
     def match_token(self, token_map: list[tuple[str, TokenId]], word: bool = False) -> Token | None:
         for token_str, token_id in token_map:
@@ -107,6 +123,9 @@ class LexicalAnalyzer:
                 return token
         return None
 
+    def limit_exceeded(self, limit: str, maximum: int, token: Token) -> LimitExceeded:
+        return LimitExceeded(limit, maximum, token.offset, token.line, token.col)
+
     def emit_token(self, token: Token):
         """
         Emits a token, handling any extra token insertion logic.
@@ -114,6 +133,10 @@ class LexicalAnalyzer:
         - Auto inserts semicolons where needed
         """
 
+        # Whether the token is inside a list, where lines continue the list's value rather than
+        # starting new items. Checked before the token itself opens or closes a list.
+        in_list = bool(self.open_delimiters) and self.open_delimiters[-1] == TokenId.RBRACKET
+
         # Right delimiter insertion logic.
         # Whenever we emit a left delimiter (i.e. one of "(", "{", "["), we push
         # the corresponding right delimiter to the open_delimiters stack.
@@ -128,6 +151,12 @@ class LexicalAnalyzer:
             # Push right delimiter to open_delimiters stack.
             right_delimiter = left_delimiter_to_right_delimiter[token.id]
             self.open_delimiters.append(right_delimiter)
+            if (
+                self.limits is not None
+                and self.limits.max_depth is not None
+                and len(self.open_delimiters) > self.limits.max_depth
+            ):
+                raise self.limit_exceeded("max_depth", self.limits.max_depth, token)
         elif token.id in right_delimiters:
             # We have a right delimiter, so let's close any non-closed delimiters that don't match.
             if not self.strict:
@@ -201,7 +230,7 @@ class LexicalAnalyzer:
                             fabricated=True,
                         )
                     )
-        elif self.first_token_on_line and (self.tokens[-1].id not in {TokenId.RBRACE} if self.tokens else True):
+        elif self.first_token_on_line and not in_list and (self.tokens[-1].id not in {TokenId.RBRACE} if self.tokens else True):
             # If we're at the start of a line, we _may_ need to insert a
             # semicolon. Specifically if we're inside a brace block and the
             # token's indentation is <= the block's indentation.
@@ -314,6 +343,18 @@ class LexicalAnalyzer:
             self.col += size
         elif match := lit_string_pattern.match(self.source, self.offset):
             size = len(match.group(0))
+            if (
+                self.limits is not None
+                and self.limits.max_string_length is not None
+                and size - 2 > self.limits.max_string_length
+            ):
+                raise LimitExceeded(
+                    "max_string_length",
+                    self.limits.max_string_length,
+                    self.offset,
+                    self.line,
+                    self.col,
+                )
             self.emit_token(
                 Token(TokenId.LIT_STRING, match.group(0), self.offset, size, self.line, self.col)
             )
@@ -329,11 +370,30 @@ def rebuild_string(source: str, tokens: list[Token]) -> str:
     return "·".join(source[token.offset : token.offset + token.size] for token in tokens)
 
 
-def tokenize(source: str) -> list[Token]:
-    lexer = LexicalAnalyzer(source)
+def tokenize(
+    source: str, limits: Optional[Limits] = None, cancel: Optional[CancellationToken] = None
+) -> list[Token]:
+    lexer = LexicalAnalyzer(source, limits=limits)
+    max_tokens = None if limits is None else limits.max_tokens
+    if max_tokens is None and cancel is None:
+        while lexer.read_token():
+            pass
+        return lexer.tokens
+    tokens = lexer.tokens
+    # The token counts past which the token limit is exceeded and the cancellation token is next
+    # checked.
+    token_limit = sys.maxsize if max_tokens is None else max_tokens
+    next_check = sys.maxsize if cancel is None else CHECK_INTERVAL
     while lexer.read_token():
-        pass
-    return lexer.tokens
+        if len(tokens) > token_limit:
+            raise lexer.limit_exceeded("max_tokens", token_limit, tokens[token_limit])
+        if len(tokens) >= next_check:
+            cancel.check()  # type: ignore[union-attr]
+            next_check = len(tokens) + CHECK_INTERVAL
+    if len(tokens) > token_limit:
+        # Closing braces and semicolons added at the end of the input.
+        raise lexer.limit_exceeded("max_tokens", token_limit, tokens[token_limit])
+    return tokens
 
 
 def test(string: str) -> str:
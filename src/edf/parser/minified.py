@@ -0,0 +1,165 @@
+"""
+A fast lane for minified EDF, the dialect written by `edf.writer.dump_minified` for documents that
+machines produce and consume.
+
+Minified EDF is EDF with every attribute ended by an explicit semicolon and no meaningful
+whitespace: there is no semicolon insertion, no offside rule, no closing of unclosed braces and no
+comments, so it can be read without any of the layout tracking done by `LexicalAnalyzer`. The
+source is split into tokens by a single regular expression, and blocks are built straight from the
+token text without intermediate token objects or parse nodes. Minified documents are also valid
+EDF, and read the same with `read_document`.
+"""
+
+import json
+import re
+from collections.abc import Iterator
+from typing import Any
+
+from edf.block import Block
+from edf.parser.build import list_value, string_value
+from edf.parser.lex import LexicalError
+
+# A token is a name, a number, a string or a punctuation character. Anything else is matched as a
+# single character so that it can be reported.
+_token_pattern = re.compile(
+    r"""\s*(
+        [a-z_][a-zA-Z0-9'_]*\#?
+        |-?[1-9][0-9]*(?:\.[0-9]+)?
+        |"[^"\\\r\n]*(?:\\[^\r\n][^"\\\r\n]*)*"
+        |[{};=,\[\]]
+        |.
+    )""",
+    re.VERBOSE,
+)
+
+# A backslash that may not start an escape that JSON and `string_value` both read the same: those
+# of quotes, backslashes and control characters, and of code points outside the surrogates, which
+# JSON would pair up.
+_other_escape = re.compile(r'\\(?!["\\bfnrt]|u(?![dD][89abAB])[0-9a-fA-F]{4})')
+
+_keywords = {"true": True, "false": False}
+_name_starts = frozenset("abcdefghijklmnopqrstuvwxyz_")
+_number_starts = frozenset("-123456789")
+
+
+def _error(source: str, index: int, message: str) -> LexicalError:
+    # Token positions aren't kept, so the failing token is found again.
+    offset = len(source)
+    for i, match in enumerate(_token_pattern.finditer(source)):
+        if i == index:
+            offset = match.start(1)
+            break
+    line = source.count("\n", 0, offset) + 1
+    col = offset - source.rfind("\n", 0, offset)
+    return LexicalError(offset, line, col, message)
+
+
+def _value(token: str):
+    # Returns the value of a literal token, or raises KeyError for other tokens.
+    c = token[:1]
+    if c == '"':
+        if len(token) == 1:
+            raise KeyError(token)
+        if "\\" not in token:
+            return token[1:-1]
+        if _other_escape.search(token):
+            return string_value(token)
+        # The writer's escapes are JSON's, which are much quicker to decode as such.
+        return json.loads(token)
+    elif c in _number_starts and token != "-":
+        return float(token) if "." in token else int(token)
+    return _keywords[token]
+
+
+def _is_name(token: str) -> bool:
+    return token[:1] in _name_starts and token not in _keywords
+
+
+def _list(source: str, tokens: list[str], i: int) -> tuple[Any, int]:
+    # Reads the list whose "[" is at `i`, returning its value and the index after its "]".
+    i += 1
+    values = []
+    while tokens[i] != "]":
+        try:
+            values.append(_value(tokens[i]))
+        except KeyError:
+            raise _error(source, i, "Expected a value in list")
+        i += 1
+        if tokens[i] == ",":
+            i += 1
+        elif tokens[i] != "]":
+            raise _error(source, i, "Expected ',' or ']' in list")
+    return list_value(values), i + 1
+
+
+def iter_minified(source: str) -> Iterator[Block]:
+    """
+    Reads a minified document, yielding each root block as soon as it has been built.
+    """
+    tokens = _token_pattern.findall(source)
+    # The end of the source, repeated so that looking ahead never runs past it.
+    tokens.extend(("", "", "", ""))
+    # The blocks that are open, innermost last.
+    stack: list[Block] = []
+    i = 0
+
+    while True:
+        token = tokens[i]
+        if token == "}":
+            if not stack:
+                raise _error(source, i, "Unexpected '}'")
+            block = stack.pop()
+            i += 1
+        elif not token:
+            if stack:
+                raise _error(source, i, f"Unclosed block {stack[-1].kind}")
+            return
+        elif _is_name(token):
+            if tokens[i + 1] == "=":
+                # An attribute.
+                if not stack:
+                    raise _error(source, i, "Attribute outside a block")
+                if tokens[i + 2] == "[":
+                    value, j = _list(source, tokens, i + 2)
+                else:
+                    try:
+                        value = _value(tokens[i + 2])
+                    except KeyError:
+                        raise _error(source, i + 2, f"Expected a value for attribute {token}")
+                    j = i + 3
+                stack[-1].attributes[token] = value
+                if tokens[j] != ";":
+                    raise _error(source, j, f"Expected ';' after attribute {token}")
+                i = j + 1
+                continue
+
+            block = Block(token)
+            i += 1
+            if _is_name(tokens[i]):
+                block.name = tokens[i]
+                i += 1
+            if tokens[i] != "{":
+                raise _error(source, i, f"Expected '{{' after block {token}")
+            i += 1
+            if tokens[i] == "[":
+                block.value, i = _list(source, tokens, i)
+            else:
+                try:
+                    block.value = _value(tokens[i])
+                except KeyError:
+                    stack.append(block)
+                    continue
+                i += 1
+            # A single-value block.
+            if tokens[i] == ";":
+                i += 1
+            if tokens[i] != "}":
+                raise _error(source, i, f"Expected '}}' after the value of block {token}")
+            i += 1
+        else:
+            raise _error(source, i, f"Unexpected {token!r}")
+
+        if stack:
+            stack[-1].children.append(block)
+        else:
+            yield block
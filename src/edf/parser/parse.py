@@ -3,6 +3,8 @@ from dataclasses import dataclass
 from enum import Enum
 from typing import Optional
 
+from edf.cancel import CHECK_INTERVAL, CancellationToken
+from edf.limits import LimitExceeded, Limits
 from edf.parser.lex import Token, TokenId
 
 
@@ -17,9 +19,12 @@ class NodeId(Enum):
     LIT_STRING = "LIT_STRING"
     LIT_NUMBER = "LIT_NUMBER"
     LIT_BOOL = "LIT_BOOL"
+    LIST_START = "LIST_START"
+    LIST = "LIST"
 
 
-@dataclass
+# Node kinds are shared by every parse, including parses in other threads, so they are immutable.
+@dataclass(frozen=True)
 class NodeKind:
     id: NodeId
     fixed_num_children: Optional[int] = 0
@@ -27,7 +32,7 @@ class NodeKind:
 
     def __post_init__(self):
         if self.bracket is not None and self.fixed_num_children == 0:
-            self.fixed_num_children = None
+            object.__setattr__(self, "fixed_num_children", None)
         if self.fixed_num_children is None and self.bracket is None:
             raise ValueError("Must specify either fixed_num_children or bracket")
         if self.fixed_num_children is not None and self.bracket is not None:
@@ -47,6 +52,9 @@ node_lit_string = NodeKind(NodeId.LIT_STRING)
 node_lit_number = NodeKind(NodeId.LIT_NUMBER)
 node_lit_bool = NodeKind(NodeId.LIT_BOOL)
 
+node_list_start = NodeKind(NodeId.LIST_START)
+node_list = NodeKind(NodeId.LIST, bracket=node_list_start)
+
 
 node_kinds = {
     NodeId.BLOCK_INTRODUCER: node_block_introducer,
@@ -59,6 +67,8 @@ node_kinds = {
     NodeId.LIT_STRING: node_lit_string,
     NodeId.LIT_NUMBER: node_lit_number,
     NodeId.LIT_BOOL: node_lit_bool,
+    NodeId.LIST_START: node_list_start,
+    NodeId.LIST: node_list,
 }
 
 
@@ -79,12 +89,16 @@ class StateId(Enum):
     ATTRIBUTE_ASSIGNMENT = "ATTRIBUTE_ASSIGNMENT"
     ATTRIBUTE_VALUE = "ATTRIBUTE_VALUE"
     VALUE = "VALUE"
+    LIST_ITEM = "LIST_ITEM"
+    LIST_SEPARATOR = "LIST_SEPARATOR"
 
 
 @dataclass
 class State:
     id: StateId
     start_token_idx: int
+    # The number of attributes read so far, in a block body state.
+    attributes: int = 0
 
 
 class Parser:
@@ -93,11 +107,32 @@ class Parser:
     state_stack: list[State]
     token_index: int
 
-    def __init__(self, tokens: Sequence[Token]):
+    def __init__(
+        self,
+        tokens: Sequence[Token],
+        limits: Optional[Limits] = None,
+        cancel: Optional[CancellationToken] = None,
+    ):
         self.tokens = tokens
+        self.cancel = cancel
         self.tree = []
         self.state_stack = [State(StateId.DOC, 0)]
         self.token_index = 0
+        self.blocks = 0
+        self.max_blocks = None if limits is None else limits.max_blocks
+        self.max_attributes = None if limits is None else limits.max_attributes
+
+    def count_block(self, token: Token):
+        self.blocks += 1
+        if self.max_blocks is not None and self.blocks > self.max_blocks:
+            raise LimitExceeded("max_blocks", self.max_blocks, token.offset, token.line, token.col)
+
+    def count_attribute(self, body: State, token: Token):
+        body.attributes += 1
+        if self.max_attributes is not None and body.attributes > self.max_attributes:
+            raise LimitExceeded(
+                "max_attributes", self.max_attributes, token.offset, token.line, token.col
+            )
 
     def push_state(self, state: State):
         self.state_stack.append(state)
@@ -147,6 +182,7 @@ class Parser:
                 # The root level. We encounter a block introducer.
                 # So lets push the block introducer state and emit a node, consuming the token.
                 token = self.consume()
+                self.count_block(token)
                 self.push_state(State(StateId.BLOCK_INTRODUCER, self.token_index))
                 self.emit_node(node_block_introducer, token)
             case StateId.BLOCK_INTRODUCER, TokenId.ID_NAME:
@@ -154,6 +190,16 @@ class Parser:
                 state.id = StateId.BLOCK_NAMED
                 self.push_state(state)
                 self.emit_node(node_block_id, self.consume())
+            case StateId.BLOCK_INTRODUCER | StateId.BLOCK_NAMED, TokenId.LIT_STRING if len(self.state_stack) == 2:
+                # A root block whose body is a single string can be written without braces, as in
+                # `include "common.edf"`. The string token stands in for the missing braces.
+                token = self.consume()
+                self.pop_state()
+                self.emit_node(node_block_body_start, token)
+                self.emit_node(node_lit_string, token)
+                self.emit_node(node_block, token)
+                if self.token_index < len(self.tokens):
+                    self.consume_if(TokenId.SEMICOLON)
             case StateId.BLOCK_INTRODUCER | StateId.BLOCK_NAMED, TokenId.LBRACE:
                 token = self.consume()
                 self.push_state(State(StateId.BLOCK_BODY_UNKNOWN, self.token_index))
@@ -180,11 +226,13 @@ class Parser:
                 if self.tokens[self.token_index + 1].id == TokenId.EQUALS:
                     # We're parsing an attribute.
                     token = self.consume()
+                    self.count_attribute(state, token)
                     self.push_state(State(StateId.ATTRIBUTE_INTRODUCER, self.token_index))
                     self.emit_node(node_attribute_introducer, token)
                 else:
                     # We're parsing a block.
                     token = self.consume()
+                    self.count_block(token)
                     self.push_state(State(StateId.BLOCK_INTRODUCER, self.token_index))
                     self.emit_node(node_block_introducer, token)
             case StateId.BLOCK_BODY_UNKNOWN, _:
@@ -214,6 +262,27 @@ class Parser:
                     case _:
                         raise ValueError(f"Unexpected token {token.id}")
                 self.pop_state()
+            case StateId.VALUE, TokenId.LBRACKET:
+                # A list, which replaces the value state. Lists hold literals only, not other lists.
+                token = self.consume()
+                self.pop_state()
+                self.push_state(State(StateId.LIST_ITEM, self.token_index))
+                self.emit_node(node_list_start, token)
+            case StateId.LIST_ITEM, TokenId.LIT_STRING | TokenId.LIT_NUM_DEC | TokenId.KW_TRUE | TokenId.KW_FALSE:
+                self.pop_state()
+                state.id = StateId.LIST_SEPARATOR
+                self.push_state(state)
+                self.push_state(State(StateId.VALUE, self.token_index))
+            case StateId.LIST_SEPARATOR, TokenId.COMMA:
+                self.pop_state()
+                state.id = StateId.LIST_ITEM
+                self.push_state(state)
+                self.consume_discard()
+            case StateId.LIST_ITEM | StateId.LIST_SEPARATOR, TokenId.RBRACKET:
+                # A trailing comma is allowed.
+                token = self.consume()
+                self.pop_state()
+                self.emit_node(node_list, token)
             case StateId.ATTRIBUTE_VALUE, TokenId.SEMICOLON:
                 # Close the ATTRIBUTE_VALUE state and emit the ATTRIBUTE_ASSIGNMENT node.
                 self.pop_state()
@@ -222,12 +291,25 @@ class Parser:
             case _, _:
                 raise ValueError(f"Unexpected state {state.id} with token {self.tokens[self.token_index].id}")
     def build_tree(self):
+        if self.cancel is None:
+            while self.token_index < len(self.tokens):
+                self.step()
+            return
+        countdown = CHECK_INTERVAL
         while self.token_index < len(self.tokens):
             self.step()
-
-
-def parse(tokens: Sequence[Token]) -> Sequence[Node]:
-    parser = Parser(tokens)
+            countdown -= 1
+            if not countdown:
+                self.cancel.check()
+                countdown = CHECK_INTERVAL
+
+
+def parse(
+    tokens: Sequence[Token],
+    limits: Optional[Limits] = None,
+    cancel: Optional[CancellationToken] = None,
+) -> Sequence[Node]:
+    parser = Parser(tokens, limits, cancel)
     parser.build_tree()
     return parser.tree
 
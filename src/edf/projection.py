@@ -0,0 +1,163 @@
+"""
+Projection masks: selecting a subset of fields to load from each top-level entity.
+
+A mask is a list of field paths, as they appear in datafied output. Each path is a dot separated
+list of fields. Fields of `many` sub-blocks are written with a `[*]` suffix, so `inners[*].bar`
+selects the `bar` attribute of every block in the `inners` field. A path that ends on a sub-block
+field selects those sub-blocks whole.
+
+The mask is checked against a schema and compiled into a `Projection`, which tells `build` which
+blocks and attributes it can skip, and carries a schema pruned to match for `datafy_document`.
+"""
+
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+from typing import Optional
+
+from edf.block import Block
+from edf.schema import BlockSchema, Schema, SubBlockSchema
+from edf.traverse import fold
+
+
+@dataclass
+class Projection:
+    # Schema of the fields that remain, to datafy the projected blocks with.
+    schema: Optional[BlockSchema] = None
+
+    # Whether to keep the block's name, i.e. whether `id` was selected.
+    keep_name: bool = False
+
+    # Attributes to keep.
+    attributes: set[str] = field(default_factory=set)
+
+    # Child block kinds (and their aliases) to keep. A projection of `None` keeps the whole child.
+    blocks: dict[str, Optional["Projection"]] = field(default_factory=dict)
+
+
+def _project_block(schema: BlockSchema, paths: Sequence[Sequence[str]]) -> Projection:
+    attribute_schemas = {attribute.name: attribute for attribute in schema.attributes}
+    sub_block_schemas = {sub_block.field: sub_block for sub_block in schema.sub_blocks}
+
+    projection = Projection()
+    # Paths to project each selected sub-block field with. `None` selects the field whole.
+    sub_block_paths: dict[str, Optional[list[Sequence[str]]]] = {}
+    for head, *rest in paths:
+        many = head.endswith("[*]")
+        name = head.removesuffix("[*]")
+        if name in sub_block_schemas:
+            multiplicity = sub_block_schemas[name].multiplicity
+            if many and multiplicity != "many":
+                raise ValueError(f"Field {name} of block {schema.kind} is not a list")
+            if not many and multiplicity == "many":
+                raise ValueError(f"Field {name} of block {schema.kind} is a list, use {name}[*]")
+            if not rest:
+                sub_block_paths[name] = None
+            elif name not in sub_block_paths:
+                sub_block_paths[name] = [rest]
+            elif sub_block_paths[name] is not None:
+                sub_block_paths[name].append(rest)
+        elif many:
+            raise ValueError(f"Field {name} of block {schema.kind} is not a list")
+        elif rest:
+            raise ValueError(f"Field {name} of block {schema.kind} has no fields")
+        elif name == "id":
+            if schema.anonymous:
+                raise ValueError(f"Block {schema.kind} is anonymous and has no id")
+            projection.keep_name = True
+        elif name in attribute_schemas:
+            projection.attributes.add(name)
+        else:
+            raise ValueError(f"Unknown field {name} of block {schema.kind}")
+
+    sub_blocks = []
+    for sub_block in schema.sub_blocks:
+        if sub_block.field not in sub_block_paths:
+            continue
+        child_schema = sub_block.block() if callable(sub_block.block) else sub_block.block
+        child_paths = sub_block_paths[sub_block.field]
+        if child_paths is None:
+            child_projection = None
+            projected_child_schema = child_schema
+        else:
+            child_projection = _project_block(child_schema, child_paths)
+            projected_child_schema = child_projection.schema
+        sub_blocks.append(
+            SubBlockSchema(
+                field=sub_block.field,
+                block=projected_child_schema,
+                multiplicity=sub_block.multiplicity,
+                columnar=sub_block.columnar,
+            )
+        )
+        for kind in [child_schema.kind, *child_schema.aliases]:
+            projection.blocks[kind] = child_projection
+
+    projection.schema = BlockSchema(
+        kind=schema.kind,
+        aliases=schema.aliases,
+        # Without an id, names are dropped while building.
+        anonymous=not projection.keep_name,
+        attributes=[a for a in schema.attributes if a.name in projection.attributes],
+        sub_blocks=sub_blocks,
+    )
+    return projection
+
+
+def compile_projection(schema: Schema, fields: Sequence[str]) -> tuple[Projection, Schema]:
+    """
+    Checks the field paths against each root block of `schema`. Returns the projection of the
+    document, whose `blocks` are the root blocks to keep, and the schema to datafy it with.
+    Root blocks that none of the paths apply to are skipped.
+    """
+    paths = [path.split(".") for path in fields]
+    matched = [False] * len(paths)
+    document_projection = Projection()
+    blocks = []
+    for block_schema in schema.blocks:
+        block_paths = []
+        for i, path in enumerate(paths):
+            try:
+                _project_block(block_schema, [path])
+            except ValueError:
+                continue
+            matched[i] = True
+            block_paths.append(path)
+        if not block_paths:
+            continue
+        projection = _project_block(block_schema, block_paths)
+        blocks.append(projection.schema)
+        for kind in [block_schema.kind, *block_schema.aliases]:
+            document_projection.blocks[kind] = projection
+
+    for path, path_matched in zip(fields, matched):
+        if not path_matched:
+            if len(schema.blocks) == 1:
+                # Report the specific problem.
+                _project_block(schema.blocks[0], [path.split(".")])
+            raise ValueError(f"Field {path} does not match any block in the schema")
+
+    return document_projection, Schema(blocks=blocks)  # type: ignore
+
+
+def _enter(block: Block, parent: Projection) -> tuple[Optional[Projection], Sequence[Block]]:
+    projection = parent.blocks[block.kind]
+    if projection is None:
+        return None, ()
+    return projection, [child for child in block.children if child.kind in projection.blocks]
+
+
+def _leave(block: Block, projection: Optional[Projection], children: list[Block]) -> Block:
+    if projection is None:
+        return block
+    name = block.name if projection.keep_name else None
+    attributes = {k: v for k, v in block.attributes.items() if k in projection.attributes}
+    return Block(block.kind, name, block.value, attributes, children)
+
+
+def project_block(block: Block, projection: Optional[Projection]) -> Block:
+    """
+    Projects a block that has already been built, leaving out what `build` would have skipped.
+    """
+    if projection is None:
+        return block
+    return fold(block, Projection(blocks={block.kind: projection}), _leave, _enter)
@@ -1,8 +1,13 @@
-from collections.abc import Callable
+import hashlib
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Sequence
 from dataclasses import dataclass, field
 from typing import Any, Literal, Optional, Union
 
 from edf.block import Block, Document
+from edf.cache import Cache
+from edf.traverse import fold
 
 
 @dataclass
@@ -19,6 +24,10 @@ class SubBlockSchema:
     block: Union["BlockSchema", Callable[[], "BlockSchema"]]
     multiplicity: Literal["one", "many"] = "many"
 
+    # Whether the field holds a column per attribute instead of a list of children, see
+    # `edf.columnar`.
+    columnar: bool = False
+
 
 @dataclass
 class BlockSchema:
@@ -64,6 +73,7 @@ block_schema = BlockSchema(
                 attributes=[
                     AttributeSchema(name="field", type="string", required=True),
                     AttributeSchema(name="multiplicity", type="string", default="many"),
+                    AttributeSchema(name="columnar", type="boolean", default=False),
                 ],
                 sub_blocks=[
                     SubBlockSchema(field="block", multiplicity="one", block=lambda: block_schema)
@@ -77,7 +87,63 @@ block_schema = BlockSchema(
 schema_schema = Schema(blocks=[block_schema])
 
 
-def analyze_schema_block(block: Block) -> BlockSchema | AttributeSchema | SubBlockSchema:
+type _AnalyzedSchema = BlockSchema | AttributeSchema | SubBlockSchema
+
+
+def _analyze_attribute(block: Block) -> AttributeSchema:
+    if block.name is None:
+        raise ValueError("Attribute name required")
+    if block.value:
+        raise ValueError("Attribute value not supported")
+    attributes = block.attributes
+    return AttributeSchema(
+        name=block.name,
+        type=attributes.get("type"),
+        required=attributes.get("required", False),
+        default=attributes.get("default"),
+    )
+
+
+def _enter_sub_block(block: Block) -> tuple[SubBlockSchema, Block]:
+    # Returns the sub-block's schema, to be completed by `_set_block`, and the block of its block
+    # schema.
+    if block.name is not None:
+        raise ValueError("Sub-block name not supported")
+    if block.value:
+        raise ValueError("Sub-block value not supported")
+    field = block.attributes["field"]
+    multiplicity = (
+        block.attributes["multiplicity"] if "multiplicity" in block.attributes else "many"
+    )
+    columnar = block.attributes.get("columnar", False)
+    if columnar and multiplicity != "many":
+        raise ValueError(f"Columnar sub-block {field} must have a multiplicity of many")
+    if not block.children:
+        raise ValueError("Sub-block missing block schema")
+    child_block = block.children[0]
+    if child_block.kind != "block":
+        raise ValueError(f"Unexpected child block kind: {child_block.kind}")
+    sub_block_schema = SubBlockSchema(
+        field=field,
+        multiplicity=multiplicity,
+        block=None,  # type: ignore
+        columnar=columnar,
+    )
+    return sub_block_schema, child_block
+
+
+def _set_block(sub_block_schema: SubBlockSchema, block_schema: _AnalyzedSchema):
+    assert isinstance(block_schema, BlockSchema)
+    if sub_block_schema.columnar and block_schema.sub_blocks:
+        raise ValueError(f"Columnar sub-block {sub_block_schema.field} cannot have sub-blocks")
+    sub_block_schema.block = block_schema
+
+
+def _enter(block: Block, _: None) -> tuple[_AnalyzedSchema, Sequence[Block]]:
+    # Each schema object is created here from what the block itself holds, and completed from the
+    # block schemas of its sub-blocks in `_leave`. Attributes and sub-blocks are analysed straight
+    # away, so only block schemas are visited: a block's children are the blocks of its
+    # sub-blocks' block schemas.
     if block.kind == "block":
         if block.name is None:
             raise ValueError("Block name required")
@@ -88,62 +154,53 @@ def analyze_schema_block(block: Block) -> BlockSchema | AttributeSchema | SubBlo
         anonymous = block.attributes.get("anonymous", False)
         attribute_schemas = []
         sub_block_schemas = []
+        child_blocks = []
         for child in block.children:
-            analyzed_child = analyze_schema_block(child)
-            if isinstance(analyzed_child, AttributeSchema):
-                attribute_schemas.append(analyzed_child)
-            elif isinstance(analyzed_child, SubBlockSchema):
-                sub_block_schemas.append(analyzed_child)
-            else:
+            if child.kind == "attribute":
+                attribute_schemas.append(_analyze_attribute(child))
+            elif child.kind == "sub_block":
+                sub_block_schema, child_block = _enter_sub_block(child)
+                sub_block_schemas.append(sub_block_schema)
+                child_blocks.append(child_block)
+            elif child.kind == "block":
                 raise ValueError(f"Unexpected child block: {child}")
-        return BlockSchema(
+            else:
+                raise ValueError(f"Unexpected block kind: {child.kind}")
+        block_schema = BlockSchema(
             kind=kind,
             aliases=aliases,
             anonymous=anonymous,
             attributes=attribute_schemas,
             sub_blocks=sub_block_schemas,
         )
-
+        return block_schema, child_blocks
     elif block.kind == "attribute":
-        if block.name is None:
-            raise ValueError("Attribute name required")
-        if block.value:
-            raise ValueError("Attribute value not supported")
-        name = block.name
-        type_ = block.attributes.get("type")
-        required = block.attributes.get("required", False)
-        default = block.attributes.get("default")
-        return AttributeSchema(
-            name=name,
-            type=type_,
-            required=required,
-            default=default,
-        )
+        return _analyze_attribute(block), ()
     elif block.kind == "sub_block":
-        if block.name is not None:
-            raise ValueError("Sub-block name not supported")
-        if block.value:
-            raise ValueError("Sub-block value not supported")
-        field = block.attributes["field"]
-        multiplicity = (
-            block.attributes["multiplicity"] if "multiplicity" in block.attributes else "many"
-        )
-        if not block.children:
-            raise ValueError("Sub-block missing block schema")
-        child_block = block.children[0]
-        if child_block.kind != "block":
-            raise ValueError(f"Unexpected child block kind: {child_block.kind}")
-        child_block_schema = analyze_schema_block(child_block)
-        assert isinstance(child_block_schema, BlockSchema)
-        return SubBlockSchema(
-            field=field,
-            multiplicity=multiplicity,
-            block=child_block_schema,
-        )
+        sub_block_schema, child_block = _enter_sub_block(block)
+        return sub_block_schema, (child_block,)
     else:
         raise ValueError(f"Unexpected block kind: {block.kind}")
 
 
+def _leave(
+    block: Block, analyzed: _AnalyzedSchema, children: list[_AnalyzedSchema]
+) -> _AnalyzedSchema:
+    if not children:
+        return analyzed
+    if isinstance(analyzed, BlockSchema):
+        for sub_block_schema, child_block_schema in zip(analyzed.sub_blocks, children):
+            _set_block(sub_block_schema, child_block_schema)
+    elif isinstance(analyzed, SubBlockSchema):
+        (child_block_schema,) = children
+        _set_block(analyzed, child_block_schema)
+    return analyzed
+
+
+def analyze_schema_block(block: Block) -> BlockSchema | AttributeSchema | SubBlockSchema:
+    return fold(block, None, _leave, _enter)
+
+
 def analyze_schema_document(doc: Document) -> Schema:
     blocks = [analyze_schema_block(block) for block in doc]
     if not all(isinstance(block, BlockSchema) for block in blocks):
@@ -151,3 +208,112 @@ def analyze_schema_document(doc: Document) -> Schema:
     return Schema(
         blocks=blocks  # type: ignore
     )
+
+
+def schema_digest(source: str) -> str:
+    """
+    The content hash that identifies a schema's source text in a `SchemaRegistry`.
+    """
+    return hashlib.sha256(source.encode()).hexdigest()
+
+
+class SchemaRegistry:
+    """
+    A thread-safe, in-memory cache of analysed schemas, for programs that use the same schemas over
+    and over. Schemas are keyed by the hash of their source, and can also be registered under a
+    name and version. At most `max_size` analysed schemas are kept, evicting the least recently
+    used; the sources of named schemas are kept too, so that they are analysed again if needed.
+    Schemas are analysed with `edf.io.loads_schema`, through `cache` if given.
+    """
+
+    def __init__(self, max_size: int = 64, cache: Optional[Cache] = None):
+        if max_size < 1:
+            raise ValueError("Registry size must be at least 1")
+        self.max_size = max_size
+        self.cache = cache
+        self._lock = threading.Lock()
+        # Analysed schemas by digest, least recently used first.
+        self._schemas: OrderedDict[str, Schema] = OrderedDict()
+        # Digests and sources of named schemas, by name and then version (latest last).
+        self._names: dict[str, dict[Optional[str], tuple[str, str]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._schemas)
+
+    def _lookup(self, digest: str) -> Optional[Schema]:
+        with self._lock:
+            schema = self._schemas.get(digest)
+            if schema is not None:
+                self._schemas.move_to_end(digest)
+            return schema
+
+    def _analyze(self, digest: str, source: str) -> Schema:
+        from edf.io import loads_schema
+
+        # Analysed outside the lock, so that lookups aren't held up; if two threads analyse the
+        # same schema at once, the first to finish wins.
+        schema = loads_schema(source, self.cache)
+        with self._lock:
+            schema = self._schemas.setdefault(digest, schema)
+            self._schemas.move_to_end(digest)
+            while len(self._schemas) > self.max_size:
+                self._schemas.popitem(last=False)
+        return schema
+
+    def load(
+        self, source: str, name: Optional[str] = None, version: Optional[str] = None
+    ) -> Schema:
+        """
+        Returns the schema with the given source, analysing it if it isn't cached. Given a `name`,
+        it is also registered under that name and `version`, and becomes the name's latest version.
+        """
+        digest = schema_digest(source)
+        if name is not None:
+            with self._lock:
+                versions = self._names.setdefault(name, {})
+                versions.pop(version, None)
+                versions[version] = digest, source
+        schema = self._lookup(digest)
+        return schema if schema is not None else self._analyze(digest, source)
+
+    def get(self, name: str, version: Optional[str] = None) -> Schema:
+        """
+        Returns the schema registered under `name` and `version`, or the latest one registered
+        under `name` if `version` is None. Raises `KeyError` if there isn't one.
+        """
+        with self._lock:
+            versions = self._names.get(name)
+            if not versions:
+                raise KeyError(f"No schema named {name}")
+            if version is None:
+                digest, source = versions[next(reversed(versions))]
+            elif version in versions:
+                digest, source = versions[version]
+            else:
+                raise KeyError(f"No version {version} of schema {name}")
+        schema = self._lookup(digest)
+        return schema if schema is not None else self._analyze(digest, source)
+
+    def get_digest(self, digest: str) -> Schema:
+        """
+        Returns the cached schema whose source has the given `schema_digest`. Raises `KeyError`
+        if it isn't cached.
+        """
+        schema = self._lookup(digest)
+        if schema is None:
+            raise KeyError(f"No schema with digest {digest}")
+        return schema
+
+    def select(self, doc: Document, header_kind: str = "schema") -> tuple[Schema, Document]:
+        """
+        Picks the schema for a document from its header: a first root block such as
+        `schema config { version = "2" }`, naming a registered schema and optionally its version.
+        Returns the schema and the rest of the document, which is what the schema describes.
+        """
+        if not doc or doc[0].kind != header_kind:
+            raise ValueError(f"Document has no {header_kind} header block")
+        header = doc[0]
+        if header.name is None:
+            raise ValueError(f"The {header_kind} header block must name a schema")
+        version = header.attributes.get("version")
+        return self.get(header.name, None if version is None else str(version)), doc[1:]
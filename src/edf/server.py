@@ -0,0 +1,265 @@
+"""
+A long-lived conversion daemon, for callers that would otherwise start a process per document.
+
+The server listens on a Unix socket and converts documents in a pool of worker processes, each of
+which keeps the schemas it has compiled in a `SchemaRegistry` (see `edf.schema`). Connections are
+handled concurrently with asyncio, and each can make any number of requests. See `edf.client` for
+the protocol. Given `Limits` (see `edf.limits`), documents that exceed them are rejected with an
+error rather than converted. Given a `timeout`, conversions that take longer than that many seconds
+in a worker are cancelled (see `edf.cancel`) and answered with an error.
+"""
+
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import statistics
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+from edf.client import default_socket_path
+from edf.cancel import CancellationToken
+from edf.limits import LimitExceeded, Limits
+from edf.parser.lex import LexicalError, describe_error
+from edf.schema import SchemaRegistry
+
+# The current worker's compiled schemas, document limits and timeout, set up by `_init_worker`.
+_worker_schemas: Optional[SchemaRegistry] = None
+_worker_limits: Optional[Limits] = None
+_worker_timeout: Optional[float] = None
+
+
+def _init_worker(
+    schema_cache_size: int, limits: Optional[Limits] = None, timeout: Optional[float] = None
+):
+    global _worker_schemas, _worker_limits, _worker_timeout
+    _worker_schemas = SchemaRegistry(schema_cache_size)
+    _worker_limits = limits
+    _worker_timeout = timeout
+
+
+def _to_json(source: str, schema_source: Optional[str], indent: Optional[int], object: bool):
+    from edf.canonical import canonicalize_json
+    from edf.columnar import json_default
+    from edf.io import loads_data, loads_document
+
+    assert _worker_schemas is not None
+    cancel = CancellationToken(_worker_timeout) if _worker_timeout is not None else None
+    if schema_source is None:
+        data = canonicalize_json(loads_document(source, limits=_worker_limits, cancel=cancel))
+    else:
+        schema = _worker_schemas.load(schema_source)
+        data = loads_data(source, schema, limits=_worker_limits, cancel=cancel)
+    if object:
+        if len(data) != 1:
+            raise ValueError("Expected a single object")
+        data = data[0]
+    # Encoded here, so that encoding is spread over the workers too.
+    return json.dumps(data, indent=indent, default=json_default).encode()
+
+
+@dataclass
+class Counters:
+    started: float = field(default_factory=time.monotonic)
+    requests: int = 0
+    errors: int = 0
+    in_flight: int = 0
+    bytes_in: int = 0
+    bytes_out: int = 0
+    latency_total: float = 0.0
+    latency_max: float = 0.0
+
+    # Latencies of the most recent requests, for percentiles.
+    recent: deque[float] = field(default_factory=lambda: deque(maxlen=1024))
+
+    def record(self, seconds: float, error: bool):
+        self.requests += 1
+        self.errors += error
+        self.latency_total += seconds
+        self.latency_max = max(self.latency_max, seconds)
+        self.recent.append(seconds)
+
+    def snapshot(self) -> dict[str, Any]:
+        uptime = time.monotonic() - self.started
+        recent = sorted(self.recent)
+        if len(recent) >= 2:
+            quantiles = statistics.quantiles(recent, n=100, method="inclusive")
+            p50, p99 = quantiles[49], quantiles[98]
+        else:
+            p50 = p99 = recent[0] if recent else 0.0
+        return {
+            "uptime_seconds": uptime,
+            "requests": self.requests,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "requests_per_second": self.requests / uptime if uptime else 0.0,
+            "latency_mean_seconds": self.latency_total / self.requests if self.requests else 0.0,
+            "latency_p50_seconds": p50,
+            "latency_p99_seconds": p99,
+            "latency_max_seconds": self.latency_max,
+        }
+
+
+@dataclass
+class _Refused(Exception):
+    # A request refused before its payload was read. The unread payload leaves the connection out
+    # of step, so it is closed once the error has been sent.
+    error: Exception
+
+
+def _parse_header(line: bytes) -> dict:
+    # Without a header, the sizes of the request's payloads aren't known either.
+    try:
+        header = json.loads(line)
+    except ValueError as e:
+        raise _Refused(ValueError(f"Malformed request header: {e}"))
+    if not isinstance(header, dict):
+        raise _Refused(ValueError("Malformed request header: expected a JSON object"))
+    return header
+
+
+def _payload_size(header: dict, field: str) -> Optional[int]:
+    # A size that isn't a byte count leaves the request's payloads unreadable, as for a malformed
+    # header.
+    size = header.get(field)
+    if size is not None and (type(size) is not int or size < 0):
+        raise _Refused(
+            ValueError(f"Malformed request header: {field} must be a non-negative integer")
+        )
+    return size
+
+
+class Server:
+    """
+    Converts documents for clients connecting to the socket at `path`. With `workers` set to 0,
+    documents are converted in a thread of this process rather than in worker processes.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str | os.PathLike] = None,
+        workers: Optional[int] = None,
+        schema_cache_size: int = 64,
+        limits: Optional[Limits] = None,
+        timeout: Optional[float] = None,
+    ):
+        self.path = os.fspath(path) if path is not None else default_socket_path()
+        self.workers = workers
+        self.schema_cache_size = schema_cache_size
+        self.limits = limits
+        self.timeout = timeout
+        self.counters = Counters()
+        self._executor: Optional[Executor] = None
+        self._server: Optional[asyncio.Server] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._closed = asyncio.Event()
+
+    def _remove_stale_socket(self):
+        if not os.path.exists(self.path):
+            return
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            try:
+                s.connect(self.path)
+            except OSError:
+                os.unlink(self.path)
+            else:
+                raise ValueError(f"A server is already listening on {self.path}")
+
+    async def serve(self, ready: Optional[Callable[[], None]] = None):
+        """
+        Serves until `close` is called. `ready` is called once the socket is listening.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._remove_stale_socket()
+        initargs = (self.schema_cache_size, self.limits, self.timeout)
+        if self.workers == 0:
+            self._executor = ThreadPoolExecutor(1, initializer=_init_worker, initargs=initargs)
+        else:
+            # Not forked, as the server may be running alongside other threads.
+            self._executor = ProcessPoolExecutor(
+                self.workers,
+                multiprocessing.get_context("forkserver"),
+                initializer=_init_worker,
+                initargs=initargs,
+            )
+        try:
+            self._server = await asyncio.start_unix_server(self._handle, self.path)
+            if ready is not None:
+                ready()
+            async with self._server:
+                await self._closed.wait()
+        finally:
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+            self._executor.shutdown(cancel_futures=True)
+
+    def close(self):
+        """
+        Stops serving. Can be called from any thread.
+        """
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._closed.set)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while line := await reader.readline():
+                start = time.perf_counter()
+                self.counters.in_flight += 1
+                header: dict = {}
+                refused = False
+                try:
+                    header = _parse_header(line)
+                    response, payload = await self._dispatch(header, reader)
+                except _Refused as e:
+                    response, payload, refused = {"error": describe_error(e.error)}, b"", True
+                except (Exception, LexicalError) as e:
+                    response, payload = {"error": describe_error(e)}, b""
+                finally:
+                    self.counters.in_flight -= 1
+                if header.get("op") != "stats":
+                    self.counters.record(time.perf_counter() - start, "error" in response)
+                response["size"] = len(payload)
+                self.counters.bytes_out += len(payload)
+                writer.write(json.dumps(response).encode() + b"\n" + payload)
+                await writer.drain()
+                if refused:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, header: dict, reader: asyncio.StreamReader) -> tuple[dict, bytes]:
+        op = header.get("op")
+        if op == "stats":
+            return {}, json.dumps(self.counters.snapshot()).encode()
+        elif op == "to-json":
+            source_size = _payload_size(header, "source")
+            if source_size is None:
+                raise _Refused(ValueError("Malformed request header: source size required"))
+            schema_size = _payload_size(header, "schema")
+            if self.limits is not None and self.limits.max_bytes is not None:
+                # Checked against the sizes the request gives, so that an oversized payload is
+                # never read.
+                if max(source_size, schema_size or 0) > self.limits.max_bytes:
+                    raise _Refused(LimitExceeded("max_bytes", self.limits.max_bytes))
+            source = await reader.readexactly(source_size)
+            schema = await reader.readexactly(schema_size) if schema_size is not None else None
+            self.counters.bytes_in += source_size + (schema_size or 0)
+            payload = await asyncio.get_running_loop().run_in_executor(
+                self._executor,
+                _to_json,
+                source.decode(),
+                schema.decode() if schema is not None else None,
+                header.get("indent"),
+                header.get("object", False),
+            )
+            return {}, payload
+        else:
+            raise ValueError(f"Unknown operation: {op}")
@@ -0,0 +1,254 @@
+"""
+Handing parsed documents to worker processes through shared memory.
+
+`SharedDocument.publish` serialises a document once (in the layout of `edf.binary`) into a block
+of `multiprocessing.shared_memory`. A `SharedDocument` pickles as the name of its shared memory,
+so passing one to a worker costs the same however large the document is, and the worker attaches
+to the same memory rather than receiving a copy. Its root blocks are read as `BlockView`s, which
+decode a block's kind, name, value and attributes when the view is made and its children when
+they are first accessed, leaving the rest of the document alone.
+
+The process that publishes a document owns its shared memory and unlinks it when closing it (or
+when leaving a `with` block); the memory stays readable by processes that have attached to it
+until they close it too.
+"""
+
+import os
+from collections.abc import Iterable, Mapping, Sequence
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from types import MappingProxyType
+from typing import Any, Optional, overload
+
+from edf import binary
+from edf.binary import TAG_FLOAT, TAG_INT, TAG_LIST, TAG_STRING, _read_scalar, _read_varint
+from edf.block import Block
+
+
+def _tracker_id() -> Optional[tuple[int, int]]:
+    # Identifies this process's resource tracker by the pipe it is signalled through, which is
+    # shared by every process using the tracker: forked children inherit it, and those started by
+    # spawning or a fork server are passed it, but only forked children know the tracker's pid.
+    fd = getattr(resource_tracker._resource_tracker, "_fd", None)
+    if fd is None:
+        return None
+    try:
+        stat = os.fstat(fd)
+    except OSError:
+        return None
+    return stat.st_dev, stat.st_ino
+
+
+def _attach(name: str, publisher_tracker: Optional[tuple[int, int]]) -> SharedMemory:
+    try:
+        # Attaching processes don't own the memory, so they shouldn't unlink it when exiting.
+        return SharedMemory(name, track=False)  # type: ignore[call-arg]
+    except TypeError:
+        pass
+    # Before Python 3.13, attaching always registers the memory with the process's resource
+    # tracker, which unlinks it when the process exits unless it's the publisher's tracker too (as
+    # it is for processes the publisher starts, however it starts them). The publisher's tracker
+    # is left with the registration, so that it still unlinks the memory if the publisher dies.
+    shm = SharedMemory(name)
+    if publisher_tracker is None or _tracker_id() != publisher_tracker:
+        resource_tracker.unregister(shm._name, "shared_memory")  # type: ignore[attr-defined]
+    return shm
+
+
+def _skip_scalar(data: Any, pos: int) -> int:
+    tag = data[pos]
+    if tag == TAG_INT or tag == TAG_STRING:
+        return _read_varint(data, pos + 1)[1]
+    elif tag == TAG_FLOAT:
+        return pos + 9
+    elif tag == TAG_LIST:
+        n, pos = _read_varint(data, pos + 1)
+        for _ in range(n):
+            pos = _skip_scalar(data, pos)
+        return pos
+    return pos + 1
+
+
+def _skip_blocks(data: Any, pos: int, count: int, shapes: list) -> int:
+    # Returns the position after `count` consecutive blocks starting at `pos`.
+    while count:
+        n, pos = _read_varint(data, pos)
+        _, has_value, keys = shapes[n]
+        pos = _read_varint(data, pos)[1]
+        if has_value:
+            pos = _skip_scalar(data, pos)
+        for _ in keys:
+            pos = _skip_scalar(data, pos)
+        n, pos = _read_varint(data, pos)
+        count += n - 1
+    return pos
+
+
+class BlockView:
+    """
+    A read-only view of a block of a `SharedDocument`, with the same fields as a `Block`.
+    """
+
+    __slots__ = (
+        "_document",
+        "_pos",
+        "_end",
+        "_child_count",
+        "_children",
+        "kind",
+        "name",
+        "value",
+        "attributes",
+    )
+
+    kind: str
+    name: Optional[str]
+    value: Optional[Any]
+    attributes: Mapping[str, Any]
+
+    def __init__(self, document: "SharedDocument", pos: int):
+        data = document._data
+        strings = document._strings
+        self._document = document
+        self._pos = pos
+        self._children: Optional[tuple["BlockView", ...]] = None
+
+        n, pos = _read_varint(data, pos)
+        self.kind, has_value, keys = document._header.shapes[n]
+        n, pos = _read_varint(data, pos)
+        self.name = strings[n - 1] if n else None
+        if has_value:
+            self.value, pos = _read_scalar(data, pos + 1, data[pos], strings)
+        else:
+            self.value = None
+        attributes = {}
+        for key in keys:
+            attributes[key], pos = _read_scalar(data, pos + 1, data[pos], strings)
+        self.attributes = MappingProxyType(attributes)
+        self._child_count, self._end = _read_varint(data, pos)
+
+    @property
+    def children(self) -> tuple["BlockView", ...]:
+        if self._children is None:
+            data = self._document._data
+            shapes = self._document._header.shapes
+            children = []
+            pos = self._end
+            for i in range(self._child_count):
+                child = BlockView(self._document, pos)
+                children.append(child)
+                if i + 1 < self._child_count:
+                    pos = _skip_blocks(data, child._end, child._child_count, shapes)
+            self._children = tuple(children)
+        return self._children
+
+    @property
+    def is_single_value(self) -> bool:
+        return self.value is not None and not self._child_count
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.value and not self.attributes and not self._child_count
+
+    def __getitem__(self, key: str) -> Any:
+        return self.attributes[key]
+
+    def to_block(self) -> Block:
+        """
+        Decodes the block and its descendants into a (modifiable) `Block`.
+        """
+        document = self._document
+        block, _ = binary._read_block(
+            document._data, self._pos, document._strings, document._header.shapes
+        )
+        return block
+
+    def __repr__(self) -> str:
+        return (
+            f"BlockView(kind={self.kind!r}, name={self.name!r}, value={self.value!r}, "
+            f"attributes={dict(self.attributes)!r}, children=<{self._child_count}>)"
+        )
+
+
+class SharedDocument(Sequence[BlockView]):
+    """
+    A serialised document in shared memory, attached to by the name of its shared memory. Use
+    `publish` to create one.
+    """
+
+    def __init__(self, name: str, _publisher_tracker: Optional[tuple[int, int]] = None):
+        self._shm = _attach(name, _publisher_tracker)
+        self._owner = False
+        self._tracker = _publisher_tracker
+        self._open()
+
+    def _open(self):
+        self._data = self._shm.buf.toreadonly()
+        self._header = binary._Header(self._data)
+        self._strings = binary._LazyStrings(self._header)
+
+    @classmethod
+    def publish(cls, doc: Iterable[Block]) -> "SharedDocument":
+        """
+        Copies a document into new shared memory, owned by the returned `SharedDocument`.
+        """
+        data = binary.dumps(doc)
+        shm = SharedMemory(create=True, size=len(data))
+        shm.buf[: len(data)] = data
+        document = cls.__new__(cls)
+        document._shm = shm
+        document._owner = True
+        document._tracker = _tracker_id()
+        document._open()
+        return document
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    def __reduce__(self):
+        return type(self), (self.name, self._tracker)
+
+    def __len__(self) -> int:
+        return self._header.root_count
+
+    @overload
+    def __getitem__(self, index: int) -> BlockView: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[BlockView]: ...
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("root block index out of range")
+        return BlockView(self, self._header.root_span(index)[0])
+
+    def to_document(self) -> list[Block]:
+        return [view.to_block() for view in self]
+
+    def close(self):
+        """
+        Detaches from the shared memory, unlinking it if this is the document that published it.
+        Views of the document can't be used afterwards.
+        """
+        self._data.release()
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+            self._owner = False
+
+    def __del__(self):
+        # The memory can't be unmapped while the view of it is exported.
+        data = getattr(self, "_data", None)
+        if data is not None:
+            data.release()
+
+    def __enter__(self) -> "SharedDocument":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,184 @@
+"""
+Optional instrumentation of loading: time, counts and peak allocations for each phase.
+
+Nothing is recorded unless a callback has been registered with `add_callback` (or `collect` is
+in use), in which case each call to `read_document`, `loads_data`, `loads_schema` (and their
+iterating variants) or `edf.index.build_index` passes a `Stats` to the callbacks when it finishes.
+Instrumented loads run their phases one after another rather than interleaving them, so that each
+can be measured on its own; the iterating variants therefore load eagerly while callbacks are
+registered.
+"""
+
+import threading
+import time
+import tracemalloc
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Optional
+
+
+@dataclass
+class PhaseStats:
+    name: str
+    seconds: float = 0.0
+
+    # Peak traced allocations during the phase, above what was allocated when it started. Only
+    # recorded when memory tracing was requested.
+    peak_memory_bytes: Optional[int] = None
+
+
+@dataclass
+class Stats:
+    operation: str
+    phases: list[PhaseStats] = field(default_factory=list)
+    seconds: float = 0.0
+    peak_memory_bytes: Optional[int] = None
+
+    tokens: int = 0
+    fabricated_tokens: int = 0
+    nodes: int = 0
+    blocks: int = 0
+
+    # Traced allocations when the operation started, if tracing.
+    _base_memory: Optional[int] = field(default=None, repr=False, compare=False)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[PhaseStats]:
+        # A phase entered more than once, e.g. by each of several loads within one operation,
+        # accumulates its time rather than being listed again.
+        for phase in self.phases:
+            if phase.name == name:
+                break
+        else:
+            phase = PhaseStats(name)
+            self.phases.append(phase)
+        tracing = self._base_memory is not None
+        if tracing:
+            start_memory, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield phase
+        finally:
+            phase.seconds += time.perf_counter() - start
+            if tracing:
+                _, peak = tracemalloc.get_traced_memory()
+                phase.peak_memory_bytes = max(phase.peak_memory_bytes or 0, peak - start_memory)
+                self.peak_memory_bytes = max(
+                    self.peak_memory_bytes or 0, peak - self._base_memory  # type: ignore
+                )
+
+    def format(self) -> str:
+        """
+        Formats the stats as human readable lines.
+        """
+        lines = [
+            f"{self.operation}: {self.seconds * 1000:.2f} ms, {self.tokens} tokens "
+            f"({self.fabricated_tokens} fabricated), {self.nodes} nodes, {self.blocks} blocks"
+            + _format_memory(self.peak_memory_bytes)
+        ]
+        for phase in self.phases:
+            lines.append(
+                f"  {phase.name:10} {phase.seconds * 1000:10.2f} ms"
+                + _format_memory(phase.peak_memory_bytes)
+            )
+        return "\n".join(lines)
+
+
+def _format_memory(size: Optional[int]) -> str:
+    return "" if size is None else f", peak {size / 1024:.1f} KiB"
+
+
+type Callback = Callable[[Stats], None]
+
+# Registered callbacks, with whether each wants memory tracing. Replaced rather than mutated, so
+# that it can be read without locking.
+_callbacks: tuple[tuple[Callback, bool], ...] = ()
+_callbacks_lock = threading.Lock()
+
+_current: ContextVar[Optional[Stats]] = ContextVar("edf_stats_current", default=None)
+
+
+def add_callback(callback: Callback, trace_memory: bool = False):
+    """
+    Registers `callback` to receive the stats of each load. With `trace_memory`, allocations are
+    traced with `tracemalloc`, which makes loading several times slower.
+    """
+    global _callbacks
+    with _callbacks_lock:
+        _callbacks = (*_callbacks, (callback, trace_memory))
+
+
+def remove_callback(callback: Callback):
+    global _callbacks
+    with _callbacks_lock:
+        for i, (registered, _) in enumerate(_callbacks):
+            if registered == callback:
+                _callbacks = _callbacks[:i] + _callbacks[i + 1 :]
+                return
+    raise ValueError("Callback is not registered")
+
+
+@contextmanager
+def collect(trace_memory: bool = False) -> Iterator[list[Stats]]:
+    """
+    Collects the stats of the loads made within the block into a list.
+    """
+    collected: list[Stats] = []
+    add_callback(collected.append, trace_memory)
+    try:
+        yield collected
+    finally:
+        remove_callback(collected.append)
+
+
+def enabled() -> bool:
+    return bool(_callbacks)
+
+
+@contextmanager
+def operation(name: str) -> Iterator[Optional[Stats]]:
+    """
+    Records an operation, yielding its stats, or None when instrumentation is disabled. Operations
+    within another operation record into it.
+    """
+    callbacks = _callbacks
+    parent = _current.get()
+    if not callbacks or parent is not None:
+        yield parent
+        return
+
+    stats = Stats(name)
+    trace_memory = any(trace for _, trace in callbacks)
+    started_tracing = trace_memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    if trace_memory:
+        stats._base_memory, _ = tracemalloc.get_traced_memory()
+        stats.peak_memory_bytes = 0
+    token = _current.set(stats)
+    start = time.perf_counter()
+    try:
+        yield stats
+    finally:
+        stats.seconds = time.perf_counter() - start
+        _current.reset(token)
+        if started_tracing:
+            tracemalloc.stop()
+    for callback, _ in callbacks:
+        callback(stats)
+
+
+@contextmanager
+def phase(name: str) -> Iterator[Optional[PhaseStats]]:
+    """
+    Records a phase of the current operation, if there is one.
+    """
+    stats = _current.get()
+    if stats is None:
+        yield None
+    else:
+        with stats.phase(name) as phase_stats:
+            yield phase_stats
@@ -0,0 +1,109 @@
+"""
+An explicit-stack traversal engine for trees of blocks.
+
+The converters in this package (canonical JSON, XML, datafy and schema analysis) are all
+post-order folds over a tree: each node's result is built from the results of its children.
+Writing them recursively limits them to Python's recursion depth, so instead they describe a
+single step with a pair of functions and let `fold` drive the traversal, which recurses only to a
+fixed depth and continues deeper with its own stack.
+"""
+
+from collections.abc import Callable, Sequence
+from typing import Optional
+
+from edf.block import Block
+
+type Enter[S] = Callable[[Block, S], tuple[S, Sequence[Block]]]
+"""
+Called when a block is first reached, with its parent's state (or the initial context for the root).
+Returns the block's own state and the children to visit.
+"""
+
+type Leave[S, R] = Callable[[Block, S, list[R]], R]
+"""
+Called once all of a block's children have been left, with the block's state and the children's
+results in order. Returns the block's result.
+"""
+
+
+# Depth to which `fold` recurses before switching to its own stack. Recursion is faster on the
+# shallow trees that most documents are made of, and this leaves room below the recursion limit.
+RECURSION_DEPTH = 64
+
+
+def fold[S, R](
+    root: Block, context: S, leave: Leave[S, R], enter: Optional[Enter[S]] = None
+) -> R:
+    """
+    Folds the tree rooted at `root` bottom-up, so depth is bounded only by memory. Blocks deeper
+    than `RECURSION_DEPTH` are folded with an explicit stack rather than by recursion.
+    Children are entered lazily and in order, so errors surface in the same order as they would in
+    a recursive walk. Without `enter`, every block visits all of its children and its state is
+    `context`.
+    """
+    if enter is None:
+        state, children = context, root.children
+    else:
+        state, children = enter(root, context)
+    return _fold_entered(root, state, children, context, leave, enter, RECURSION_DEPTH)
+
+
+def _fold_entered[S, R](
+    node: Block,
+    state: S,
+    children: Sequence[Block],
+    context: S,
+    leave: Leave[S, R],
+    enter: Optional[Enter[S]],
+    depth: int,
+) -> R:
+    # Folds a block that has been entered, recursing into its children while `depth` allows.
+    if not children:
+        return leave(node, state, [])
+    if not depth:
+        return _fold_stack(node, state, children, context, leave, enter)
+    depth -= 1
+    results = []
+    for child in children:
+        if enter is None:
+            child_state, grandchildren = context, child.children
+        else:
+            child_state, grandchildren = enter(child, state)
+        if grandchildren:
+            results.append(
+                _fold_entered(child, child_state, grandchildren, context, leave, enter, depth)
+            )
+        else:
+            results.append(leave(child, child_state, []))
+    return leave(node, state, results)
+
+
+def _fold_stack[S, R](
+    root: Block,
+    state: S,
+    children: Sequence[Block],
+    context: S,
+    leave: Leave[S, R],
+    enter: Optional[Enter[S]],
+) -> R:
+    node, pending, results = root, iter(children), []
+    # Ancestors of `node`, as (node, state, pending children, child results) tuples.
+    stack = []
+    while True:
+        for child in pending:
+            if enter is None:
+                child_state, grandchildren = context, child.children
+            else:
+                child_state, grandchildren = enter(child, state)
+            if grandchildren:
+                stack.append((node, state, pending, results))
+                node, state, pending, results = child, child_state, iter(grandchildren), []
+                break
+            # Leaf blocks are left straight away rather than being pushed onto the stack.
+            results.append(leave(child, child_state, []))
+        else:
+            result = leave(node, state, results)
+            if not stack:
+                return result
+            node, state, pending, results = stack.pop()
+            results.append(result)
@@ -0,0 +1,415 @@
+"""
+Watching files for changes, and reloading only what has changed.
+
+A `Watcher` keeps the parsed blocks (and data, given a schema) of a set of files. When files change
+it re-reads only those files, splits them into root blocks (see `edf.incremental`) and only parses
+and datafies the root blocks whose text has changed, so that the cost of a reload follows the size
+of the edit rather than that of the whole set of files. Each reload produces a `ChangeSet` of the
+root blocks that were added, changed or removed.
+
+Changes are noticed with inotify on Linux, and by polling modification times elsewhere.
+"""
+
+import ctypes
+import ctypes.util
+import hashlib
+import os
+import select
+import struct
+import time
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Literal, Optional
+
+from edf.block import Block
+from edf.datafy import iter_datafy_document
+from edf.incremental import TextPosition, read_piece, split_root_blocks
+from edf.parser.lex import LexicalError, describe_error
+from edf.schema import Schema
+
+# A root block's identity within its file: its kind, its name and how many root blocks with the
+# same kind and name come before it.
+type BlockKey = tuple[str, Optional[str], int]
+
+
+@dataclass
+class Change:
+    path: Path
+    kind: str
+    name: Optional[str]
+
+    # The block's data if the watcher has a schema, otherwise the block itself. None for removed
+    # blocks.
+    data: Any = None
+
+
+@dataclass
+class ChangeSet:
+    added: list[Change] = field(default_factory=list)
+    changed: list[Change] = field(default_factory=list)
+    removed: list[Change] = field(default_factory=list)
+
+    # Files that couldn't be loaded, with the reason. Their previous contents are kept.
+    errors: dict[Path, str] = field(default_factory=dict)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.changed or self.removed or self.errors)
+
+
+@dataclass
+class _Piece:
+    blocks: list[Block]
+    data: list[Any]
+
+
+@dataclass
+class _File:
+    stat: tuple[int, int]
+
+    # Digests of the file's pieces, in order, and what each piece holds.
+    digests: list[bytes]
+    pieces: dict[bytes, _Piece]
+
+    def items(self) -> Iterator[tuple[Block, Any]]:
+        for digest in self.digests:
+            piece = self.pieces[digest]
+            yield from zip(piece.blocks, piece.data)
+
+
+def _stat(path: Path) -> Optional[tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def _keyed(file: Optional[_File]) -> dict[BlockKey, tuple[Block, Any]]:
+    # Each block of the file by key, with its data.
+    result: dict[BlockKey, tuple[Block, Any]] = {}
+    if file is None:
+        return result
+    counts: dict[tuple[str, Optional[str]], int] = {}
+    for block, data in file.items():
+        n = counts.get((block.kind, block.name), 0)
+        counts[block.kind, block.name] = n + 1
+        result[block.kind, block.name, n] = (block, data)
+    return result
+
+
+class _Inotify:
+    # The inotify API, through ctypes.
+    IN_MODIFY = 0x2
+    IN_CLOSE_WRITE = 0x8
+    IN_MOVED_FROM = 0x40
+    IN_MOVED_TO = 0x80
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_ISDIR = 0x40000000
+    MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+    _event = struct.Struct("iIII")
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._directories: dict[int, Path] = {}
+
+    def add_directory(self, path: Path):
+        wd = self._add_watch(self.fd, os.fsencode(path), self.MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"Cannot watch {path}")
+        self._directories[wd] = path
+
+    def read(self, timeout: Optional[float]) -> Optional[list[tuple[Path, bool]]]:
+        """
+        Waits for events, returning the paths they concern and whether each is a directory.
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return None
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return events
+            pos = 0
+            while pos < len(data):
+                wd, mask, _, size = self._event.unpack_from(data, pos)
+                pos += self._event.size
+                name = data[pos : pos + size].rstrip(b"\0")
+                pos += size
+                directory = self._directories.get(wd)
+                if directory is not None and name:
+                    events.append((directory / os.fsdecode(name), bool(mask & self.IN_ISDIR)))
+
+    def close(self):
+        os.close(self.fd)
+
+
+class Watcher:
+    """
+    Watches `paths` (files, or directories searched for files matching `pattern`) for changes.
+    Given a `schema`, or the path of one in `schema_path`, blocks are also datafied; a schema
+    loaded from `schema_path` is reloaded when it changes, and all blocks datafied again.
+
+    `load` returns the initial contents of the files as a change set of added blocks. `wait`
+    waits for files to change and returns the resulting change set, and iterating over the watcher
+    does so forever.
+    """
+
+    def __init__(
+        self,
+        paths: Iterable[str | os.PathLike],
+        schema: Optional[Schema] = None,
+        schema_path: Optional[str | os.PathLike] = None,
+        pattern: str = "*.edf",
+        backend: Literal["auto", "inotify", "poll"] = "auto",
+        poll_interval: float = 0.5,
+        debounce: float = 0.05,
+    ):
+        if schema is not None and schema_path is not None:
+            raise ValueError("Expected a schema or a schema path, not both")
+        self.paths = [Path(path).resolve() for path in paths]
+        self.schema = schema
+        self.schema_path = Path(schema_path).resolve() if schema_path is not None else None
+        self.pattern = pattern
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+
+        self._files: dict[Path, _File] = {}
+        self._schema_stat: Optional[tuple[int, int]] = None
+
+        self._inotify: Optional[_Inotify] = None
+        if backend != "poll":
+            try:
+                self._inotify = _Inotify()
+            except (OSError, AttributeError, TypeError):
+                if backend == "inotify":
+                    raise
+        if self._inotify is not None:
+            for directory in self._directories():
+                self._inotify.add_directory(directory)
+
+    @property
+    def backend(self) -> str:
+        return "inotify" if self._inotify is not None else "poll"
+
+    def _directories(self) -> set[Path]:
+        directories = set()
+        for path in self.paths:
+            if path.is_dir():
+                directories.add(path)
+                directories.update(p for p in path.rglob("*") if p.is_dir())
+            else:
+                directories.add(path.parent)
+        if self.schema_path is not None:
+            directories.add(self.schema_path.parent)
+        return directories
+
+    def _watched(self, path: Path) -> bool:
+        # Whether a file is one of those being watched.
+        for watched in self.paths:
+            if path == watched or (path.is_relative_to(watched) and path.match(self.pattern)):
+                return True
+        return False
+
+    def _find_files(self) -> set[Path]:
+        files = set()
+        for path in self.paths:
+            if path.is_dir():
+                files.update(p for p in path.rglob(self.pattern) if p.is_file())
+            elif path.exists():
+                files.add(path)
+        return files
+
+    @property
+    def documents(self) -> dict[Path, list[Block]]:
+        """
+        The current root blocks of each file.
+        """
+        return {path: [block for block, _ in file.items()] for path, file in self._files.items()}
+
+    @property
+    def data(self) -> dict[Path, list[Any]]:
+        """
+        The current data of each file's root blocks (or the blocks, without a schema).
+        """
+        return {path: [data for _, data in file.items()] for path, file in self._files.items()}
+
+    def load(self) -> ChangeSet:
+        """
+        Loads every file, returning a change set of everything that changed since the last load
+        (everything, on the first).
+        """
+        return self.refresh(self._find_files() | set(self._files) | self._schema_paths())
+
+    def refresh(self, paths: Iterable[Path]) -> ChangeSet:
+        """
+        Reloads the given files if they have changed.
+        """
+        changes = ChangeSet()
+        paths = set(paths)
+        if self.schema_path is not None and (
+            self.schema_path in paths or self._schema_stat is None
+        ):
+            paths.discard(self.schema_path)
+            if self._reload_schema(changes):
+                self._redatafy(changes)
+        for path in sorted(paths):
+            self._refresh_file(path, changes)
+        return changes
+
+    def _reload_schema(self, changes: ChangeSet) -> bool:
+        from edf.io import loads_schema
+
+        assert self.schema_path is not None
+        stat = _stat(self.schema_path)
+        if stat is None or stat == self._schema_stat:
+            return False
+        try:
+            self.schema = loads_schema(self.schema_path.read_text())
+        except (ValueError, LexicalError) as e:
+            changes.errors[self.schema_path] = describe_error(e)
+            return False
+        self._schema_stat = stat
+        return True
+
+    def _redatafy(self, changes: ChangeSet):
+        # Datafies every block again with a new schema, from the blocks already parsed.
+        assert self.schema is not None
+        for path, old in list(self._files.items()):
+            try:
+                pieces = {
+                    digest: _Piece(piece.blocks, self._datafy(piece.blocks))
+                    for digest, piece in old.pieces.items()
+                }
+            except ValueError as e:
+                changes.errors[path] = describe_error(e)
+                continue
+            new = _File(old.stat, old.digests, pieces)
+            self._files[path] = new
+            self._diff(path, old, new, changes)
+
+    def _refresh_file(self, path: Path, changes: ChangeSet):
+        old = self._files.get(path)
+        stat = _stat(path)
+        if stat is None:
+            if old is not None:
+                del self._files[path]
+                self._diff(path, old, None, changes)
+            return
+        if old is not None and old.stat == stat:
+            return
+
+        try:
+            text = path.read_text()
+            digests = []
+            pieces = {}
+            position = TextPosition()
+            for piece in split_root_blocks(text):
+                digest = hashlib.blake2b(piece.encode(), digest_size=16).digest()
+                digests.append(digest)
+                if digest in pieces:
+                    pass
+                elif old is not None and digest in old.pieces:
+                    pieces[digest] = old.pieces[digest]
+                else:
+                    pieces[digest] = self._load_piece(piece, position)
+                position = position.advance(piece)
+        except (OSError, UnicodeDecodeError, ValueError, LexicalError) as e:
+            changes.errors[path] = describe_error(e)
+            return
+        new = _File(stat, digests, pieces)
+        self._files[path] = new
+        self._diff(path, old, new, changes)
+
+    def _load_piece(self, text: str, position: TextPosition) -> _Piece:
+        # Errors are reported with their line and column in the file, not the piece.
+        blocks = read_piece(text, position)
+        return _Piece(blocks, self._datafy(blocks))
+
+    def _datafy(self, blocks: list[Block]) -> list[Any]:
+        if self.schema is None:
+            return list(blocks)
+        return list(iter_datafy_document(self.schema, blocks))
+
+    def _diff(self, path: Path, old: Optional[_File], new: Optional[_File], changes: ChangeSet):
+        old_blocks = _keyed(old)
+        new_blocks = _keyed(new)
+        for key, (block, data) in new_blocks.items():
+            previous = old_blocks.get(key)
+            if previous is None:
+                changes.added.append(Change(path, block.kind, block.name, data))
+            # Unchanged pieces are reused, so only re-parsed blocks need comparing.
+            elif previous[0] is not block and previous[1] != data:
+                changes.changed.append(Change(path, block.kind, block.name, data))
+        for key, (block, _) in old_blocks.items():
+            if key not in new_blocks:
+                changes.removed.append(Change(path, block.kind, block.name))
+
+    def _wait_for_paths(self, timeout: Optional[float]) -> Optional[set[Path]]:
+        # Returns the paths that may have changed, or None on timeout.
+        if self._inotify is None:
+            time.sleep(self.poll_interval if timeout is None else min(timeout, self.poll_interval))
+            return self._find_files() | set(self._files) | self._schema_paths()
+
+        events = self._inotify.read(timeout)
+        if events is None:
+            return None
+        # Changes tend to come in bursts, e.g. from a checkout, so they are gathered up.
+        while (more := self._inotify.read(self.debounce)) is not None:
+            events.extend(more)
+        paths = set()
+        for path, is_directory in events:
+            if is_directory:
+                if path.exists():
+                    self._inotify.add_directory(path)
+                    paths.update(p for p in path.rglob(self.pattern) if p.is_file())
+                # Files in a deleted or moved directory are removed.
+                paths.update(p for p in self._files if p.is_relative_to(path))
+            elif self._watched(path) or path in self._files or path == self.schema_path:
+                paths.add(path)
+        return paths
+
+    def _schema_paths(self) -> set[Path]:
+        return {self.schema_path} if self.schema_path is not None else set()
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[ChangeSet]:
+        """
+        Waits for files to change, returning the resulting change set, or None if there was no
+        change within `timeout` seconds.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            paths = self._wait_for_paths(remaining)
+            if paths:
+                changes = self.refresh(paths)
+                if changes:
+                    return changes
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+
+    def __iter__(self) -> Iterator[ChangeSet]:
+        while True:
+            changes = self.wait()
+            if changes is not None:
+                yield changes
+
+    def close(self):
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+    def __enter__(self) -> "Watcher":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
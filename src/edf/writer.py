@@ -0,0 +1,181 @@
+"""
+Functions for writing documents as EDF text.
+
+Each block is written as `kind name { ... }`, with its value or its attributes and children
+between the braces. Indented output has an attribute or child block per line, while compact
+output (`indent=None`) has each root block on a single line, with attributes ended by semicolons.
+Names, strings and numbers that EDF can't express raise ValueError rather than being written in a
+form that would read back differently.
+
+`dump_minified` writes the minified dialect read by `edf.parser.read_minified`, with no whitespace
+beyond what separates a block's kind from its name, and each root block on its own line.
+"""
+
+import io
+import json
+import math
+import re
+from array import array
+from collections.abc import Iterable, Sequence
+from decimal import Decimal
+from typing import Any, Optional, TextIO
+
+from edf.block import Block
+from edf.parser.lex import id_name_pattern, lit_num_pattern
+from edf.traverse import fold
+
+_keywords = {"true", "false"}
+
+# Characters that need escaping in strings.
+_string_escapes = re.compile(r'["\\\x00-\x1f]')
+
+
+def format_name(name: str) -> str:
+    if not isinstance(name, str) or not id_name_pattern.fullmatch(name) or name in _keywords:
+        raise ValueError(f"{name!r} can't be written as an EDF name")
+    return name
+
+
+def format_number(value: int | float) -> str:
+    text = repr(value)
+    if isinstance(value, float) and "e" in text and math.isfinite(value):
+        # Number literals have no exponents.
+        text = format(Decimal(text), "f")
+        if "." not in text:
+            text += ".0"
+    if not lit_num_pattern.fullmatch(text):
+        raise ValueError(f"{value!r} can't be written as an EDF number")
+    return text
+
+
+def format_value(value: Any) -> str:
+    if isinstance(value, str):
+        if not _string_escapes.search(value):
+            return f'"{value}"'
+        # JSON's escapes are all valid in EDF strings, and leave no line breaks in them.
+        return json.dumps(value, ensure_ascii=False)
+    elif isinstance(value, bool):
+        return "true" if value else "false"
+    elif isinstance(value, (int, float)):
+        return format_number(value)
+    elif isinstance(value, (list, array)):
+        return format_list(value)
+    else:
+        raise ValueError(f"Value of type {type(value).__name__} can't be written as EDF")
+
+
+def format_list(values: list | array, separator: str = ", ") -> str:
+    if isinstance(values, array):
+        return "[" + separator.join(map(format_number, values)) + "]"
+    items = []
+    for value in values:
+        if isinstance(value, (list, array)):
+            raise ValueError("Lists of lists can't be written as EDF")
+        items.append(format_value(value))
+    return "[" + separator.join(items) + "]"
+
+
+def dump_document(doc: Iterable[Block], fp: TextIO, indent: Optional[str] = "    "):
+    """
+    Writes a document to `fp` as EDF, one block at a time. Each attribute and block goes on its own
+    line, indented by `indent` per level, unless `indent` is None.
+    """
+    write = fp.write
+    compact = indent is None
+    indent = indent or ""
+
+    # Kinds and attribute names repeat, so each is only checked once.
+    names: dict[str, str] = {}
+
+    def checked_name(text: str) -> str:
+        formatted = names.get(text)
+        if formatted is None:
+            formatted = names[text] = format_name(text)
+        return formatted
+
+    def enter(block: Block, depth: int) -> tuple[int, Sequence[Block]]:
+        if depth:
+            write("\n" + indent * depth if not compact else " ")
+        write(checked_name(block.kind))
+        if block.name is not None:
+            write(" " + format_name(block.name))
+        if block.value is not None:
+            if block.attributes or block.children:
+                raise ValueError(f"Block {block.kind} has both a value and a body")
+            write(" { " + format_value(block.value) + " }")
+            return depth, ()
+        write(" {")
+        depth += 1
+        for attr_name, attr_value in block.attributes.items():
+            if compact:
+                write(f" {checked_name(attr_name)} = {format_value(attr_value)};")
+            else:
+                write(f"\n{indent * depth}{checked_name(attr_name)} = {format_value(attr_value)}")
+        return depth, block.children
+
+    def leave(block: Block, depth: int, _: list[None]):
+        if block.value is not None:
+            return
+        if not block.attributes and not block.children:
+            write("}")
+        elif compact:
+            write(" }")
+        else:
+            write("\n" + indent * (depth - 1) + "}")
+
+    for block in doc:
+        fold(block, 0, leave, enter)
+        write("\n")
+
+
+def dumps_document(doc: Iterable[Block], indent: Optional[str] = "    ") -> str:
+    fp = io.StringIO()
+    dump_document(doc, fp, indent)
+    return fp.getvalue()
+
+
+def dump_minified(doc: Iterable[Block], fp: TextIO):
+    """
+    Writes a document to `fp` as minified EDF, one block at a time.
+    """
+    write = fp.write
+    names: dict[str, str] = {}
+
+    def checked_name(text: str) -> str:
+        formatted = names.get(text)
+        if formatted is None:
+            formatted = names[text] = format_name(text)
+        return formatted
+
+    def value(v: Any) -> str:
+        if isinstance(v, (list, array)):
+            return format_list(v, ",")
+        return format_value(v)
+
+    def enter(block: Block, _: None) -> tuple[None, Sequence[Block]]:
+        write(checked_name(block.kind))
+        if block.name is not None:
+            write(" " + format_name(block.name))
+        if block.value is not None:
+            if block.attributes or block.children:
+                raise ValueError(f"Block {block.kind} has both a value and a body")
+            write("{" + value(block.value) + "}")
+            return None, ()
+        write("{")
+        for attr_name, attr_value in block.attributes.items():
+            write(f"{checked_name(attr_name)}={value(attr_value)};")
+        return None, block.children
+
+    def leave(block: Block, _: None, __: list[None]):
+        if block.value is None:
+            write("}")
+
+    for block in doc:
+        fold(block, None, leave, enter)
+        write("\n")
+
+
+def dumps_minified(doc: Iterable[Block]) -> str:
+    fp = io.StringIO()
+    dump_minified(doc, fp)
+    return fp.getvalue()
@@ -1,24 +1,120 @@
-from xml.dom import minidom as xml
+"""
+Functions for writing EDF documents as XML.
 
-from edf.block import Block, Document
+Blocks become elements named after their kind, with their name in the `id` attribute and their
+attributes as XML attributes. A single-value block's value becomes the element's text. Lists are
+written as their items separated by spaces, as in XML Schema's list types.
+"""
 
+import io
+from array import array
+from collections.abc import Iterable, Sequence
+from typing import Any, Optional, TextIO
+from xml.dom import minidom
 
-def block_to_xml_element(block: Block, owner_doc: xml.Document) -> xml.Element:
+from edf.block import Block
+from edf.traverse import fold
+
+
+def escape_text(s: str) -> str:
+    return s.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def escape_attribute(s: str) -> str:
+    # Whitespace characters are escaped so that attribute value normalisation preserves them.
+    return (
+        escape_text(s)
+        .replace('"', "&quot;")
+        .replace("\n", "&#10;")
+        .replace("\r", "&#13;")
+        .replace("\t", "&#9;")
+    )
+
+
+def _text(value: Any) -> str:
+    if isinstance(value, (list, array)):
+        return " ".join(map(str, value))
+    return str(value)
+
+
+def dump_document_xml(doc: Iterable[Block], fp: TextIO, indent: Optional[str] = "  "):
+    """
+    Writes a document to `fp` as XML, one element at a time. Each element goes on its own line,
+    indented by `indent` per level, unless `indent` is None.
+    """
+    write = fp.write
+    newline = "" if indent is None else "\n"
+    indent = indent or ""
+
+    def enter(block: Block, depth: int) -> tuple[int, Sequence[Block]]:
+        depth += 1
+        write(f"{indent * depth}<{block.kind}")
+        if block.name:
+            write(f' id="{escape_attribute(block.name)}"')
+        if block.value is not None:
+            write(f">{escape_text(_text(block.value))}</{block.kind}>{newline}")
+            return depth, ()
+        for attr_name, attr_value in block.attributes.items():
+            write(f' {attr_name}="{escape_attribute(_text(attr_value))}"')
+        if block.children:
+            write(f">{newline}")
+        return depth, block.children
+
+    def leave(block: Block, depth: int, _: list[None]):
+        if block.children:
+            write(f"{indent * depth}</{block.kind}>{newline}")
+        elif block.value is None:
+            write(f"/>{newline}")
+
+    write(f'<?xml version="1.0" ?>{newline}')
+    blocks = iter(doc)
+    first = next(blocks, None)
+    if first is None:
+        write(f"<document/>{newline}")
+        return
+    write(f"<document>{newline}")
+    fold(first, 0, leave, enter)
+    for block in blocks:
+        fold(block, 0, leave, enter)
+    write(f"</document>{newline}")
+
+
+def document_to_xml_string(doc: Iterable[Block], indent: Optional[str] = "  ") -> str:
+    fp = io.StringIO()
+    dump_document_xml(doc, fp, indent)
+    return fp.getvalue()
+
+
+def _enter_element(
+    block: Block, parent: minidom.Document | minidom.Element
+) -> tuple[minidom.Element, Sequence[Block]]:
+    # The root is entered with the owner document itself.
+    owner_doc = parent.ownerDocument or parent
     e = owner_doc.createElement(block.kind)
     if block.name:
         e.setAttribute("id", block.name)
-    if block.value:
-        e.nodeValue = str(block.value)
-    else:
-        for attr_name, attr_value in block.attributes.items():
-            e.setAttribute(attr_name, str(attr_value))
-        for child in block.children:
-            e.appendChild(block_to_xml_element(child, owner_doc))
+    if block.value is not None:
+        e.appendChild(owner_doc.createTextNode(_text(block.value)))
+        return e, ()
+    for attr_name, attr_value in block.attributes.items():
+        e.setAttribute(attr_name, _text(attr_value))
+    return e, block.children
+
+
+def _leave_element(
+    block: Block, e: minidom.Element, children: list[minidom.Element]
+) -> minidom.Element:
+    for child in children:
+        e.appendChild(child)
     return e
 
 
-def document_to_xml_document(doc: Document) -> xml.Document:
-    d = xml.Document()
+def document_to_xml_document(doc: Iterable[Block]) -> minidom.Document:
+    """
+    Returns a document as a minidom DOM, for code that works on one. `dump_document_xml` writes
+    XML without building a DOM.
+    """
+    d = minidom.Document()
     root = d.createElement("document")
     d.appendChild(root)
     for block in doc:
@@ -26,5 +122,8 @@ def document_to_xml_document(doc: Document) -> xml.Document:
     return d
 
 
-def document_to_xml_string(doc: Document) -> str:
-    return document_to_xml_document(doc).toprettyxml(indent="  ")
+def block_to_xml_element(block: Block, owner_doc: minidom.Document) -> minidom.Element:
+    """
+    Returns a block as a minidom element, created in `owner_doc`.
+    """
+    return fold(block, owner_doc, _leave_element, _enter_element)
@@ -0,0 +1,56 @@
+# Documents shared by the tests of the binary format and of the converters built on it.
+
+from array import array
+
+from edf.block import Block
+from edf.parser import read_document
+
+
+def deep(depth: int) -> Block:
+    root = block = Block("node")
+    for i in range(depth):
+        child = Block("node", name=f"n{i}")
+        block.children.append(child)
+        block = child
+    return root
+
+
+documents = [
+    [],
+    read_document(
+        """
+foo test {
+    foo = "bar"
+    inner {
+        bar = 1
+    }
+    inner {
+        bar = "x"
+    }
+}
+"""
+    ),
+    [
+        Block(
+            "values",
+            attributes={
+                "int": 1,
+                "zero": 0,
+                "negative": -5,
+                "big": 2**80,
+                "small": -(2**70),
+                "float": 1.5,
+                "true": True,
+                "false": False,
+                "none": None,
+                "empty": "",
+                "nul": "a\0b",
+                "unicode": "héllo ☃",
+            },
+        ),
+        Block("lists", attributes={"q": array("q", [1]), "d": array("d", [0.5]), "l": [1, "a"]}),
+        Block("single", name="s", value="text"),
+        Block("single", value=-3.25, children=[Block("child", value=300)]),
+    ],
+    [Block(f"kind{i}", name=f"name{i}", attributes={f"key{i}": f"value{i}"}) for i in range(300)],
+]
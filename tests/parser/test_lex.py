@@ -224,6 +224,32 @@ toks_multi_line_attr = [
     Token(TokenId.RBRACE, "}", 73, 1, 5, 1),
 ]
 
+doc_multi_line_list = """\
+block {
+    ports = [
+        80,
+        443,
+    ]
+}
+"""
+
+# No semicolons are inserted within the list, even before its closing bracket.
+toks_multi_line_list = [
+    Token(TokenId.ID_NAME, "block", 0, 5, 1, 1),
+    Token(TokenId.LBRACE, "{", 6, 1, 1, 7),
+    Token(TokenId.ID_NAME, "ports", 12, 5, 2, 5),
+    Token(TokenId.EQUALS, "=", 18, 1, 2, 11),
+    Token(TokenId.LBRACKET, "[", 20, 1, 2, 13),
+    Token(TokenId.LIT_NUM_DEC, "80", 30, 2, 3, 9),
+    Token(TokenId.COMMA, ",", 32, 1, 3, 11),
+    Token(TokenId.LIT_NUM_DEC, "443", 42, 3, 4, 9),
+    Token(TokenId.COMMA, ",", 45, 1, 4, 12),
+    Token(TokenId.RBRACKET, "]", 51, 1, 5, 5),
+    Token(TokenId.SEMICOLON, "", 54, 0, 6, 2, fabricated=True),
+    Token(TokenId.RBRACE, "}", 53, 1, 6, 1),
+]
+
+
 
 @pytest.mark.parametrize(
     "text, expected",
@@ -237,6 +263,7 @@ toks_multi_line_attr = [
         (doc_one_liner, toks_one_liner),
         (doc_whitespace_comments, toks_whitespace_comments),
         (doc_multi_line_attr, toks_multi_line_attr),
+        (doc_multi_line_list, toks_multi_line_list),
     ],
 )
 def test_tokenize(text, expected):
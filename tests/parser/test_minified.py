@@ -0,0 +1,106 @@
+from array import array
+
+import pytest
+
+from edf import bench
+from edf.block import Block
+from edf.parser import read_document, read_minified
+from edf.parser.lex import LexicalError
+from edf.writer import dumps_minified
+
+doc = [
+    Block(
+        "foo",
+        "test",
+        attributes={
+            "s": 'a "quoted" \\ string\n',
+            "n": -12,
+            "f": 1.5,
+            "b": True,
+            "c": False,
+            "l": array("q", [1, -2]),
+            "m": ["x", 1.5, True],
+        },
+        children=[
+            Block("inner", attributes={"bar": 42}),
+            Block("empty"),
+            Block("value", "v", value="single"),
+            Block("flag", value=True),
+            Block("vector", value=array("d", [1.5, 2.5])),
+            Block("nested", children=[Block("deeper", "d'#", attributes={"x": 1})]),
+        ],
+    ),
+    Block("include", value="common.edf"),
+]
+
+
+def test_dumps_minified():
+    document = [Block("foo", "a", attributes={"x": 1, "y": "s"}, children=[Block("b")])]
+    assert dumps_minified(document) == 'foo a{x=1;y="s";b{}}\n'
+
+
+def test_round_trip():
+    text = dumps_minified(doc)
+    assert read_minified(text) == doc
+    # Minified documents are valid EDF.
+    assert read_document(text) == doc
+
+
+@pytest.mark.parametrize("shape", list(bench.corpora))
+def test_corpus(shape):
+    document = read_document(bench.corpora[shape](50).source)
+    assert read_minified(dumps_minified(document)) == document
+
+
+def test_whitespace_is_insignificant():
+    source = 'foo  a {\n  x = 1 ;\n\n inner { } v {\t"s" ; }\n}\n  bar { }'
+    assert read_minified(source) == read_document(source)
+
+
+@pytest.mark.parametrize(
+    "source, message, line, col",
+    [
+        ("foo { x = 1 }", "Expected ';'", 1, 13),
+        ("foo {\n  x = 1;\n", "Unclosed block foo", 3, 1),
+        ("foo { x = ; }", "Expected a value", 1, 11),
+        ("foo { x = 0; }", "Expected a value", 1, 11),
+        ("foo }", "Expected '{'", 1, 5),
+        ("}", "Unexpected '}'", 1, 1),
+        ("x = 1;", "Attribute outside a block", 1, 1),
+        ("foo { # comment\n}", "Unexpected '#'", 1, 7),
+        ('foo { "unterminated }', "Unexpected '\"'", 1, 7),
+        ("true {}", "Unexpected 'true'", 1, 1),
+        ("foo { x = [1 2]; }", "Expected ',' or ']'", 1, 14),
+        ("foo { x = [,]; }", "Expected a value in list", 1, 12),
+    ],
+)
+def test_errors(source, message, line, col):
+    with pytest.raises(LexicalError) as e:
+        read_minified(source)
+    assert message in e.value.message
+    assert (e.value.line, e.value.col) == (line, col)
+
+
+@pytest.mark.parametrize(
+    "string",
+    [
+        r"\/",
+        r"a\\/b",
+        r"\'",
+        r"\"\\\"",
+        r"\b\f\n\r\t",
+        r"\u00e9\u00E9\u0000",
+        r"\ud83d\ude00",
+        r"\U0001f600",
+        r"\x41\101\0",
+        r"\a\v",
+        r"\N{BULLET}",
+        r"\q",
+        r"\\\\u0041",
+    ],
+)
+# Python's invalid escapes are kept, with a warning.
+@pytest.mark.filterwarnings("ignore::SyntaxWarning")
+def test_string_escapes_match_read_document(string):
+    source = f'foo{{s="{string}";}}'
+    assert read_minified(source) == read_document(source)
@@ -114,6 +114,33 @@ node_ids_nested = [
     NodeId.BLOCK
 ]
 
+doc_list = """\
+anon_block {
+    key1 = [1, "two", true,]
+    key2 = []
+}
+"""
+
+node_ids_list = [
+    NodeId.BLOCK_INTRODUCER,
+    NodeId.BLOCK_BODY_START,
+    NodeId.ATTRIBUTE_INTRODUCER,
+    NodeId.ATTRIBUTE_ASSIGNMENT,
+    NodeId.LIST_START,
+    NodeId.LIT_NUMBER,
+    NodeId.LIT_STRING,
+    NodeId.LIT_BOOL,
+    NodeId.LIST,
+    NodeId.ATTRIBUTE,
+    NodeId.ATTRIBUTE_INTRODUCER,
+    NodeId.ATTRIBUTE_ASSIGNMENT,
+    NodeId.LIST_START,
+    NodeId.LIST,
+    NodeId.ATTRIBUTE,
+    NodeId.BLOCK
+]
+
+
 
 @pytest.mark.parametrize(
     "doc, node_ids",
@@ -122,9 +149,25 @@ node_ids_nested = [
         (doc_simple_anon, node_ids_simple_anon),
         (doc_simple_value, node_ids_simple_value),
         (doc_nested, node_ids_nested),
+        (doc_list, node_ids_list),
     ],
 )
 def test_build(doc, node_ids):
     tokens = tokenize(doc)
     tree = parse(tokens)
-    assert [node.kind.id for node in tree] == node_ids
\ No newline at end of file
+    assert [node.kind.id for node in tree] == node_ids
+
+
+@pytest.mark.parametrize(
+    "doc",
+    [
+        "block { key = [1 2] }",
+        "block { key = [1,, 2] }",
+        "block { key = [,] }",
+        "block { key = [[1], [2]] }",
+        "block { key = [block {}] }",
+    ],
+)
+def test_invalid_list(doc):
+    with pytest.raises(ValueError):
+        parse(tokenize(doc))
@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+from edf import bench
+from edf.io import loads_data, loads_document, loads_schema
+
+
+@pytest.mark.parametrize("shape", list(bench.corpora))
+def test_corpus_matches_schema(shape):
+    corpus = bench.corpora[shape](120)
+    doc = loads_document(corpus.source)
+    count = 0
+    stack = list(doc)
+    while stack:
+        block = stack.pop()
+        count += 1
+        stack.extend(block.children)
+    assert count == corpus.blocks
+    assert len(loads_data(corpus.source, loads_schema(corpus.schema_source))) == len(doc)
+
+
+def test_run_and_compare():
+    report = bench.run(["small", "deep"], ["build", "datafy_document"], blocks=50, repeat=1)
+    report = json.loads(json.dumps(report))
+    assert set(report["results"]) == {"small", "deep"}
+    for result in report["results"].values():
+        assert set(result["phases"]) == {"build", "datafy_document"}
+        for timing in result["phases"].values():
+            assert timing["seconds"] > 0
+            assert timing["peak_memory_bytes"] > 0
+
+    baseline = {"results": {"small": report["results"]["small"]}}
+    comparisons = bench.compare(report, baseline)
+    assert [(c.shape, c.phase, c.ratio) for c in comparisons] == [
+        ("small", "build", 1.0),
+        ("small", "datafy_document", 1.0),
+    ]
+
+
+def test_schema_phases():
+    report = bench.run(["deep"], ["analyze_schema"], blocks=50, repeat=1)
+    timing = report["results"]["deep"]["phases"]["analyze_schema"]
+    # The deep corpus's schema has a block, an attribute and (but for the last) a sub-block per
+    # level.
+    assert timing["blocks_per_second"] * timing["seconds"] == pytest.approx(
+        3 * bench.DEEP_DEPTH - 1
+    )
+
+
+def test_scaling():
+    report = bench.run(["small"], ["parse"], blocks=20, repeat=1, threads=[1, 2], documents=4)
+    report = json.loads(json.dumps(report))
+    assert isinstance(report["gil_enabled"], bool)
+    scaling = report["scaling"]["small"]
+    assert list(scaling) == ["1", "2"]
+    assert scaling["1"]["speedup"] == 1.0
+    assert all(timing["documents_per_second"] > 0 for timing in scaling.values())
+
+
+def test_unknown_phase():
+    with pytest.raises(ValueError):
+        bench.run(phase_names=["nope"])
@@ -0,0 +1,72 @@
+import pytest
+
+from edf import binary
+from edf.block import Block
+
+from .documents import deep, documents
+
+
+@pytest.mark.parametrize("doc", documents)
+def test_round_trip(doc):
+    assert binary.loads(binary.dumps(doc)) == doc
+
+
+def test_deep_round_trip():
+    block = binary.loads(binary.dumps([deep(5000)]))[0]
+    # Compared by walking, as Block equality recurses.
+    for i in range(5000):
+        (block,) = block.children
+        assert block.name == f"n{i}"
+    assert not block.children
+
+
+def test_shapes_preserve_attribute_order():
+    doc = [Block("foo", attributes={"a": 1, "b": 2}), Block("foo", attributes={"b": 2, "a": 1})]
+    loaded = binary.loads(binary.dumps(doc))
+    assert [list(block.attributes) for block in loaded] == [["a", "b"], ["b", "a"]]
+
+
+def test_unsupported_value():
+    with pytest.raises(TypeError):
+        binary.dumps([Block("foo", attributes={"bad": object()})])
+
+
+def test_not_binary():
+    with pytest.raises(binary.BinaryFormatError):
+        binary.loads(b"foo { }")
+
+
+def test_mapped_document(tmp_path):
+    doc = documents[2] + documents[3]
+    path = tmp_path / "doc.edfb"
+    with open(path, "wb") as f:
+        binary.dump(doc, f)
+    with binary.MappedDocument(path) as mapped:
+        assert len(mapped) == len(doc)
+        assert mapped[150] == doc[150]
+        assert mapped[-1] == doc[-1]
+        assert mapped[1:3] == doc[1:3]
+        assert list(mapped) == doc
+        with pytest.raises(IndexError):
+            mapped[len(doc)]
+
+
+@pytest.mark.parametrize("doc", documents[1:])
+def test_truncated(tmp_path, doc):
+    data = binary.dumps(doc)
+    path = tmp_path / "doc.edfb"
+    for size in sorted({5, 20, len(data) // 2, len(data) - 3, len(data) - 1}):
+        with pytest.raises(binary.BinaryFormatError):
+            binary.loads(data[:size])
+        path.write_bytes(data[:size])
+        with pytest.raises(binary.BinaryFormatError):
+            with binary.MappedDocument(path) as mapped:
+                list(mapped)
+
+
+def test_corrupt_string_index():
+    data = bytearray(binary.dumps([Block("foo", name="bar")]))
+    # The block's name index, the last byte before its child count.
+    data[-2] = 0x7F
+    with pytest.raises(binary.BinaryFormatError):
+        binary.loads(bytes(data))
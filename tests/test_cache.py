@@ -0,0 +1,83 @@
+import os
+
+from edf.cache import Cache
+from edf.io import loads_document, loads_schema
+
+
+doc = """\
+foo test {
+    foo = "bar"
+
+    inner {
+        bar = 42
+    }
+}
+"""
+
+schema = """\
+block foo {
+    attribute foo {
+        type = "string"
+    }
+}
+"""
+
+
+def test_cache_hit(tmp_path):
+    cache = Cache(tmp_path)
+    calls = []
+
+    def compute(source):
+        calls.append(source)
+        return loads_document(source)
+
+    first = cache.load("document", doc, compute)
+    second = cache.load("document", doc, compute)
+    assert first == second == loads_document(doc)
+    assert calls == [doc]
+
+
+def test_cache_keys(tmp_path):
+    cache = Cache(tmp_path)
+    assert loads_document(doc, cache) == loads_document(doc)
+    assert loads_schema(schema, cache) == loads_schema(schema)
+    assert loads_schema(schema, cache) == loads_schema(schema)
+    assert len(list(tmp_path.glob("*.pickle"))) == 2
+    assert cache.key("document", doc) != cache.key("schema", doc)
+
+
+def test_cache_corrupt_entry(tmp_path):
+    cache = Cache(tmp_path)
+    loads_document(doc, cache)
+    cache.path(cache.key("document", doc)).write_bytes(b"not a pickle")
+    assert loads_document(doc, cache) == loads_document(doc)
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = Cache(tmp_path)
+    sources = [doc.replace("42", str(i)) for i in range(1, 4)]
+    for i, source in enumerate(sources):
+        loads_document(source, cache)
+        os.utime(cache.path(cache.key("document", source)), (i, i))
+    # Using the oldest entry makes it the most recently used.
+    loads_document(sources[0], cache)
+
+    sizes = [cache.path(cache.key("document", s)).stat().st_size for s in sources]
+    cache.max_size = sizes[0] + sizes[2]
+    cache.evict()
+    assert [cache.path(cache.key("document", s)).exists() for s in sources] == [True, False, True]
+
+
+def test_cache_keyed_by_code(tmp_path, monkeypatch):
+    cache = Cache(tmp_path)
+    calls = []
+
+    def compute(source):
+        calls.append(source)
+        return loads_document(source)
+
+    cache.load("document", doc, compute)
+    # A cache made after the library changes doesn't reuse entries made before.
+    monkeypatch.setattr("edf.cache.code_fingerprint", lambda: "changed")
+    Cache(tmp_path).load("document", doc, compute)
+    assert calls == [doc, doc]
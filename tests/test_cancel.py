@@ -0,0 +1,76 @@
+import threading
+import time
+
+import pytest
+
+from edf.cancel import CHECK_INTERVAL, CancellationToken, Cancelled, DeadlineExceeded
+from edf.datafy import datafy_document
+from edf.io import iter_data, loads_data, loads_document, loads_schema
+from edf.parser import read_document
+from edf.parser.lex import tokenize
+from edf.parser.parse import parse
+
+schema = loads_schema(
+    """\
+block item {
+    attribute size {
+        type = "number"
+    }
+}
+"""
+)
+
+source = "".join(f"item i{i} {{\n    size = {i + 1}\n}}\n" for i in range(CHECK_INTERVAL * 4))
+
+
+def test_unchanged():
+    cancel = CancellationToken(timeout=60)
+    assert loads_document(source, cancel=cancel) == loads_document(source)
+    assert loads_data(source, schema, cancel=cancel) == loads_data(source, schema)
+    assert not cancel.cancelled
+
+
+@pytest.mark.parametrize(
+    "load",
+    [
+        lambda cancel: list(tokenize(source, cancel=cancel)),
+        lambda cancel: parse(tokenize(source), cancel=cancel),
+        lambda cancel: read_document(source, cancel=cancel),
+        lambda cancel: loads_document(source, cancel=cancel),
+        lambda cancel: loads_data(source, schema, cancel=cancel),
+        lambda cancel: loads_data(source, schema, fields=["size"], cancel=cancel),
+        lambda cancel: list(iter_data(source, schema, cancel=cancel)),
+    ],
+)
+def test_cancelled(load):
+    cancel = CancellationToken()
+    cancel.cancel()
+    with pytest.raises(Cancelled, match="Load cancelled"):
+        load(cancel)
+
+
+def test_datafy_cancelled():
+    document = read_document(source)
+    cancel = CancellationToken()
+    cancel.cancel()
+    with pytest.raises(Cancelled):
+        datafy_document(schema, document, cancel)
+
+
+def test_deadline():
+    cancel = CancellationToken(timeout=0.01)
+    time.sleep(0.02)
+    with pytest.raises(DeadlineExceeded, match="timeout of 0.01s") as e:
+        loads_data(source, schema, cancel=cancel)
+    assert isinstance(e.value, TimeoutError)
+
+
+def test_cancel_from_another_thread():
+    cancel = CancellationToken()
+    blocks = iter_data(source, schema, cancel=cancel)
+    assert next(blocks)["id"] == "i0"
+    thread = threading.Thread(target=cancel.cancel)
+    thread.start()
+    thread.join()
+    with pytest.raises(Cancelled):
+        list(blocks)
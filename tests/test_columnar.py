@@ -0,0 +1,139 @@
+import json
+import pickle
+from array import array
+
+import pytest
+
+from edf.columnar import BooleanArray, json_default
+from edf.io import loads_data, loads_schema
+
+schema_source = """\
+block foo {
+    sub_block {
+        field = "inners"
+        columnar = true
+
+        block inner {
+            attribute bar {
+                type = "number"
+                required = true
+            }
+            attribute baz {
+                type = "number"
+                default = 1.5
+                required = true
+            }
+            attribute flag {
+                type = "boolean"
+                default = false
+                required = true
+            }
+            attribute label {
+                type = "string"
+            }
+        }
+    }
+}
+"""
+
+doc = """\
+foo test {
+    inner a { bar = 1; baz = 2; flag = true; label = "x" }
+    inner b { bar = 3 }
+    inner c { bar = 5; baz = 2.5 }
+}
+"""
+
+
+def test_columns():
+    (data,) = loads_data(doc, loads_schema(schema_source))
+    inners = data["inners"]
+    assert inners == {
+        "id": ["a", "b", "c"],
+        "bar": array("q", [1, 3, 5]),
+        "baz": array("d", [2, 1.5, 2.5]),
+        "flag": BooleanArray([True, False, False]),
+        "label": ["x", None, None],
+    }
+    assert inners["flag"].tolist() == [True, False, False]
+    assert pickle.loads(pickle.dumps(inners)) == inners
+    assert json.loads(json.dumps(data, default=json_default)) == {
+        "id": "test",
+        "inners": {
+            "id": ["a", "b", "c"],
+            "bar": [1, 3, 5],
+            "baz": [2.0, 1.5, 2.5],
+            "flag": [True, False, False],
+            "label": ["x", None, None],
+        },
+    }
+
+
+def test_missing_values_make_a_list():
+    schema = loads_schema(schema_source.replace("required = true\n", "", 1))
+    source = "foo test {\n    inner a { bar = 1 }\n    inner b { baz = 1 }\n}\n"
+    (data,) = loads_data(source, schema)
+    assert data["inners"]["bar"] == [1, None]
+
+
+def test_empty():
+    (data,) = loads_data("foo test {}", loads_schema(schema_source))
+    assert data["inners"] == {
+        "id": [],
+        "bar": array("q"),
+        "baz": array("q"),
+        "flag": BooleanArray(),
+        "label": [],
+    }
+
+
+def test_projection():
+    (data,) = loads_data(doc, loads_schema(schema_source), fields=["inners[*].bar"])
+    assert data == {"inners": {"bar": array("q", [1, 3, 5])}}
+
+
+multiple_schema = """\
+block foo {
+    sub_block {
+        field = "inner"
+        multiplicity = "one"
+        columnar = true
+
+        block inner {
+            anonymous = true
+        }
+    }
+}
+"""
+
+nested_schema = """\
+block foo {
+    sub_block {
+        field = "inners"
+        columnar = true
+
+        block inner {
+            anonymous = true
+            sub_block {
+                field = "deeper"
+
+                block deeper {
+                    anonymous = true
+                }
+            }
+        }
+    }
+}
+"""
+
+
+@pytest.mark.parametrize(
+    "source, message",
+    [
+        (multiple_schema, "must have a multiplicity of many"),
+        (nested_schema, "cannot have sub-blocks"),
+    ],
+)
+def test_invalid_schema(source, message):
+    with pytest.raises(ValueError, match=message):
+        loads_schema(source)
@@ -0,0 +1,123 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from edf import stats
+from edf.include import IncludeSession
+from edf.io import (
+    iter_data,
+    iter_document,
+    load_data,
+    load_document,
+    load_many,
+    loads_data,
+    loads_document,
+    loads_schema,
+)
+from edf.parser import read_document
+
+
+def write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+    return path
+
+
+@pytest.fixture
+def files(tmp_path):
+    write(tmp_path / "common.edf", 'foo common {\n    foo = "c"\n}\n')
+    write(tmp_path / "parts/a.edf", 'include "../common.edf"\nfoo a {\n    foo = "a"\n}\n')
+    write(tmp_path / "parts/b.edf", 'foo b {\n    foo = "b"\n}\ninclude "../common.edf"\n')
+    write(
+        tmp_path / "main.edf",
+        'foo main {\n    foo = "m"\n}\ninclude "parts/a.edf"\ninclude "parts/b.edf"\n',
+    )
+    return tmp_path
+
+
+def names(doc):
+    return [block.name for block in doc]
+
+
+def test_include_shorthand_parses_as_single_value_block():
+    (block,) = read_document('include "x.edf";')
+    assert (block.kind, block.name, block.value) == ("include", None, "x.edf")
+
+
+@pytest.mark.parametrize("parallel", [False, True])
+def test_load(files, parallel):
+    with ThreadPoolExecutor(2) as executor:
+        session = IncludeSession(executor if parallel else None)
+        with stats.collect() as collected:
+            doc = session.load(files / "main.edf")
+    assert names(doc) == ["main", "common", "a", "b", "common"]
+    # The shared fragment is parsed once.
+    assert len(collected) == 4
+
+    assert session.includes(files / "main.edf") == [
+        (files / "parts/a.edf").resolve(),
+        (files / "parts/b.edf").resolve(),
+    ]
+    assert session.dependencies(files / "main.edf") == {
+        (files / name).resolve() for name in ["parts/a.edf", "parts/b.edf", "common.edf"]
+    }
+    assert session.dependents(files / "common.edf") == {
+        (files / name).resolve() for name in ["main.edf", "parts/a.edf", "parts/b.edf"]
+    }
+
+
+def test_session_cache(files):
+    session = IncludeSession()
+    session.load(files / "main.edf")
+    with stats.collect() as collected:
+        session.load(files / "parts/a.edf")
+    assert collected == []
+
+    common = files / "common.edf"
+    common.write_text('foo changed {\n    foo = "c"\n}\n')
+    mtime = os.stat(common).st_mtime_ns + 1_000_000_000
+    os.utime(common, ns=(mtime, mtime))
+    with stats.collect() as collected:
+        doc = session.load(files / "main.edf")
+    assert len(collected) == 1
+    assert names(doc) == ["main", "changed", "a", "b", "changed"]
+
+
+def test_cycle(files):
+    write(files / "parts/a.edf", 'include "b.edf"\n')
+    write(files / "parts/b.edf", 'include "a.edf"\n')
+    with pytest.raises(ValueError, match="Include cycle: .*a.edf -> .*b.edf -> .*a.edf"):
+        load_document(files / "main.edf")
+
+
+schema = loads_schema('block foo {\n    attribute foo {\n        type = "string"\n    }\n}\n')
+
+
+def test_load_data(files):
+    data = load_data(files / "parts/b.edf", schema)
+    assert data == [{"id": "b", "foo": "b"}, {"id": "common", "foo": "c"}]
+
+
+def test_loads_with_base_dir(files):
+    source = (files / "main.edf").read_text()
+    expected = load_document(files / "main.edf")
+    assert loads_document(source, base_dir=files) == expected
+    assert list(iter_document(source, base_dir=files)) == expected
+    # Without a directory to resolve them in, includes are left in the document.
+    assert names(loads_document(source)) == ["main", None, None]
+
+    data = load_data(files / "main.edf", schema)
+    assert loads_data(source, schema, base_dir=files) == data
+    assert list(iter_data(source, schema, base_dir=files)) == data
+    assert loads_data(source, schema, fields=["foo"], base_dir=files) == [
+        {"foo": item["foo"]} for item in data
+    ]
+    assert [data for _, data in load_many([files / "main.edf"], schema)] == [data]
+
+
+@pytest.mark.parametrize("fields", [None, ["foo"]])
+def test_loads_data_rejects_unresolved_includes(files, fields):
+    source = (files / "main.edf").read_text()
+    with pytest.raises(ValueError, match="Can't resolve include 'parts/a.edf'"):
+        loads_data(source, schema, fields=fields)
@@ -0,0 +1,105 @@
+import asyncio
+import io
+import random
+
+import pytest
+
+from edf.incremental import IncrementalReader, iter_file, read_stream
+from edf.io import loads_data, loads_schema
+from edf.parser import read_document
+from edf.parser.lex import LexicalError
+
+source = """\
+foo test {
+    foo = "bar"  # a comment with { braces }
+    inner {
+        bar = 42
+    }
+}
+foo second {\r
+    foo = "a \\"quoted\\" { string } # ☃"\r
+}\r
+# trailing { comment
+foo# third { foo = "x" }   foo fourth {
+    foo = "unclosed";
+"""
+
+
+def feed_in_chunks(reader: IncrementalReader, data: str | bytes, seed: int) -> list:
+    rnd = random.Random(seed)
+    result = []
+    i = 0
+    while i < len(data):
+        n = rnd.randint(1, 12)
+        result += reader.feed(data[i : i + n])
+        i += n
+    return result + reader.close()
+
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("encode", [False, True])
+def test_chunked_matches_read_document(seed, encode):
+    data = source.encode() if encode else source
+    assert feed_in_chunks(IncrementalReader(), data, seed) == read_document(source)
+
+
+def test_blocks_are_returned_when_complete():
+    reader = IncrementalReader()
+    assert reader.feed('foo a {\n    foo = "}"\n') == []
+    (block,) = reader.feed("}\nfoo b {")
+    assert block.name == "a"
+    assert reader.feed("}") == read_document("foo b {}")
+    assert reader.close() == []
+
+
+def test_schema():
+    schema = loads_schema('block foo {\n    attribute foo {\n        type = "string"\n    }\n}\n')
+    doc = 'foo a {\n    foo = "x"\n}\nfoo b {\n    foo = "y"\n}\n'
+    assert feed_in_chunks(IncrementalReader(schema), doc, 0) == loads_data(doc, schema)
+
+
+def test_error_position():
+    doc = "foo a {\n}\nfoo b { @ }"
+    with pytest.raises(LexicalError) as expected:
+        read_document(doc)
+    reader = IncrementalReader()
+    reader.feed(doc[:12])
+    with pytest.raises(LexicalError) as info:
+        reader.feed(doc[12:])
+    assert info.value == expected.value
+
+
+def test_read_stream():
+    async def read() -> list:
+        reader = asyncio.StreamReader()
+        for i in range(0, len(source), 7):
+            reader.feed_data(source[i : i + 7].encode())
+        reader.feed_eof()
+        return [block async for block in read_stream(reader, chunk_size=5)]
+
+    assert asyncio.run(read()) == read_document(source)
+
+
+class CountingFile(io.StringIO):
+    def __init__(self, text: str):
+        super().__init__(text)
+        self.chars_read = 0
+
+    def read(self, size: int = -1) -> str:
+        chunk = super().read(size)
+        self.chars_read += len(chunk)
+        return chunk
+
+
+def test_iter_file():
+    assert list(iter_file(io.StringIO(source), chunk_size=5)) == read_document(source)
+    assert list(iter_file(io.BytesIO(source.encode()), chunk_size=5)) == read_document(source)
+
+    # Each block is returned once it has been read, without reading the rest of the file.
+    block = 'foo b {\n    foo = "x"\n}\n'
+    f = CountingFile(block * 1000)
+    items = iter_file(f, chunk_size=len(block))
+    for i in range(1, 4):
+        next(items)
+        assert f.chars_read == i * len(block)
+    assert len(list(items)) == 997
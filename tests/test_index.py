@@ -0,0 +1,95 @@
+import os
+
+import pytest
+
+from edf import index
+from edf.index import StaleIndex, build_index, default_index_path, load_block
+from edf.parser import read_document
+from edf.parser.lex import LexicalError
+
+source = """\
+include "common.edf"
+item b {
+    label = "☃ } #"  # a { comment
+    inner {
+        size = 2
+    }
+}
+item a {\r
+    size = 1\r
+}\r
+group {
+    item c {
+    }
+}
+item a {
+    size = 3
+}
+# trailing { comment
+include "last.edf"
+"""
+
+
+@pytest.fixture(params=[index._CHUNK_SIZE, 7], ids=["whole", "chunked"])
+def path(request, tmp_path, monkeypatch):
+    monkeypatch.setattr(index, "_CHUNK_SIZE", request.param)
+    path = tmp_path / "doc.edf"
+    path.write_text(source, newline="")
+    assert build_index(path) == default_index_path(path)
+    return path
+
+
+def test_load_block(path):
+    doc = read_document(source)
+    assert load_block(path, "item", "b") == doc[1]
+    # The first of several blocks with the same kind and name.
+    assert load_block(path, "item", "a") == doc[2]
+    assert load_block(path, "group", None) == doc[3]
+    assert load_block(path, "include", None) == doc[0]
+    with pytest.raises(KeyError):
+        load_block(path, "item", "c")
+    with pytest.raises(KeyError):
+        load_block(path, "zzz", None)
+
+
+def test_index_lines(path):
+    lines = default_index_path(path).read_bytes().splitlines()[1:]
+    keys = [tuple(line.split(b"\t")[:2]) for line in lines]
+    assert keys == sorted(keys)
+    assert len(keys) == 6
+
+
+def test_many_blocks(tmp_path):
+    path = tmp_path / "doc.edf"
+    path.write_text("".join(f'item i{i} {{\n    size = {i + 1}\n}}\n' for i in range(1000)))
+    index_path = build_index(path, tmp_path / "doc.index")
+    for i in (0, 1, 499, 998, 999):
+        block = load_block(path, "item", f"i{i}", index_path)
+        assert block.attributes == {"size": i + 1}
+    with pytest.raises(KeyError):
+        load_block(path, "item", "i1000", index_path)
+
+
+def test_stale(path):
+    # A copy with the same content is still indexed correctly.
+    os.utime(path, ns=(0, 0))
+    assert load_block(path, "item", "b").name == "b"
+    path.write_text(source.replace("size = 1", "size = 9"))
+    with pytest.raises(StaleIndex):
+        load_block(path, "item", "b")
+    path.write_text(source + "item d {\n}\n")
+    with pytest.raises(StaleIndex):
+        load_block(path, "item", "b")
+
+
+@pytest.mark.parametrize("chunk_size", [index._CHUNK_SIZE, 7])
+def test_error_positions(tmp_path, monkeypatch, chunk_size):
+    monkeypatch.setattr(index, "_CHUNK_SIZE", chunk_size)
+    broken = source.replace("size = 3", "size = @")
+    path = tmp_path / "doc.edf"
+    path.write_text(broken, newline="")
+    with pytest.raises(LexicalError) as expected:
+        read_document(broken)
+    with pytest.raises(LexicalError) as info:
+        build_index(path)
+    assert info.value == expected.value
@@ -0,0 +1,26 @@
+import io
+import json
+
+import pytest
+
+from edf.json_stream import dump_array, dump_ndjson
+
+items = [
+    {"$kind": "foo", "$name": "test", "$children": [{"$kind": "inner", "bar": [1, 2]}]},
+    {"text": "multi\nline", "empty": {}, "list": []},
+]
+
+
+@pytest.mark.parametrize("indent", [None, 0, 2, 4])
+@pytest.mark.parametrize("count", [0, 1, 2])
+def test_dump_array_matches_json_dump(indent, count):
+    fp = io.StringIO()
+    dump_array(iter(items[:count]), fp, indent=indent)
+    assert fp.getvalue() == json.dumps(items[:count], indent=indent)
+
+
+def test_dump_ndjson():
+    fp = io.StringIO()
+    dump_ndjson(iter(items), fp)
+    lines = fp.getvalue().splitlines()
+    assert [json.loads(line) for line in lines] == items
@@ -0,0 +1,116 @@
+import json
+
+import pytest
+
+from edf import bench, stats
+from edf.datafy import LazyData, lazy_datafy_document, materialize
+from edf.io import loads_data, loads_document, loads_schema
+
+schema = loads_schema("""\
+block foo {
+    attribute foo {
+        type = "string"
+        required = true
+    }
+
+    sub_block {
+        field = "inners"
+
+        block inner {
+            anonymous = true
+            attribute bar {
+                type = "number"
+            }
+        }
+    }
+
+    sub_block {
+        field = "other"
+        multiplicity = "one"
+
+        block other {
+            attribute qux {
+                type = "number"
+            }
+        }
+    }
+}
+""")
+
+doc = """\
+foo test {
+    foo = "bar"
+
+    inner {
+        bar = 42
+    }
+
+    inner {
+        bar = 141
+    }
+
+    other o {
+        qux = 1
+    }
+}
+"""
+
+
+def test_lazy_matches_eager():
+    (data,) = loads_data(doc, schema, lazy=True)
+    assert isinstance(data, LazyData)
+    assert list(data) == ["id", "foo", "inners", "other"]
+    assert "inners" in data
+    assert repr(data) == "LazyData({'id': 'test', 'foo': 'bar', 'inners': ..., 'other': ...})"
+
+    expected = loads_data(doc, schema)
+    assert data == expected[0]
+    assert materialize([data]) == expected
+    assert json.loads(json.dumps(materialize(data))) == expected[0]
+    assert isinstance(data["other"], LazyData)
+    assert dict(data["other"]) == {"id": "o", "qux": 1}
+
+
+@pytest.mark.parametrize("shape", list(bench.corpora))
+def test_corpus(shape):
+    corpus = bench.corpora[shape](40)
+    corpus_schema = loads_schema(corpus.schema_source)
+    document = loads_document(corpus.source)
+    lazy = lazy_datafy_document(corpus_schema, document)
+    assert materialize(lazy) == loads_data(corpus.source, corpus_schema)
+
+
+def test_sub_blocks_are_datafied_on_access():
+    bad_child = doc.replace("bar = 141", 'bar = "oops"')
+    (data,) = loads_data(bad_child, schema, lazy=True)
+    assert data["id"] == "test"
+    assert data["other"]["qux"] == 1
+    with pytest.raises(ValueError, match="Expected number for attribute bar"):
+        data["inners"]
+
+
+@pytest.mark.parametrize(
+    "source, message",
+    [
+        (doc.replace('foo = "bar"', "foo = 1"), "Expected string for attribute foo"),
+        (doc.replace('foo = "bar"', ""), "Missing required attribute: foo"),
+        (doc.replace("inner {\n        bar", "unknown {\n        bar"), "Unexpected child"),
+        (doc.replace("}\n}\n", "}\n    other p {}\n}\n"), "Duplicate child"),
+    ],
+)
+def test_eager_validation(source, message):
+    with pytest.raises(ValueError, match=message):
+        loads_data(source, schema, lazy=True)
+
+
+def test_read_only():
+    (data,) = loads_data(doc, schema, lazy=True)
+    with pytest.raises(TypeError):
+        data["foo"] = "x"  # type: ignore
+
+
+def test_lazy_with_stats():
+    with stats.collect():
+        (data,) = loads_data(doc, schema, lazy=True)
+    assert isinstance(data, LazyData)
+    assert data["inners"][1]["bar"] == 141
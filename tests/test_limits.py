@@ -0,0 +1,103 @@
+import pytest
+
+from edf.cache import Cache
+from edf.io import loads_data, loads_document, loads_schema
+from edf.limits import LimitExceeded, Limits
+from edf.parser import read_document
+
+doc = """\
+foo test {
+    foo = "bar"
+    inner {
+        bar = 1
+        baz = 2
+    }
+    inner {
+        bar = 3
+    }
+}
+"""
+
+
+@pytest.mark.parametrize(
+    "limits, limit, line, col",
+    [
+        (Limits(max_bytes=len(doc) - 1), "max_bytes", None, None),
+        (Limits(max_tokens=20), "max_tokens", 8, 9),
+        (Limits(max_depth=1), "max_depth", 3, 11),
+        (Limits(max_string_length=2), "max_string_length", 2, 11),
+        (Limits(max_attributes=1), "max_attributes", 5, 9),
+        (Limits(max_blocks=2), "max_blocks", 7, 5),
+    ],
+)
+def test_limits(limits, limit, line, col):
+    with pytest.raises(LimitExceeded) as e:
+        read_document(doc, limits=limits)
+    assert (e.value.limit, e.value.line, e.value.col) == (limit, line, col)
+    assert e.value.maximum == getattr(limits, limit)
+    assert isinstance(e.value, ValueError)
+
+
+def test_within_limits():
+    limits = Limits(
+        max_bytes=len(doc),
+        max_tokens=26,
+        max_depth=2,
+        max_string_length=3,
+        max_attributes=2,
+        max_blocks=3,
+    )
+    assert read_document(doc, limits=limits) == read_document(doc)
+
+
+def test_bytes_are_encoded_bytes():
+    source = 'foo { x = "ééé" }'
+    read_document(source, limits=Limits(max_bytes=len(source.encode())))
+    with pytest.raises(LimitExceeded):
+        read_document(source, limits=Limits(max_bytes=len(source)))
+
+
+def test_deep_input_aborts_early():
+    source = "a {" * 1_000_000
+    with pytest.raises(LimitExceeded) as e:
+        read_document(source, limits=Limits(max_depth=100))
+    assert e.value.offset == 302
+
+
+schema_source = """\
+block foo {
+    attribute foo {
+        type = "string"
+    }
+    sub_block {
+        field = "inners"
+
+        block inner {
+            anonymous = true
+            attribute bar {
+                type = "number"
+            }
+            attribute baz {
+                type = "number"
+            }
+        }
+    }
+}
+"""
+
+
+@pytest.mark.parametrize("fields", [None, ["foo"]])
+def test_loads_data(fields):
+    schema = loads_schema(schema_source)
+    with pytest.raises(LimitExceeded, match="max_blocks of 1"):
+        loads_data(doc, schema, fields=fields, limits=Limits(max_blocks=1))
+    assert loads_data(doc, schema, fields=fields, limits=Limits(max_blocks=3))
+
+
+def test_cache_is_kept_per_limits(tmp_path):
+    cache = Cache(tmp_path)
+    assert loads_document(doc, cache) == read_document(doc)
+    # A document cached by an unlimited load isn't reused by a limited one.
+    with pytest.raises(LimitExceeded):
+        loads_document(doc, cache, Limits(max_blocks=1))
+    assert loads_document(doc, cache, Limits(max_blocks=3)) == read_document(doc)
@@ -0,0 +1,100 @@
+from array import array
+
+import pytest
+
+from edf.io import loads_data, loads_schema
+from edf.parser import read_document
+
+doc = """\
+config test {
+    ports = [80, 443]
+    weights = [1.5, 1, 2.25]
+    names = [
+        "a",
+        "b",
+    ]
+    flags = [true, false]
+    mixed = ["a", 1]
+    big = [99999999999999999999, 1]
+    empty = []
+    vector { [1, 2, 3] }
+}
+"""
+
+
+def test_values():
+    (block,) = read_document(doc)
+    assert block.attributes == {
+        "ports": array("q", [80, 443]),
+        "weights": array("d", [1.5, 1, 2.25]),
+        "names": ["a", "b"],
+        "flags": [True, False],
+        "mixed": ["a", 1],
+        "big": [99999999999999999999, 1],
+        "empty": [],
+    }
+    assert type(block.attributes["ports"]) is array
+    assert block.children[0].value == array("q", [1, 2, 3])
+
+
+schema_source = """\
+block config {
+    attribute ports {
+        type = "list<number>"
+        default = [8080]
+        required = true
+    }
+    attribute names {
+        type = "list<string>"
+    }
+    attribute flags {
+        type = "list<boolean>"
+    }
+    attribute anything {
+        type = "list"
+    }
+}
+"""
+
+
+def test_datafy():
+    schema = loads_schema(schema_source)
+    source = 'config test {\n    names = ["a"]\n    flags = []\n    anything = [1, "a"]\n}\n'
+    (data,) = loads_data(source, schema)
+    assert data == {
+        "id": "test",
+        "ports": array("q", [8080]),
+        "names": ["a"],
+        "flags": [],
+        "anything": [1, "a"],
+    }
+
+
+def test_defaults_not_shared():
+    schema = loads_schema(schema_source)
+    first, second = loads_data("config a {}\nconfig b {}\n", schema)
+    first["ports"].append(1)
+    assert second["ports"] == array("q", [8080])
+    assert loads_data("config c {}\n", schema)[0]["ports"] == array("q", [8080])
+
+    schema = loads_schema(schema_source.replace("[8080]", '["a"]').replace("list<number>", "list"))
+    first, second = loads_data("config a {}\nconfig b {}\n", schema)
+    first["ports"].append("b")
+    assert second["ports"] == ["a"]
+
+
+@pytest.mark.parametrize(
+    "attribute, value",
+    [
+        ("ports", '["80"]'),
+        ("ports", "80"),
+        ("names", "[1, 2]"),
+        ("names", '["a", 1]'),
+        ("flags", '["true"]'),
+        ("anything", '"a"'),
+    ],
+)
+def test_datafy_wrong_type(attribute, value):
+    schema = loads_schema(schema_source)
+    with pytest.raises(ValueError, match=f"Expected list.* for attribute {attribute}"):
+        loads_data(f"config test {{\n    {attribute} = {value}\n}}\n", schema)
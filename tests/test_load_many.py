@@ -0,0 +1,47 @@
+import pytest
+
+from edf.canonical import canonicalize_json
+from edf.io import load_many, loads_data, loads_document, loads_schema
+
+schema_source = """\
+block foo {
+    attribute foo {
+        type = "string"
+    }
+}
+"""
+
+
+@pytest.fixture
+def paths(tmp_path):
+    paths = []
+    for i in range(1, 11):
+        path = tmp_path / f"f{i}.edf"
+        path.write_text(f'foo t{i} {{\n    foo = "{i}"\n}}\n')
+        paths.append(path)
+    return paths
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_load_many_documents(paths, workers):
+    results = list(load_many(paths, workers=workers))
+    assert results == [(path, loads_document(path.read_text())) for path in paths]
+
+
+@pytest.mark.parametrize("schema", [schema_source, loads_schema(schema_source)])
+@pytest.mark.parametrize("workers", [1, 3])
+def test_load_many_data(paths, schema, workers):
+    results = list(load_many(paths, schema, workers=workers, chunksize=2))
+    schema = loads_schema(schema_source)
+    assert results == [(path, loads_data(path.read_text(), schema)) for path in paths]
+
+
+def test_load_many_unordered(paths):
+    results = dict(load_many(paths, workers=3, ordered=False, convert=canonicalize_json))
+    assert results == {path: canonicalize_json(loads_document(path.read_text())) for path in paths}
+
+
+def test_load_many_error(paths):
+    paths[4].write_text("foo {\n    foo = 1\n}\n")
+    with pytest.raises(ValueError):
+        list(load_many(paths, schema_source, workers=2))
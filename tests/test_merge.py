@@ -0,0 +1,116 @@
+from edf.block import Block
+from edf.merge import overlay
+from edf.parser import read_document
+from edf.writer import dumps_document
+
+base_source = """\
+service web {
+    port = 80
+    host = "localhost"
+    limits {
+        memory = 512
+    }
+    route a {
+        path = "/a"
+    }
+    route b {
+        path = "/b"
+    }
+}
+service db {
+    port = 5432
+}
+"""
+
+
+def merged(*sources: str) -> str:
+    return dumps_document(overlay(*(read_document(source) for source in sources)))
+
+
+def test_overlay():
+    env = 'service web {\n    port = 8080\n    tls = true\n    route b { path = "/bb" }\n}\n'
+    host = 'service web {\n    host = "web1"\n    route c { path = "/c" }\n}\nservice cache {}\n'
+    assert merged(base_source, env, host) == """\
+service web {
+    port = 8080
+    host = "web1"
+    tls = true
+    limits {
+        memory = 512
+    }
+    route a {
+        path = "/a"
+    }
+    route b {
+        path = "/bb"
+    }
+    route c {
+        path = "/c"
+    }
+}
+service db {
+    port = 5432
+}
+service cache {}
+"""
+
+
+def test_structural_sharing():
+    base = read_document(base_source)
+    layer = read_document("service web {\n    route b { path = \"/bb\" }\n}\n")
+    web, db = overlay(base, layer)
+    # Only the blocks on the path to the change are new.
+    assert db is base[1]
+    assert web is not base[0] and web.attributes is base[0].attributes
+    limits, route_a, route_b = web.children
+    assert limits is base[0].children[0] and route_a is base[0].children[1]
+    assert route_b["path"] == "/bb"
+    # The inputs are left as they were.
+    assert base == read_document(base_source)
+
+
+def test_empty_overlay_block_is_a_no_op():
+    base = read_document(base_source)
+    (web, db) = overlay(base, read_document("service web {}"))
+    assert web is base[0] and db is base[1]
+    assert overlay(base) == base
+
+
+def test_anonymous_blocks_match_in_order():
+    base = "list {\n    item { x = 1 }\n    item { x = 2 }\n}\n"
+    layer = "list {\n    item { y = 1 }\n    item { y = 2 }\n    item { y = 3 }\n}\n"
+    assert merged(base, layer) == """\
+list {
+    item {
+        x = 1
+        y = 1
+    }
+    item {
+        x = 2
+        y = 2
+    }
+    item {
+        y = 3
+    }
+}
+"""
+
+
+def test_single_values_replace():
+    assert merged('a { b { 1 } }', 'a { b { c = 2 } }') == "a {\n    b {\n        c = 2\n    }\n}\n"
+    assert merged('a { b { c = 2 } }', 'a { b { 1 } }') == "a {\n    b { 1 }\n}\n"
+
+
+def test_deep_overlay():
+    depth = 5000
+    base = root = Block("node", attributes={"depth": 0})
+    layer = layer_root = Block("node")
+    for i in range(1, depth):
+        base.children.append(Block("node", attributes={"depth": i}))
+        layer.children.append(Block("node"))
+        base, layer = base.children[0], layer.children[0]
+    layer.attributes["leaf"] = True
+    (result,) = overlay([root], [layer_root])
+    for _ in range(depth - 1):
+        result = result.children[0]
+    assert result.attributes == {"depth": depth - 1, "leaf": True}
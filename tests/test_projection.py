@@ -0,0 +1,115 @@
+import pytest
+
+from edf.io import loads_data, loads_schema
+from edf.parser import read_document
+from edf.projection import compile_projection, project_block
+
+schema = loads_schema("""\
+block foo {
+    attribute foo {
+        type = "string"
+        required = true
+    }
+
+    sub_block {
+        field = "inners"
+
+        block inner {
+            anonymous = true
+            attribute bar {
+                type = "number"
+            }
+            attribute baz {
+                type = "string"
+            }
+        }
+    }
+
+    sub_block {
+        field = "other"
+        multiplicity = "one"
+
+        block other {
+            attribute qux {
+                type = "number"
+            }
+        }
+    }
+}
+""")
+
+doc = """\
+foo test {
+    foo = "bar"
+
+    inner {
+        bar = 42
+        baz = "a"
+    }
+
+    inner {
+        bar = 141
+        baz = "b"
+    }
+
+    other o {
+        qux = 1
+    }
+}
+"""
+
+
+@pytest.mark.parametrize(
+    "fields, expected",
+    [
+        (["id"], [{"id": "test"}]),
+        (["foo"], [{"foo": "bar"}]),
+        (["id", "inners[*].bar"], [{"id": "test", "inners": [{"bar": 42}, {"bar": 141}]}]),
+        (["inners[*]"], [{"inners": [{"bar": 42, "baz": "a"}, {"bar": 141, "baz": "b"}]}]),
+        (
+            ["inners[*].bar", "inners[*]"],
+            [{"inners": [{"bar": 42, "baz": "a"}, {"bar": 141, "baz": "b"}]}],
+        ),
+        (["other.qux"], [{"other": {"qux": 1}}]),
+        (["other"], [{"other": {"id": "o", "qux": 1}}]),
+    ],
+)
+def test_projection(fields, expected):
+    assert loads_data(doc, schema, fields=fields) == expected
+
+
+@pytest.mark.parametrize(
+    "fields",
+    [["id"], ["foo"], ["id", "inners[*].bar"], ["inners[*]"], ["other.qux"], ["other"]],
+)
+def test_project_block(fields):
+    # Projecting a built block leaves the same as projecting while building.
+    projection, _ = compile_projection(schema, fields)
+    (block,) = read_document(doc)
+    assert [project_block(block, projection.blocks["foo"])] == read_document(doc, projection)
+
+
+def test_projection_skips_unselected():
+    # Errors outside the selected fields are not seen.
+    invalid = doc.replace("bar = 141", 'bar = "x"').replace('foo = "bar"', "foo = 1")
+    assert loads_data(invalid, schema, fields=["id", "other.qux"]) == [
+        {"id": "test", "other": {"qux": 1}}
+    ]
+    with pytest.raises(ValueError, match="Expected number for attribute bar"):
+        loads_data(invalid, schema, fields=["inners[*].bar"])
+
+
+@pytest.mark.parametrize(
+    "fields",
+    [
+        ["nope"],
+        ["inners"],
+        ["other[*]"],
+        ["foo.bar"],
+        ["inners[*].nope"],
+        ["inners[*].id"],
+    ],
+)
+def test_projection_invalid(fields):
+    with pytest.raises(ValueError):
+        loads_data(doc, schema, fields=fields)
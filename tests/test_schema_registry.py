@@ -0,0 +1,87 @@
+import threading
+
+import pytest
+
+from edf.datafy import datafy_document
+from edf.io import loads_schema
+from edf.parser import read_document
+from edf.schema import SchemaRegistry, schema_digest
+
+
+def schema_source(attribute: str) -> str:
+    return f'block config {{\n    attribute {attribute} {{\n        type = "number"\n    }}\n}}\n'
+
+
+v1, v2, other = schema_source("port"), schema_source("ports"), schema_source("size")
+
+
+def test_load():
+    registry = SchemaRegistry()
+    schema = registry.load(v1)
+    assert schema == loads_schema(v1)
+    assert registry.load(v1) is schema
+    assert registry.get_digest(schema_digest(v1)) is schema
+    assert len(registry) == 1
+
+
+def test_names_and_versions():
+    registry = SchemaRegistry()
+    registry.load(v1, "config", "1")
+    registry.load(v2, "config", "2")
+    assert registry.get("config", "1") == loads_schema(v1)
+    assert registry.get("config", "2") == loads_schema(v2)
+    assert registry.get("config") == loads_schema(v2)
+    # Registering a version again makes it the latest.
+    registry.load(v1, "config", "1")
+    assert registry.get("config") == loads_schema(v1)
+    with pytest.raises(KeyError, match="No version 3 of schema config"):
+        registry.get("config", "3")
+    with pytest.raises(KeyError, match="No schema named other"):
+        registry.get("other")
+
+
+def test_eviction():
+    registry = SchemaRegistry(max_size=2)
+    first = registry.load(v1, "config")
+    registry.load(v2)
+    registry.load(v1)
+    registry.load(other)
+    assert len(registry) == 2
+    # v2 was the least recently used.
+    with pytest.raises(KeyError):
+        registry.get_digest(schema_digest(v2))
+    assert registry.get_digest(schema_digest(v1)) is first
+    registry.load(v2)
+    # Named schemas are analysed again once evicted.
+    assert registry.get("config") == first
+
+
+def test_select():
+    registry = SchemaRegistry()
+    registry.load(v1, "config", "1")
+    registry.load(v2, "config", "2")
+    doc = read_document('schema config {\n    version = 1\n}\nconfig a {\n    port = 80\n}\n')
+    schema, body = registry.select(doc)
+    assert schema == loads_schema(v1)
+    assert datafy_document(schema, body) == [{"id": "a", "port": 80}]
+    assert registry.select(read_document("schema config {}\n")) == (loads_schema(v2), [])
+    with pytest.raises(ValueError, match="no schema header"):
+        registry.select(doc[1:])
+
+
+def test_threads():
+    registry = SchemaRegistry(max_size=2)
+    sources = [v1, v2, other]
+    results = []
+
+    def work():
+        results.append([registry.load(sources[i % 3]) for i in range(300)])
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    expected = [loads_schema(source) for source in sources]
+    assert all(loaded == [expected[i % 3] for i in range(300)] for loaded in results)
+    assert len(registry) == 2
@@ -0,0 +1,143 @@
+import asyncio
+import json
+import socket
+import threading
+
+import pytest
+
+from edf.canonical import canonicalize_json
+from edf.client import Client, ServerError
+from edf.io import loads_data, loads_document, loads_schema
+from edf.limits import Limits
+from edf.server import Server
+
+schema = """\
+block foo {
+    attribute foo {
+        type = "string"
+    }
+}
+"""
+
+doc = """\
+foo test {
+    foo = "bar"
+}
+"""
+
+
+@pytest.fixture(params=[0, 1], ids=["thread", "process"])
+def server(request, tmp_path):
+    server = Server(tmp_path / "edf.sock", workers=request.param)
+    ready = threading.Event()
+    thread = threading.Thread(target=asyncio.run, args=(server.serve(ready.set),))
+    thread.start()
+    assert ready.wait(10)
+    yield server
+    server.close()
+    thread.join(10)
+
+
+def test_to_json(server):
+    with Client(server.path) as client:
+        assert json.loads(client.to_json(doc)) == canonicalize_json(loads_document(doc))
+        for _ in range(3):
+            data = client.to_json(doc, schema, indent=2)
+            assert data == json.dumps(loads_data(doc, loads_schema(schema)), indent=2).encode()
+        data = client.to_json(doc, schema, object=True)
+        assert json.loads(data) == loads_data(doc, loads_schema(schema))[0]
+
+
+def test_errors(server):
+    with Client(server.path) as client:
+        with pytest.raises(ServerError, match="Unexpected character"):
+            client.to_json("foo {\n@\n}\n")
+        with pytest.raises(ServerError, match="Expected string"):
+            client.to_json("foo test {\n    foo = 1\n}\n", schema)
+        # The connection is still usable after an error.
+        assert json.loads(client.to_json(doc)) == canonicalize_json(loads_document(doc))
+        stats = client.stats()
+    assert stats["requests"] == 3
+    assert stats["errors"] == 2
+
+
+@pytest.mark.parametrize(
+    "line",
+    [
+        b"{not json\n",
+        b"[1]\n",
+        b"\xff\n",
+        b'{"op": "to-json"}\n',
+        b'{"op": "to-json", "source": "12"}\n',
+        b'{"op": "to-json", "source": -1}\n',
+        b'{"op": "to-json", "source": 1.5}\n',
+        b'{"op": "to-json", "source": true}\n',
+        b'{"op": "to-json", "source": 0, "schema": -4}\n',
+    ],
+)
+def test_malformed_header(server, line):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.connect(str(server.path))
+        s.sendall(line)
+        f = s.makefile("rb")
+        assert json.loads(f.readline())["error"].startswith("Malformed request header")
+        assert f.read() == b""
+    with Client(server.path) as client:
+        assert client.stats()["errors"] == 1
+
+
+def test_concurrent_clients(server):
+    def convert():
+        with Client(server.path) as client:
+            for _ in range(5):
+                client.to_json(doc, schema)
+
+    threads = [threading.Thread(target=convert) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert server.counters.requests == 20
+    assert server.counters.errors == 0
+
+
+def test_limits(tmp_path):
+    server = Server(tmp_path / "edf.sock", workers=0, limits=Limits(max_bytes=100, max_depth=2))
+    ready = threading.Event()
+    thread = threading.Thread(target=asyncio.run, args=(server.serve(ready.set),))
+    thread.start()
+    assert ready.wait(10)
+    try:
+        with Client(server.path) as client:
+            with pytest.raises(ServerError, match="max_bytes of 100"):
+                client.to_json(doc * 10)
+        # Oversized payloads are refused from their declared size, without being read.
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.connect(str(server.path))
+            s.sendall(json.dumps({"op": "to-json", "source": 10**10}).encode() + b"\n")
+            f = s.makefile("rb")
+            response = json.loads(f.readline())
+            assert response == {"error": "Input exceeds max_bytes of 100", "size": 0}
+            assert f.read() == b""
+        with Client(server.path) as client:
+            with pytest.raises(ServerError, match="max_depth of 2 at line 1, column 11"):
+                client.to_json("a { b { c {} } }")
+            assert json.loads(client.to_json(doc)) == canonicalize_json(loads_document(doc))
+    finally:
+        server.close()
+        thread.join(10)
+
+
+def test_timeout(tmp_path):
+    server = Server(tmp_path / "edf.sock", workers=0, timeout=1e-9)
+    ready = threading.Event()
+    thread = threading.Thread(target=asyncio.run, args=(server.serve(ready.set),))
+    thread.start()
+    assert ready.wait(10)
+    try:
+        with Client(server.path) as client:
+            with pytest.raises(ServerError, match="exceeded its timeout"):
+                client.to_json(doc)
+    finally:
+        server.close()
+        thread.join(10)
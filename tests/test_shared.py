@@ -0,0 +1,111 @@
+import pickle
+import subprocess
+import sys
+from multiprocessing import get_context
+
+import pytest
+
+from edf.block import Block
+from edf.shared import BlockView, SharedDocument
+
+from .documents import deep, documents
+
+
+def view_to_block(view: BlockView) -> Block:
+    # Rebuilt through the views' own fields, rather than `to_block`.
+    return Block(
+        view.kind,
+        view.name,
+        view.value,
+        dict(view.attributes),
+        [view_to_block(child) for child in view.children],
+    )
+
+
+@pytest.mark.parametrize("doc", documents)
+def test_views(doc):
+    with SharedDocument.publish(doc) as shared:
+        assert len(shared) == len(doc)
+        assert [view_to_block(view) for view in shared] == doc
+        assert shared.to_document() == doc
+
+
+def test_views_are_read_only():
+    with SharedDocument.publish(documents[1]) as shared:
+        view = shared[0]
+        assert view.kind == "foo" and view["foo"] == "bar"
+        with pytest.raises(TypeError):
+            view.attributes["foo"] = "changed"  # type: ignore[index]
+        with pytest.raises(AttributeError):
+            view.children.append(view)  # type: ignore[attr-defined]
+        with pytest.raises(TypeError):
+            shared._data[0] = 0
+
+
+def test_deep_document():
+    with SharedDocument.publish([deep(5000)]) as shared:
+        view = shared[0]
+        for i in range(5000):
+            (view,) = view.children
+            assert view.name == f"n{i}"
+        assert shared[0].to_block().children[0].name == "n0"
+
+
+def test_pickles_as_a_name():
+    doc = documents[3] * 20
+    with SharedDocument.publish(doc) as shared:
+        assert len(pickle.dumps(shared)) < 100
+        with pickle.loads(pickle.dumps(shared)) as attached:
+            assert attached[-1].to_block() == doc[-1]
+
+
+def describe(shared: SharedDocument, index: int) -> tuple[str, str | None, dict]:
+    view = shared[index]
+    return view.kind, view.name, dict(view.attributes)
+
+
+START_METHODS = ["fork", "spawn", "forkserver"]
+
+
+@pytest.mark.parametrize("start_method", START_METHODS)
+def test_workers(start_method):
+    doc = documents[3]
+    context = get_context(start_method)
+    with SharedDocument.publish(doc) as shared, context.Pool(2) as pool:
+        results = pool.starmap(describe, [(shared, i) for i in range(len(doc))])
+    assert results == [(block.kind, block.name, block.attributes) for block in doc]
+
+
+# Run in a process of its own, so that its resource tracker's complaints can be seen.
+publish_to_workers = """\
+import sys
+from multiprocessing import get_context
+from edf.block import Block
+from edf.shared import SharedDocument
+
+with SharedDocument.publish([Block("foo")]) as shared:
+    with get_context(sys.argv[1]).Pool(2) as pool:
+        assert pool.map(len, [shared] * 4) == [1] * 4
+"""
+
+
+@pytest.mark.parametrize("start_method", START_METHODS)
+def test_workers_leave_tracking_to_the_publisher(start_method):
+    # Workers that share the publisher's resource tracker must leave the memory registered with
+    # it, or the tracker reports the publisher's unlinking it as an error.
+    result = subprocess.run(
+        [sys.executable, "-c", publish_to_workers, start_method],
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stderr == ""
+
+
+def test_closed_unlinks():
+    shared = SharedDocument.publish(documents[1])
+    name = shared.name
+    shared.close()
+    with pytest.raises(FileNotFoundError):
+        SharedDocument(name)
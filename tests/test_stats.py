@@ -0,0 +1,95 @@
+import pytest
+
+from edf import stats
+from edf.index import build_index
+from edf.io import iter_data, loads_data, loads_document, loads_schema
+from edf.parser import read_document
+
+schema_source = """\
+block foo {
+    attribute foo {
+        type = "string"
+    }
+
+    sub_block {
+        field = "inners"
+
+        block inner {
+            anonymous = true
+        }
+    }
+}
+"""
+
+doc = """\
+foo test {
+    foo = "bar"
+    inner {
+    }
+}
+"""
+
+
+def test_disabled_by_default():
+    assert not stats.enabled()
+    with stats.operation("read_document") as s:
+        assert s is None
+
+
+def test_read_document():
+    with stats.collect() as collected:
+        result = read_document(doc)
+    assert result == loads_document(doc)
+    (s,) = collected
+    assert s.operation == "read_document"
+    assert [phase.name for phase in s.phases] == ["lex", "parse", "build"]
+    assert s.blocks == 2
+    assert s.tokens > s.fabricated_tokens > 0
+    assert s.nodes > 0
+    assert s.peak_memory_bytes is None
+    assert not stats.enabled()
+
+
+@pytest.mark.parametrize("load", [loads_data, lambda *args: list(iter_data(*args))])
+def test_loads_data(load):
+    schema = loads_schema(schema_source)
+    with stats.collect(trace_memory=True) as collected:
+        assert load(doc, schema) == [{"id": "test", "foo": "bar", "inners": [{}]}]
+    (s,) = collected
+    assert s.operation == "loads_data"
+    assert [phase.name for phase in s.phases] == ["lex", "parse", "build", "datafy"]
+    assert s.blocks == 2
+    assert s.peak_memory_bytes > 0
+    assert all(phase.peak_memory_bytes is not None for phase in s.phases)
+
+
+def test_loads_schema():
+    collected = []
+    stats.add_callback(collected.append)
+    try:
+        loads_schema(schema_source)
+    finally:
+        stats.remove_callback(collected.append)
+    (s,) = collected
+    assert s.operation == "loads_schema"
+    assert [phase.name for phase in s.phases] == ["lex", "parse", "build", "analyze"]
+
+
+def test_build_index(tmp_path):
+    path = tmp_path / "doc.edf"
+    path.write_text(doc * 3)
+    with stats.collect(trace_memory=True) as collected:
+        build_index(path)
+    (s,) = collected
+    assert s.operation == "build_index"
+    # Each root block is read on its own, and their phases are accumulated.
+    assert [phase.name for phase in s.phases] == ["lex", "parse", "build", "write"]
+    assert s.blocks == 6
+    assert s.peak_memory_bytes > 0
+
+
+def test_failed_loads_are_not_reported():
+    with stats.collect() as collected:
+        with pytest.raises(ValueError):
+            loads_data('foo {\n    foo = "bar"\n}\n', loads_schema(schema_source))
+    assert [s.operation for s in collected] == ["loads_schema"]
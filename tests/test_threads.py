@@ -0,0 +1,59 @@
+import dataclasses
+import threading
+
+import pytest
+
+from edf import bench
+from edf.canonical import canonicalize_json
+from edf.io import load_many_threaded, loads_data, loads_document, loads_schema
+from edf.parser.parse import node_block
+
+
+def test_node_kinds_are_immutable():
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        node_block.fixed_num_children = 1  # type: ignore
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_load_many_threaded(workers):
+    corpora = [bench.corpora[shape](20 + i) for i, shape in enumerate(bench.corpora)]
+    sources = [corpus.source for corpus in corpora]
+    assert list(load_many_threaded(sources, workers=workers, convert=canonicalize_json)) == [
+        canonicalize_json(loads_document(source)) for source in sources
+    ]
+
+    corpus = corpora[0]
+    schema = loads_schema(corpus.schema_source)
+    assert list(load_many_threaded([corpus.source] * 3, corpus.schema_source, workers)) == [
+        loads_data(corpus.source, schema)
+    ] * 3
+
+
+def test_concurrent_loads():
+    # Every shape of document, loaded at once from many threads sharing one schema per shape,
+    # gives the same result as loading it alone.
+    corpora = [bench.corpora[shape](40) for shape in bench.corpora if shape != "deep"]
+    schemas = [loads_schema(corpus.schema_source) for corpus in corpora]
+    expected = [loads_data(corpus.source, schema) for corpus, schema in zip(corpora, schemas)]
+
+    threads = 8
+    rounds = 5
+    barrier = threading.Barrier(threads)
+    failures = []
+
+    def work(offset: int):
+        barrier.wait()
+        for i in range(rounds * len(corpora)):
+            n = (i + offset) % len(corpora)
+            try:
+                if loads_data(corpora[n].source, schemas[n]) != expected[n]:
+                    failures.append(corpora[n].shape)
+            except Exception as e:
+                failures.append(repr(e))
+
+    workers = [threading.Thread(target=work, args=(i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert failures == []
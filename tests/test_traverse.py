@@ -0,0 +1,111 @@
+from xml.etree import ElementTree
+
+import pytest
+
+from edf.block import Block
+from edf.canonical import canonicalize_block_json
+from edf.datafy import datafy_block
+from edf.parser import read_document
+from edf.schema import AttributeSchema, BlockSchema, SubBlockSchema, analyze_schema_block
+from edf.traverse import fold
+from edf.xml import document_to_xml_string
+
+# Comfortably past the default recursion limit.
+DEPTH = 5000
+
+
+def nested_blocks(depth: int) -> Block:
+    root = block = Block("node", attributes={"depth": 0})
+    for i in range(1, depth):
+        child = Block("node", attributes={"depth": i})
+        block.children.append(child)
+        block = child
+    return root
+
+
+node_schema = BlockSchema(
+    kind="node",
+    anonymous=True,
+    attributes=[AttributeSchema(name="depth", type="number", required=True)],
+    sub_blocks=[SubBlockSchema(field="children", block=lambda: node_schema)],
+)
+
+
+def test_fold_order():
+    doc = read_document("""\
+a {
+    b {
+        c {}
+    }
+    d {}
+}
+""")
+    events = []
+
+    def enter(block, parent):
+        events.append(f"enter {block.kind}")
+        return block.kind, block.children
+
+    def leave(block, state, children):
+        events.append(f"leave {block.kind}")
+        return f"{state}({','.join(children)})"
+
+    assert fold(doc[0], None, leave, enter) == "a(b(c()),d())"
+    assert events == [
+        "enter a",
+        "enter b",
+        "enter c",
+        "leave c",
+        "leave b",
+        "enter d",
+        "leave d",
+        "leave a",
+    ]
+
+
+def test_canonicalize_deep():
+    data = canonicalize_block_json(nested_blocks(DEPTH))
+    for i in range(DEPTH - 1):
+        assert data["depth"] == i
+        (data,) = data["$children"]
+    assert data["$children"] == []
+
+
+def test_datafy_deep():
+    data = datafy_block(node_schema, nested_blocks(DEPTH))
+    for i in range(DEPTH - 1):
+        assert data["depth"] == i
+        (data,) = data["children"]
+    assert data["children"] == []
+
+
+def test_datafy_error_in_deep_block():
+    root = nested_blocks(DEPTH)
+    leaf = root
+    while leaf.children:
+        leaf = leaf.children[0]
+    leaf["depth"] = "deep"
+    with pytest.raises(ValueError, match="Expected number for attribute depth"):
+        datafy_block(node_schema, root)
+
+
+def test_xml_deep():
+    e = ElementTree.fromstring(document_to_xml_string([nested_blocks(DEPTH)]))
+    (e,) = e
+    for i in range(DEPTH - 1):
+        assert e.get("depth") == str(i)
+        (e,) = e
+    assert len(e) == 0
+
+
+def test_analyze_schema_deep():
+    source = "".join(f'block b{i} {{ sub_block {{ field = "c"; ' for i in range(DEPTH))
+    source += f"block b{DEPTH} {{}}" + "} }" * DEPTH
+    (root,) = read_document(source)
+    schema = analyze_schema_block(root)
+    for i in range(DEPTH):
+        assert schema.kind == f"b{i}"
+        (sub_block,) = schema.sub_blocks
+        schema = sub_block.block
+    assert schema.kind == f"b{DEPTH}"
+    assert not schema.sub_blocks
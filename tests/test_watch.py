@@ -0,0 +1,166 @@
+import os
+import threading
+
+import pytest
+
+from edf import stats
+from edf.io import loads_schema
+from edf.watch import Watcher
+
+schema_source = """\
+block foo {
+    attribute foo {
+        type = "string"
+    }
+}
+"""
+
+
+def write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    existed = path.exists()
+    path.write_text(text)
+    if existed:
+        # Make sure the change is visible to polling, whatever the timestamp resolution.
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    return path
+
+
+def foo(name, value):
+    return f'foo {name} {{\n    foo = "{value}"\n}}\n'
+
+
+def summary(changes):
+    return {
+        "added": sorted((c.path.name, c.name, c.data) for c in changes.added),
+        "changed": sorted((c.path.name, c.name, c.data) for c in changes.changed),
+        "removed": sorted((c.path.name, c.name) for c in changes.removed),
+    }
+
+
+@pytest.fixture
+def files(tmp_path):
+    write(tmp_path / "a.edf", foo("a1", "x") + foo("a2", "y"))
+    write(tmp_path / "sub/b.edf", foo("b1", "z"))
+    write(tmp_path / "ignored.txt", "not edf {")
+    return tmp_path
+
+
+def test_refresh(files):
+    schema = loads_schema(schema_source)
+    with Watcher([files], schema, backend="poll") as watcher:
+        assert summary(watcher.load()) == {
+            "added": [
+                ("a.edf", "a1", {"id": "a1", "foo": "x"}),
+                ("a.edf", "a2", {"id": "a2", "foo": "y"}),
+                ("b.edf", "b1", {"id": "b1", "foo": "z"}),
+            ],
+            "changed": [],
+            "removed": [],
+        }
+        assert not watcher.load()
+
+        write(files / "a.edf", foo("a1", "x") + foo("a2", "changed") + foo("a3", "new"))
+        with stats.collect() as collected:
+            changes = watcher.load()
+        assert summary(changes) == {
+            "added": [("a.edf", "a3", {"id": "a3", "foo": "new"})],
+            "changed": [("a.edf", "a2", {"id": "a2", "foo": "changed"})],
+            "removed": [],
+        }
+        # Only the edited root blocks are parsed again.
+        assert [s.blocks for s in collected] == [1, 1]
+
+        (files / "sub/b.edf").unlink()
+        assert summary(watcher.load()) == {
+            "added": [],
+            "changed": [],
+            "removed": [("b.edf", "b1")],
+        }
+        assert list(watcher.data) == [(files / "a.edf").resolve()]
+        assert [block.name for block in watcher.documents[(files / "a.edf").resolve()]] == [
+            "a1",
+            "a2",
+            "a3",
+        ]
+
+
+def test_whitespace_change_is_not_a_change(files):
+    with Watcher([files / "a.edf"], backend="poll") as watcher:
+        watcher.load()
+        write(files / "a.edf", foo("a1", "x") + "\n\n" + foo("a2", "y"))
+        assert not watcher.load()
+
+
+def test_errors_keep_previous_contents(files):
+    with Watcher([files], backend="poll") as watcher:
+        watcher.load()
+        write(files / "a.edf", foo("a1", "x") + 'foo a2 {\n    foo = "unterminated\n}\n')
+        changes = watcher.load()
+        assert list(changes.errors) == [(files / "a.edf").resolve()]
+        assert not changes.added and not changes.changed and not changes.removed
+        assert len(watcher.data[(files / "a.edf").resolve()]) == 2
+
+
+def test_error_positions_are_in_the_file(files):
+    with Watcher([files / "a.edf"], backend="poll") as watcher:
+        watcher.load()
+        # The first two root blocks are unchanged, and aren't read again.
+        write(files / "a.edf", foo("a1", "x") + foo("a2", "y") + "foo a3 {\n    foo = @\n}\n")
+        changes = watcher.load()
+        assert changes.errors == {(files / "a.edf").resolve(): "8:11: Unexpected character '@'"}
+
+
+def test_unknown_block_kind_is_an_error(files):
+    schema_path = write(files / "schema.edf.schema", schema_source)
+    with Watcher([files / "a.edf"], schema_path=schema_path, backend="poll") as watcher:
+        watcher.load()
+        write(files / "a.edf", foo("a1", "x") + "bar b {}\n")
+        changes = watcher.load()
+        assert changes.errors == {(files / "a.edf").resolve(): "Unknown block kind: bar"}
+        assert len(watcher.data[(files / "a.edf").resolve()]) == 2
+
+        write(files / "a.edf", foo("a1", "x"))
+        watcher.load()
+        write(schema_path, schema_source.replace("block foo", "block bar"))
+        changes = watcher.load()
+        assert changes.errors == {(files / "a.edf").resolve(): "Unknown block kind: foo"}
+
+
+def test_schema_reload(files):
+    schema_path = write(files / "schema.edf.schema", schema_source)
+    with Watcher([files / "a.edf"], schema_path=schema_path, backend="poll") as watcher:
+        watcher.load()
+        write(schema_path, schema_source.replace('"string"', '"string"\n        required = true'))
+        assert not watcher.load()
+
+        write(schema_path, schema_source.replace('"string"', '"number"'))
+        changes = watcher.load()
+        assert list(changes.errors) == [(files / "a.edf").resolve()]
+        assert watcher.data[(files / "a.edf").resolve()][0] == {"id": "a1", "foo": "x"}
+
+
+def backends():
+    yield "poll"
+    try:
+        Watcher([], backend="inotify").close()
+    except (OSError, AttributeError, TypeError):
+        return
+    yield "inotify"
+
+
+@pytest.mark.parametrize("backend", list(backends()))
+def test_wait(files, backend):
+    with Watcher([files], backend=backend, poll_interval=0.01) as watcher:
+        assert watcher.backend == backend
+        watcher.load()
+        assert watcher.wait(timeout=0.05) is None
+
+        timer = threading.Timer(0.05, write, [files / "new/c.edf", foo("c1", "w")])
+        timer.start()
+        changes = watcher.wait(timeout=5)
+        timer.join()
+        assert changes is not None
+        (block,) = watcher.documents[(files / "new/c.edf").resolve()]
+        assert summary(changes)["added"] == [("c.edf", "c1", block)]
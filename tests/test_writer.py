@@ -0,0 +1,78 @@
+import io
+from array import array
+
+import pytest
+
+from edf import bench
+from edf.block import Block
+from edf.io import dump_document, dumps_document
+from edf.parser import read_document
+
+doc = [
+    Block(
+        "foo",
+        "test",
+        attributes={
+            "s": 'quote " backslash \\ newline \n tab \t é # not a comment',
+            "n": -12,
+            "f": 1.5,
+            "b": True,
+            "ints": array("q", [80, -443]),
+            "floats": array("d", [1.5, -2.0, 1e20]),
+            "mixed": ["a", 1, False],
+            "empty": [],
+        },
+        children=[
+            Block("inner", attributes={"bar": 42}),
+            Block("empty"),
+            Block("value", "v", value="single"),
+            Block("number", value=3),
+            Block("flag", value=False),
+            Block("blank", value=""),
+            Block("nested", children=[Block("deeper", "d'#", attributes={"x": 1e20})]),
+        ],
+    ),
+    Block("include", value="common.edf"),
+    Block("last"),
+]
+
+
+@pytest.mark.parametrize("indent", ["    ", "  ", "\t", None])
+def test_round_trip(indent):
+    text = dumps_document(doc, indent)
+    assert read_document(text) == doc
+    fp = io.StringIO()
+    dump_document(doc, fp, indent)
+    assert fp.getvalue() == text
+
+
+def test_format():
+    document = [Block("foo", "a", attributes={"x": 1}, children=[Block("b")])]
+    assert dumps_document(document) == "foo a {\n    x = 1\n    b {}\n}\n"
+    assert dumps_document(document, None) == "foo a { x = 1; b {} }\n"
+
+
+@pytest.mark.parametrize("shape", list(bench.corpora))
+def test_round_trip_corpus(shape):
+    source = bench.corpora[shape](50).source
+    document = read_document(source)
+    assert read_document(dumps_document(document)) == document
+
+
+@pytest.mark.parametrize(
+    "block",
+    [
+        Block("Foo"),
+        Block("foo", "true"),
+        Block("foo", attributes={"x-y": 1}),
+        Block("foo", attributes={"x": 0}),
+        Block("foo", attributes={"x": 0.5}),
+        Block("foo", attributes={"x": float("nan")}),
+        Block("foo", attributes={"x": None}),
+        Block("foo", attributes={"x": [[1]]}),
+        Block("foo", value=1, attributes={"x": 1}),
+    ],
+)
+def test_unwritable(block):
+    with pytest.raises(ValueError):
+        dumps_document([block])
@@ -0,0 +1,129 @@
+from array import array
+from xml.dom import minidom
+from xml.etree import ElementTree
+
+import pytest
+
+from edf.bench import corpora
+from edf.block import Block
+from edf.parser import read_document
+from edf.xml import (
+    block_to_xml_element,
+    document_to_xml_document,
+    document_to_xml_string,
+    dump_document_xml,
+)
+
+from .documents import documents
+
+
+def minidom_xml_string(doc: list[Block]) -> str:
+    # How documents were written before `dump_document_xml`, which values aside writes the same.
+    d = minidom.Document()
+    root = d.createElement("document")
+    d.appendChild(root)
+
+    def element(block: Block) -> minidom.Element:
+        e = d.createElement(block.kind)
+        if block.name:
+            e.setAttribute("id", block.name)
+        for attr_name, attr_value in block.attributes.items():
+            e.setAttribute(attr_name, str(attr_value))
+        for child in block.children:
+            e.appendChild(element(child))
+        return e
+
+    for block in doc:
+        root.appendChild(element(block))
+    return d.toprettyxml(indent="  ")
+
+
+corpus_documents = [
+    *(read_document(corpus(40).source) for corpus in corpora.values()),
+    documents[0],
+    documents[1],
+    documents[3],
+]
+
+
+@pytest.mark.parametrize("doc", corpus_documents)
+def test_matches_minidom(doc):
+    expected = minidom_xml_string(doc)
+    assert document_to_xml_string(doc) == expected
+    assert document_to_xml_document(doc).toprettyxml(indent="  ") == expected
+
+
+def test_block_to_xml_element():
+    owner = minidom.Document()
+    block = documents[1][0]
+    element = block_to_xml_element(block, owner)
+    assert element.ownerDocument is owner
+    assert element.toxml() == '<foo id="test" foo="bar"><inner bar="1"/><inner bar="x"/></foo>'
+
+
+def test_dom_names():
+    # Identifiers can hold characters that XML names can't, which the DOM takes as they are.
+    doc = read_document("it's# don't {\n    a'b# = 1\n    x { 2 }\n}\n")
+    root = document_to_xml_document(doc).documentElement
+    (element,) = root.childNodes
+    assert element.tagName == "it's#"
+    assert element.getAttribute("id") == "don't"
+    assert element.getAttribute("a'b#") == "1"
+    assert element.firstChild.firstChild.data == "2"
+    assert block_to_xml_element(doc[0], minidom.Document()).tagName == "it's#"
+
+
+def test_single_values():
+    doc = read_document('single s {\n    "a < b"\n}\nnumbers {\n    zero { [1, 2.5] }\n}\n')
+    doc.append(Block("falsy", value=0))
+    root = ElementTree.fromstring(document_to_xml_string(doc))
+    assert [(e.tag, e.get("id"), e.text) for e in root.iter()][1:] == [
+        ("single", "s", "a < b"),
+        ("numbers", None, "\n    "),
+        ("zero", None, "1.0 2.5"),
+        ("falsy", None, "0"),
+    ]
+
+
+def test_escaping():
+    tricky = 'a & b < c > d "e" \'f\'\n\tg\r'
+    doc = [Block("foo", name=tricky, attributes={"attr": tricky}), Block("bar", value=tricky)]
+    xml = document_to_xml_string(doc)
+    assert 'attr="a &amp; b &lt; c &gt; d &quot;e&quot; \'f\'&#10;&#9;g&#13;"' in xml
+    foo, bar = ElementTree.fromstring(xml)
+    assert foo.attrib == {"id": tricky, "attr": tricky}
+    # Text isn't normalised like attributes are, apart from line endings.
+    assert bar.text == tricky.replace("\r", "\n")
+
+
+def test_lists():
+    doc = [Block("foo", attributes={"q": array("q", [1, 2]), "l": ["a", True]})]
+    (foo,) = ElementTree.fromstring(document_to_xml_string(doc))
+    assert foo.attrib == {"q": "1 2", "l": "a True"}
+
+
+def test_compact():
+    doc = read_document('foo a {\n    x = 1\n    bar {\n    }\n}\nbaz { "v" }\n')
+    assert document_to_xml_string(doc, indent=None) == (
+        '<?xml version="1.0" ?><document><foo id="a" x="1"><bar/></foo><baz>v</baz></document>'
+    )
+    assert document_to_xml_string([], indent=None) == '<?xml version="1.0" ?><document/>'
+    indented = document_to_xml_string(doc, indent="\t")
+    assert indented.splitlines()[2:5] == ['\t<foo id="a" x="1">', "\t\t<bar/>", "\t</foo>"]
+
+
+def test_dump_streams_blocks():
+    written = []
+
+    class Output:
+        def write(self, s: str):
+            written.append(s)
+
+    def blocks():
+        yield Block("first")
+        # The first block has been written before the next is read.
+        assert "<first/>" in "".join(written)
+        yield Block("second")
+
+    dump_document_xml(blocks(), Output())  # type: ignore[arg-type]
+    assert "".join(written).endswith("<second/>\n</document>\n")